@@ -27,10 +27,9 @@
 
 """EmPOWER base app class."""
 
-import tornado.ioloop
-
 import empower.logger
 
+from empower.core.timerwheel import TIMERS
 from empower.restserver.restserver import RESTServer
 from empower.restserver.restserver import BaseHandler
 
@@ -64,7 +63,7 @@ class EmpowerApp(object):
         self.ui_url = None
         self.params = []
         self.log = empower.logger.get_logger()
-        self.worker = tornado.ioloop.PeriodicCallback(self.loop, self.every)
+        self.worker = None
 
         module_name_array = self.__module__.split('.')
         self.ui_url = r"/apps/%s/?" % module_name_array[len(module_name_array)-1]
@@ -106,12 +105,13 @@ class EmpowerApp(object):
     def start(self):
         """Start control loop."""
 
-        self.worker.start()
+        self.worker = TIMERS.add(self.loop, self.every)
 
     def stop(self):
         """Stop control loop."""
 
-        self.worker.stop()
+        if self.worker:
+            self.worker.stop()
 
     def to_dict(self):
         """Return JSON-serializable representation of the object."""
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Non-blocking transport for remote module callbacks.
+
+The queue depth, drop counts and delivery latency of every endpoint are
+exposed as JSON:
+
+    GET /api/v1/callbacks
+"""
+
+import time
+import xmlrpc.client
+
+from collections import deque
+from urllib.parse import urlsplit
+from xml.parsers.expat import ExpatError
+
+from tornado.httpclient import HTTPRequest
+
+from empower.restserver.restserver import RESTServer
+from empower.restserver.apihandlers import EmpowerAPIHandler
+
+from empower.main import RUNTIME
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+DEFAULT_MAX_IN_FLIGHT = 4
+DEFAULT_MAX_QUEUE = 1000
+DEFAULT_MAX_BATCH = 1
+DEFAULT_MAX_CLIENTS = 100
+DEFAULT_TIMEOUT = 10
+
+try:
+    from tornado.curl_httpclient import CurlAsyncHTTPClient as HTTP_CLIENT
+    KEEP_ALIVE = True
+except ImportError:
+    from tornado.simple_httpclient import SimpleAsyncHTTPClient as HTTP_CLIENT
+    KEEP_ALIVE = False
+
+
+class CallbackEndpoint(object):
+    """A remote callback endpoint.
+
+    Attributes:
+        url: the endpoint URL
+        queue: the calls waiting to be delivered, (method, params, ts)
+        in_flight: the number of requests currently in flight
+        sent: the number of requests sent
+        delivered: the number of calls delivered
+        failed: the number of calls whose request failed
+        dropped: the number of calls dropped because the queue was full
+        latency: the total delivery latency (ms), from enqueue to reply
+        max_latency: the longest delivery latency (ms)
+    """
+
+    def __init__(self, url):
+
+        self.url = url
+        self.queue = deque()
+        self.in_flight = 0
+        self.sent = 0
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.latency = 0.0
+        self.max_latency = 0.0
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        done = self.delivered + self.failed
+
+        return {'url': self.url,
+                'queue': len(self.queue),
+                'in_flight': self.in_flight,
+                'sent': self.sent,
+                'delivered': self.delivered,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'avg_latency': self.latency / done if done else 0,
+                'max_latency': self.max_latency}
+
+
+class CallbackTransport(object):
+    """Deliver XML-RPC callbacks without blocking the IOLoop.
+
+    Calls are queued per endpoint and sent with Tornado's AsyncHTTPClient.
+    At most max_in_flight requests are outstanding for any endpoint, calls
+    exceeding max_queue push out the oldest queued call. When max_batch is
+    greater than one, queued calls are sent together using the
+    system.multicall XML-RPC extension (the remote server must support it).
+
+    Persistent connections are used when pycurl is available (install the
+    'callbacks' extra), otherwise the transport falls back to the simple
+    HTTP client which opens a new connection for every request.
+
+    Attributes:
+        max_in_flight: maximum number of requests in flight per endpoint
+        max_queue: maximum number of queued calls per endpoint
+        max_batch: maximum number of calls per request
+        endpoints: dictionary of endpoints, url -> CallbackEndpoint
+    """
+
+    def __init__(self, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 max_queue=DEFAULT_MAX_QUEUE, max_batch=DEFAULT_MAX_BATCH,
+                 timeout=DEFAULT_TIMEOUT):
+
+        self.max_in_flight = int(max_in_flight)
+        self.max_queue = int(max_queue)
+        self.max_batch = int(max_batch)
+        self.timeout = int(timeout)
+        self.endpoints = {}
+        self.__client = None
+
+    @property
+    def client(self):
+        """Return the HTTP client, created at the first call."""
+
+        if not self.__client:
+
+            if not KEEP_ALIVE:
+                LOG.warning("pycurl not found, callbacks will not use "
+                            "persistent connections (pip install "
+                            "empower-runtime[callbacks])")
+
+            self.__client = HTTP_CLIENT(force_instance=True,
+                                        max_clients=DEFAULT_MAX_CLIENTS)
+
+        return self.__client
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        return {'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue,
+                'max_batch': self.max_batch,
+                'keep_alive': KEEP_ALIVE,
+                'endpoints': [x.to_dict() for x in self.endpoints.values()]}
+
+    def send(self, url, method, params=()):
+        """Queue a new call.
+
+        Args:
+            url: the URL of the remote XML-RPC server
+            method: the remote method name
+            params: the call parameters
+
+        Returns:
+            None
+        """
+
+        if url not in self.endpoints:
+
+            if urlsplit(url).scheme not in ('http', 'https'):
+                raise ValueError("Invalid callback URL %s" % url)
+
+            self.endpoints[url] = CallbackEndpoint(url)
+
+        endpoint = self.endpoints[url]
+
+        if len(endpoint.queue) >= self.max_queue:
+            endpoint.queue.popleft()
+            endpoint.dropped += 1
+
+        endpoint.queue.append((method, tuple(params), time.time()))
+
+        self.__dispatch(endpoint)
+
+    def __dispatch(self, endpoint):
+        """Send as many queued calls as the in-flight bound allows."""
+
+        while endpoint.queue and endpoint.in_flight < self.max_in_flight:
+
+            batch = []
+
+            while endpoint.queue and len(batch) < self.max_batch:
+                batch.append(endpoint.queue.popleft())
+
+            if len(batch) == 1:
+                method, params, _ = batch[0]
+                body = xmlrpc.client.dumps(params, method)
+            else:
+                calls = [{'methodName': x[0], 'params': list(x[1])}
+                         for x in batch]
+                body = xmlrpc.client.dumps((calls, ), 'system.multicall')
+
+            request = HTTPRequest(endpoint.url,
+                                  method="POST",
+                                  body=body,
+                                  headers={'Content-Type': 'text/xml',
+                                           'Connection': 'keep-alive'},
+                                  request_timeout=self.timeout)
+
+            endpoint.in_flight += 1
+            endpoint.sent += 1
+
+            self.client.fetch(request,
+                              lambda response, batch=batch:
+                              self.__on_response(endpoint, batch, response))
+
+    def __on_response(self, endpoint, batch, response):
+        """Account for a completed request and send the next ones."""
+
+        endpoint.in_flight -= 1
+
+        now = time.time()
+
+        if response.error:
+            LOG.error("Callback to %s failed: %s", endpoint.url,
+                      response.error)
+            endpoint.failed += len(batch)
+        else:
+            failed = self.__check_faults(endpoint, batch, response.body)
+            endpoint.failed += failed
+            endpoint.delivered += len(batch) - failed
+
+        for _, _, enqueued in batch:
+            latency = (now - enqueued) * 1000
+            endpoint.latency += latency
+            endpoint.max_latency = max(endpoint.max_latency, latency)
+
+        self.__dispatch(endpoint)
+
+    @classmethod
+    def __check_faults(cls, endpoint, batch, body):
+        """Parse an XML-RPC reply and return the number of failed calls.
+
+        XML-RPC faults are returned with HTTP status 200, for a multicall
+        each call may fail independently.
+        """
+
+        try:
+            result, _ = xmlrpc.client.loads(body)
+        except xmlrpc.client.Fault as fault:
+            LOG.error("Callback to %s failed: %s", endpoint.url, fault)
+            return len(batch)
+        except (xmlrpc.client.ResponseError, ExpatError) as ex:
+            LOG.error("Callback to %s invalid reply: %s", endpoint.url, ex)
+            return len(batch)
+
+        if len(batch) == 1:
+            return 0
+
+        failed = 0
+
+        for (method, _, _), reply in zip(batch, result[0]):
+
+            if isinstance(reply, dict):
+                LOG.error("Callback %s to %s failed: %s", method,
+                          endpoint.url, reply.get('faultString'))
+                failed += 1
+
+        return failed
+
+
+class CallbackTransportHandler(EmpowerAPIHandler):
+    """Callback transport handler. Used to query the delivery statistics of
+    the remote callbacks."""
+
+    HANDLERS = [r"/api/v1/callbacks/?"]
+
+    def get(self, *args, **kwargs):
+        """ Return the callback transport statistics.
+
+        Example URLs:
+            GET /api/v1/callbacks
+        """
+
+        self.write_as_json(self.server.to_dict())
+
+
+TRANSPORT = CallbackTransport()
+
+
+def launch(max_in_flight=DEFAULT_MAX_IN_FLIGHT, max_queue=DEFAULT_MAX_QUEUE,
+           max_batch=DEFAULT_MAX_BATCH, timeout=DEFAULT_TIMEOUT):
+    """Configure the callback transport."""
+
+    TRANSPORT.max_in_flight = int(max_in_flight)
+    TRANSPORT.max_queue = int(max_queue)
+    TRANSPORT.max_batch = int(max_batch)
+    TRANSPORT.timeout = int(timeout)
+
+    rest_server = RUNTIME.components[RESTServer.__module__]
+    rest_server.add_handler_class(CallbackTransportHandler, TRANSPORT)
+
+    LOG.info("Callback transport %u requests in flight, %u queued calls, "
+             "%u calls per request", TRANSPORT.max_in_flight,
+             TRANSPORT.max_queue, TRANSPORT.max_batch)
+
+    return TRANSPORT
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Record signalling traffic to a compact binary log.
+
+When enabled, the LVAPP, VBSP and LVNFP connections append every inbound
+frame and every outbound write to a capture log. The log is a sequence of
+records, each made of a fixed header followed by the raw bytes:
+
+    timestamp (double), protocol (u8), kind (u8), connection id (u32),
+    length (u32), data
+
+Connection ids are assigned by the capture when the connection is opened;
+the OPEN record carries the remote address, the CLOSE record is empty.
+
+Writes are buffered and flushed periodically. When the log grows above
+max_bytes it is rotated, i.e. <path> is renamed to <path>.1, <path>.1 to
+<path>.2 and so on, keeping at most max_files rotated files.
+
+Captures can be played back with empower.core.replay.
+"""
+
+import os
+import time
+import struct
+
+from collections import namedtuple
+
+from empower.core.timerwheel import TIMERS
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+MAGIC = b"EMPCAP01"
+RECORD = struct.Struct("!dBBII")
+
+PROTO_LVAPP = 0x01
+PROTO_VBSP = 0x02
+PROTO_LVNFP = 0x03
+
+PROTOCOLS = {PROTO_LVAPP: "lvapp",
+             PROTO_VBSP: "vbsp",
+             PROTO_LVNFP: "lvnfp"}
+
+KIND_OPEN = 0x00
+KIND_IN = 0x01
+KIND_OUT = 0x02
+KIND_CLOSE = 0x03
+
+DEFAULT_PATH = "empower.cap"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_FILES = 4
+DEFAULT_BUFFER = 256 * 1024
+DEFAULT_FLUSH_EVERY = 1000
+
+Record = namedtuple("Record", ["ts", "proto", "kind", "conn", "data"])
+
+
+class CaptureWriter(object):
+    """Append-only, rotating capture log writer.
+
+    Attributes:
+        path: the log file path
+        max_bytes: the size (bytes) above which the log is rotated
+        max_files: the number of rotated files to keep
+        buffer: the write buffer size (bytes)
+        size: the current log file size (bytes)
+        rotations: the number of rotations performed so far
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES,
+                 max_files=DEFAULT_MAX_FILES, buffer=DEFAULT_BUFFER):
+
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.max_files = int(max_files)
+        self.buffer = int(buffer)
+        self.size = 0
+        self.rotations = 0
+        self.__file = None
+        self.__open()
+
+    def __open(self):
+
+        self.__file = open(self.path, "ab", buffering=self.buffer)
+        self.size = self.__file.tell()
+
+        if not self.size:
+            self.__file.write(MAGIC)
+            self.size = len(MAGIC)
+
+    def write(self, proto, kind, conn, data):
+        """Append a record to the log."""
+
+        self.__file.write(RECORD.pack(time.time(), proto, kind, conn,
+                                      len(data)))
+        self.__file.write(data)
+        self.size += RECORD.size + len(data)
+
+        if self.size >= self.max_bytes:
+            self.rotate()
+
+    def flush(self):
+        """Write the buffered records to disk."""
+
+        self.__file.flush()
+
+    def rotate(self):
+        """Close the current log and start a new one."""
+
+        self.__file.close()
+
+        for index in range(self.max_files - 1, 0, -1):
+            src = "%s.%u" % (self.path, index)
+            if os.path.exists(src):
+                os.replace(src, "%s.%u" % (self.path, index + 1))
+
+        if self.max_files:
+            os.replace(self.path, "%s.1" % self.path)
+        else:
+            os.remove(self.path)
+
+        self.rotations += 1
+        self.__open()
+
+    def close(self):
+        """Flush and close the log."""
+
+        self.__file.close()
+
+
+class Capture(object):
+    """The controller-wide signalling capture.
+
+    Connections ask for a capture id when they are created, a capture id
+    equal to 0 means that the capture is disabled.
+
+    Attributes:
+        writer: the CaptureWriter, None if the capture is disabled
+        flush_every: the flush period (ms)
+        connections: the number of connections captured so far
+        records: the number of records written so far
+    """
+
+    def __init__(self):
+
+        self.writer = None
+        self.flush_every = DEFAULT_FLUSH_EVERY
+        self.connections = 0
+        self.records = 0
+        self.__flusher = None
+
+    @property
+    def enabled(self):
+        """Return True if the capture is running."""
+
+        return self.writer is not None
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        out = {'enabled': self.enabled,
+               'connections': self.connections,
+               'records': self.records}
+
+        if self.writer:
+            out['path'] = self.writer.path
+            out['size'] = self.writer.size
+            out['max_bytes'] = self.writer.max_bytes
+            out['max_files'] = self.writer.max_files
+            out['rotations'] = self.writer.rotations
+
+        return out
+
+    def start(self, path, max_bytes=DEFAULT_MAX_BYTES,
+              max_files=DEFAULT_MAX_FILES, buffer=DEFAULT_BUFFER):
+        """Start capturing to path."""
+
+        self.stop()
+        self.writer = CaptureWriter(path, max_bytes, max_files, buffer)
+        self.__flusher = TIMERS.add(self.writer.flush, self.flush_every)
+
+    def stop(self):
+        """Stop capturing and close the log."""
+
+        if not self.writer:
+            return
+
+        self.__flusher.stop()
+        self.__flusher = None
+        self.writer.close()
+        self.writer = None
+
+    def open(self, proto, addr):
+        """Register a new connection and return its capture id.
+
+        Args:
+            proto: the protocol id
+            addr: the remote address, either a string or a (host, port)
+              tuple
+
+        Returns:
+            the capture id, 0 if the capture is disabled
+        """
+
+        if not self.writer:
+            return 0
+
+        if isinstance(addr, tuple):
+            addr = "%s:%u" % addr[:2]
+
+        self.connections += 1
+        self.write(proto, KIND_OPEN, self.connections, str(addr).encode())
+
+        return self.connections
+
+    def close(self, proto, conn):
+        """Record the end of a connection."""
+
+        self.write(proto, KIND_CLOSE, conn, b"")
+
+    def write(self, proto, kind, conn, data):
+        """Append a record, if the capture is running."""
+
+        if not self.writer or not conn:
+            return
+
+        self.writer.write(proto, kind, conn, data)
+        self.records += 1
+
+
+def capture_files(path):
+    """Return the log files of a capture, oldest first."""
+
+    rotated = []
+    index = 1
+
+    while os.path.exists("%s.%u" % (path, index)):
+        rotated.append("%s.%u" % (path, index))
+        index += 1
+
+    files = list(reversed(rotated))
+
+    if os.path.exists(path):
+        files.append(path)
+
+    return files
+
+
+def read_capture(path):
+    """Yield the records of a capture log file.
+
+    Raises:
+        ValueError, if the file is not a capture log
+    """
+
+    with open(path, "rb") as log:
+
+        if log.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Invalid capture file %s" % path)
+
+        while True:
+
+            header = log.read(RECORD.size)
+
+            if len(header) < RECORD.size:
+                return
+
+            ts, proto, kind, conn, length = RECORD.unpack(header)
+            data = log.read(length)
+
+            # the tail of a log that was not closed may be truncated
+            if len(data) < length:
+                return
+
+            yield Record(ts, proto, kind, conn, data)
+
+
+CAPTURE = Capture()
+
+
+def launch(path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES,
+           max_files=DEFAULT_MAX_FILES, buffer=DEFAULT_BUFFER,
+           flush_every=DEFAULT_FLUSH_EVERY):
+    """Start capturing the signalling traffic."""
+
+    CAPTURE.flush_every = int(flush_every)
+    CAPTURE.start(path, int(max_bytes), int(max_files), int(buffer))
+
+    LOG.info("Capturing signalling traffic to %s", path)
+
+    return CAPTURE
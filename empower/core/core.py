@@ -36,6 +36,8 @@ from empower.persistence.persistence import TblBelongs
 from empower.persistence.persistence import TblPendingTenant
 from empower.core.account import Account
 from empower.core.tenant import Tenant
+from empower.core.tenant import T_TYPE_SHARED
+from empower.core.tenant import T_TYPE_UNIQUE
 from empower.core.acl import ACL
 from empower.persistence.persistence import TblAllow
 from empower.persistence.persistence import TblDeny
@@ -95,6 +97,11 @@ class EmpowerRuntime(object):
         self.allowed = {}
         self.denied = {}
 
+        # indexes used by the LVAPP handlers
+        self.tenant_names = {}
+        self.wtp_ssids = {}
+        self.wtp_shared_vaps = {}
+
         LOG.info("Starting EmPOWER Runtime")
 
         # generate default users if database is empty
@@ -133,6 +140,9 @@ class EmpowerRuntime(object):
                        tenant.desc,
                        tenant.bssid_type)
 
+            self.tenant_names[tenant.tenant_name] = \
+                self.tenants[tenant.tenant_id]
+
     def __load_acl(self):
         """ Load ACL list. """
 
@@ -409,6 +419,9 @@ class EmpowerRuntime(object):
                    desc,
                    request.bssid_type)
 
+        self.tenant_names[request.tenant_name] = \
+            self.tenants[request.tenant_id]
+
         return request.tenant_id
 
     @classmethod
@@ -497,6 +510,15 @@ class EmpowerRuntime(object):
             session.delete(dev)
             session.commit()
 
+        # remove tenant from indexes
+        for wtp in tenant.wtps.values():
+            self.unindex_pnfdev(tenant, wtp)
+
+        for vap in tenant.vaps.values():
+            self.unindex_vap(tenant, vap)
+
+        del self.tenant_names[tenant.tenant_name]
+
         # remove tenant
         del self.tenants[tenant_id]
 
@@ -511,14 +533,11 @@ class EmpowerRuntime(object):
         # remove running modules
         for component in self.components.values():
 
-            if not hasattr(component, 'modules'):
+            if not hasattr(component, 'tenant_modules'):
                 continue
 
-            to_be_removed = []
-
-            for module in component.modules.values():
-                if module.tenant_id == tenant_id:
-                    to_be_removed.append(module.module_id)
+            modules = component.tenant_modules.get(tenant_id, {})
+            to_be_removed = list(modules.keys())
 
             for module_id in to_be_removed:
                 component.remove_module(module_id)
@@ -526,8 +545,54 @@ class EmpowerRuntime(object):
     def load_tenant(self, tenant_name):
         """Load tenant from network name."""
 
-        for tenant in self.tenants.values():
-            if tenant.tenant_name == tenant_name:
-                return tenant
+        return self.tenant_names.get(tenant_name)
+
+    def index_pnfdev(self, tenant, pnfdev):
+        """Index the SSID of an unique tenant on one of its WTPs."""
+
+        if pnfdev.ALIAS != "wtps" or tenant.bssid_type != T_TYPE_UNIQUE:
+            return
+
+        if pnfdev.addr not in self.wtp_ssids:
+            self.wtp_ssids[pnfdev.addr] = set()
+
+        self.wtp_ssids[pnfdev.addr].add(tenant.tenant_name)
+
+    def unindex_pnfdev(self, tenant, pnfdev):
+        """Remove the SSID of an unique tenant from one of its WTPs."""
+
+        if pnfdev.ALIAS != "wtps" or pnfdev.addr not in self.wtp_ssids:
+            return
+
+        ssids = self.wtp_ssids[pnfdev.addr]
+        ssids.discard(tenant.tenant_name)
+
+        if not ssids:
+            del self.wtp_ssids[pnfdev.addr]
+
+    def index_vap(self, tenant, vap):
+        """Index the BSSID of a shared tenant VAP on its WTP."""
+
+        if tenant.bssid_type != T_TYPE_SHARED:
+            return
+
+        if vap.wtp.addr not in self.wtp_shared_vaps:
+            self.wtp_shared_vaps[vap.wtp.addr] = {}
+
+        self.wtp_shared_vaps[vap.wtp.addr][vap.net_bssid] = vap
+
+    def unindex_vap(self, tenant, vap):
+        """Remove the BSSID of a shared tenant VAP from its WTP."""
+
+        if tenant.bssid_type != T_TYPE_SHARED:
+            return
+
+        vaps = self.wtp_shared_vaps.get(vap.wtp.addr)
+
+        if not vaps or vaps.get(vap.net_bssid) is not vap:
+            return
+
+        del vaps[vap.net_bssid]
 
-        return None
+        if not vaps:
+            del self.wtp_shared_vaps[vap.wtp.addr]
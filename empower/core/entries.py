@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Bulk decoding of the entry arrays carried by module responses.
+
+Poller and summary responses end with an array of fixed-size entries, each
+starting with a station address. Instead of decoding every entry into a
+Python object, the array is kept as raw bytes and viewed as a NumPy
+structured array. The module address mask is then applied to all the
+entries in one vectorized step, so that no object is created for the
+entries that are filtered out.
+
+The entry layout is described by a NumPy dtype whose address field must be
+named 'addr' and must be a 6 bytes void ('V6'), e.g.:
+
+    ENTRY = np.dtype([('addr', 'V6'), ('rssi', '>i4')])
+"""
+
+import numpy as np
+
+
+def parse_entries(data, dtype, count):
+    """Return a structured array view over the first count entries.
+
+    Raises:
+        ValueError, if data holds less than count entries
+    """
+
+    if len(data) < count * dtype.itemsize:
+        raise ValueError("Expected %u entries, got %u bytes" %
+                         (count, len(data)))
+
+    return np.frombuffer(data, dtype=dtype, count=count)
+
+
+def filter_entries(data, dtype, count, mask):
+    """Return the entries whose address matches mask.
+
+    An entry matches if its address ANDed with the mask is the address
+    itself, i.e. the same rule as EtherAddress.match.
+
+    Args:
+        data: the raw entry array
+        dtype: the entry dtype
+        count: the number of entries
+        mask: the address mask (EtherAddress)
+
+    Returns:
+        a structured array with the matching entries
+    """
+
+    entries = parse_entries(data, dtype, count)
+    raw_mask = mask.to_raw()
+
+    if raw_mask == b'\xff' * 6 or not count:
+        return entries
+
+    addrs = np.ndarray((count, 6), dtype=np.uint8, buffer=data,
+                       offset=dtype.fields['addr'][1],
+                       strides=(dtype.itemsize, 1))
+
+    mask = np.frombuffer(raw_mask, dtype=np.uint8)
+    keep = ((addrs & mask) == addrs).all(axis=1)
+
+    return entries[keep]
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Streaming decoder for length-prefixed signalling frames."""
+
+
+class FrameDecoder(object):
+    """Streaming decoder for length-prefixed frames.
+
+    Bytes read from the socket are written straight into a preallocated
+    receive buffer (see writable()). Once new data has been committed,
+    frames() yields every complete frame currently held by the buffer as a
+    memoryview slice, i.e. without copying. Whatever is left (a partial
+    header or a partial body) is moved to the head of the buffer the next
+    time writable() is called.
+
+    Frames yielded by frames() are only valid until the next call to
+    writable(), handlers must copy any data they want to keep.
+
+    Attributes:
+        hdr_len: the number of bytes needed to compute the frame length
+        frame_len: a function taking (view, offset) and returning the total
+          length of the frame starting at offset, header included
+        max_frame: the maximum frame length accepted (bytes)
+    """
+
+    def __init__(self, hdr_len, frame_len, max_frame):
+
+        self.hdr_len = hdr_len
+        self.frame_len = frame_len
+        self.max_frame = max_frame
+        self.__buffer = bytearray(max_frame)
+        self.__view = memoryview(self.__buffer)
+        self.__start = 0
+        self.__end = 0
+
+    @property
+    def pending(self):
+        """Return the number of buffered bytes not yet decoded."""
+
+        return self.__end - self.__start
+
+    def writable(self):
+        """Return the free tail of the receive buffer.
+
+        The leftover of the previous read, if any, is moved to the head of
+        the buffer before returning.
+        """
+
+        if self.__start == self.__end:
+            self.__start = 0
+            self.__end = 0
+        elif self.__start > 0:
+            pending = self.__end - self.__start
+            self.__view[0:pending] = self.__view[self.__start:self.__end]
+            self.__start = 0
+            self.__end = pending
+
+        return self.__view[self.__end:]
+
+    def commit(self, nbytes):
+        """Mark nbytes of the writable area as filled."""
+
+        self.__end += nbytes
+
+    def frames(self):
+        """Yield every complete frame in the buffer.
+
+        Raises:
+            ValueError, if a frame length is shorter than the header or
+              exceeds max_frame
+        """
+
+        while self.__end - self.__start >= self.hdr_len:
+
+            length = self.frame_len(self.__view, self.__start)
+
+            if length < self.hdr_len or length > self.max_frame:
+                raise ValueError("Invalid frame length %u" % length)
+
+            if self.__end - self.__start < length:
+                return
+
+            frame = self.__view[self.__start:self.__start + length]
+            self.__start += length
+
+            yield frame
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Identifier allocator with a recycled free-list."""
+
+from collections import deque
+
+DEFAULT_QUARANTINE = 1024
+
+
+class IdAllocator(object):
+    """Allocate integer identifiers in O(1).
+
+    Released identifiers first wait in a bounded FIFO quarantine, so that a
+    late response carrying a recently released identifier is not delivered
+    to a new owner. Once out of quarantine they go to the free-list, which
+    is used before handing out new identifiers sequentially from first to
+    last, skipping the reserved ones. The quarantine is drained only when
+    both the free-list and the sequential range are exhausted.
+
+    The free-list never holds more identifiers than the peak number of
+    identifiers in use, and the quarantine never more than its size.
+
+    Attributes:
+        first: the first identifier (int)
+        last: the last identifier (int)
+        reserved: identifiers that are never allocated (frozenset)
+        quarantine: the number of released identifiers held back (int)
+    """
+
+    def __init__(self, first=0, last=2**32 - 1, reserved=(),
+                 quarantine=DEFAULT_QUARANTINE):
+
+        if first > last:
+            raise ValueError("Invalid range %d-%d" % (first, last))
+
+        self.first = first
+        self.last = last
+        self.reserved = frozenset(reserved)
+        self.quarantine = int(quarantine)
+        self.__next = first
+        self.__quarantine = deque()
+        self.__free = deque()
+        self.__used = set()
+
+    def allocate(self):
+        """Return a new identifier.
+
+        Raises:
+            ValueError, if no identifiers are left
+        """
+
+        if self.__free:
+            ident = self.__free.popleft()
+            self.__used.add(ident)
+            return ident
+
+        while self.__next <= self.last:
+            ident = self.__next
+            self.__next += 1
+            if ident not in self.reserved:
+                self.__used.add(ident)
+                return ident
+
+        if not self.__quarantine:
+            raise ValueError("No ids left to assign")
+
+        ident = self.__quarantine.popleft()
+        self.__used.add(ident)
+
+        return ident
+
+    def release(self, ident):
+        """Return an identifier to the quarantine.
+
+        Identifiers that are not in use are ignored.
+        """
+
+        if ident not in self.__used:
+            return
+
+        self.__used.remove(ident)
+        self.__quarantine.append(ident)
+
+        if len(self.__quarantine) > self.quarantine:
+            self.__free.append(self.__quarantine.popleft())
+
+    def __contains__(self, ident):
+        return ident in self.__used
+
+    def __len__(self):
+        return len(self.__used)
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'first': self.first,
+                'last': self.last,
+                'used': len(self.__used),
+                'quarantine': len(self.__quarantine),
+                'free': len(self.__free)}
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""IOLoop stall detector and handler latency histograms.
+
+The controller runs on a single IOLoop, any callback blocking it delays
+every other device and REST request. The LoopMonitor measures how late a
+periodic callback is run by the IOLoop (the loop lag), while a watchdog
+thread logs the stack of the IOLoop thread whenever the loop has not run
+for longer than the stall threshold.
+
+The LVAPP, VBSP and LVNFP connections record the time spent handling every
+inbound message in per-message-type histograms, see HANDLER_LATENCY.
+
+Everything is exposed as JSON and in the Prometheus text format:
+
+    GET /api/v1/loopmonitor
+    GET /api/v1/loopmonitor/metrics
+"""
+
+import sys
+import time
+import bisect
+import threading
+import traceback
+
+import tornado.ioloop
+
+from empower.restserver.restserver import RESTServer
+from empower.restserver.apihandlers import EmpowerAPIHandler
+
+from empower.main import RUNTIME
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+DEFAULT_EVERY = 100
+DEFAULT_THRESHOLD = 100
+
+# histogram buckets upper bounds (s)
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+           0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram(object):
+    """A fixed-bucket latency histogram.
+
+    Attributes:
+        counts: the number of samples in each bucket, the last bucket
+          holds the samples larger than the last bound
+        count: the number of samples
+        sum: the sum of the samples (s)
+        max: the largest sample (s)
+    """
+
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        """Add a sample (s)."""
+
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """Return the upper bound of the bucket holding the q-th percentile.
+
+        Returns:
+            the bucket bound (s), the largest sample if the percentile falls
+            beyond the last bucket, None if there are no samples
+        """
+
+        if not self.count:
+            return None
+
+        rank = self.count * q / 100
+        seen = 0
+
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+
+        return self.max
+
+    def buckets(self):
+        """Yield the (bound, cumulative count) pairs."""
+
+        seen = 0
+
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            yield bound, seen
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        return {'count': self.count,
+                'sum': self.sum,
+                'mean': self.sum / self.count if self.count else 0,
+                'max': self.max,
+                'p50': self.percentile(50),
+                'p99': self.percentile(99),
+                'buckets': {str(bound): seen
+                            for bound, seen in self.buckets()}}
+
+
+class HandlerLatency(object):
+    """Per-message-type handler latency histograms.
+
+    Attributes:
+        histograms: the histograms, indexed by protocol and message type
+    """
+
+    def __init__(self):
+
+        self.histograms = {}
+
+    def observe(self, proto, msg_type, value):
+        """Record the time (s) spent handling a message."""
+
+        key = (proto, msg_type)
+
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+
+        self.histograms[key].observe(value)
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        out = {}
+
+        for (proto, msg_type), histogram in sorted(self.histograms.items(),
+                                                   key=str):
+            if proto not in out:
+                out[proto] = {}
+            out[proto][str(msg_type)] = histogram.to_dict()
+
+        return out
+
+
+class LoopMonitor(object):
+    """Measure the IOLoop lag and detect stalls.
+
+    Attributes:
+        every: the lag sampling period (ms)
+        threshold: the time (ms) the loop can be blocked before the stall
+          is logged
+        lag: the histogram of the loop lag
+        stalls: the number of stalls detected
+        max_stall: the longest stall (ms)
+        last_stall: the last stall, as a dict with ts, duration (ms) and
+          the stack of the IOLoop thread when the stall was detected
+    """
+
+    def __init__(self, every=DEFAULT_EVERY, threshold=DEFAULT_THRESHOLD):
+
+        self.every = int(every)
+        self.threshold = int(threshold)
+        self.lag = Histogram()
+        self.stalls = 0
+        self.max_stall = 0.0
+        self.last_stall = None
+        self.__expected = None
+        self.__beat = None
+        self.__stack = None
+        self.__thread_id = None
+        self.__watchdog = None
+        self.__running = False
+
+    @property
+    def running(self):
+        """Return True if the monitor is running."""
+
+        return self.__running
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        return {'every': self.every,
+                'threshold': self.threshold,
+                'running': self.running,
+                'lag': self.lag.to_dict(),
+                'stalls': self.stalls,
+                'max_stall': self.max_stall,
+                'last_stall': self.last_stall}
+
+    def start(self):
+        """Start monitoring the current IOLoop."""
+
+        if self.__running:
+            return
+
+        self.__running = True
+        self.__thread_id = threading.get_ident()
+        self.__beat = time.monotonic()
+        self.__schedule()
+
+        self.__watchdog = threading.Thread(target=self.__watch,
+                                           name="loopmonitor", daemon=True)
+        self.__watchdog.start()
+
+    def stop(self):
+        """Stop monitoring."""
+
+        self.__running = False
+
+    def __schedule(self):
+
+        self.__expected = time.monotonic() + self.every / 1000
+        tornado.ioloop.IOLoop.current().call_later(self.every / 1000,
+                                                   self.__tick)
+
+    def __tick(self):
+
+        now = time.monotonic()
+        lag = max(now - self.__expected, 0)
+
+        self.__beat = now
+        self.lag.observe(lag)
+
+        if lag * 1000 > self.threshold:
+
+            self.stalls += 1
+            self.max_stall = max(self.max_stall, lag * 1000)
+            self.last_stall = {'ts': time.time(),
+                               'duration': lag * 1000,
+                               'stack': self.__stack}
+            self.__stack = None
+
+        if self.__running:
+            self.__schedule()
+
+    def __watch(self):
+
+        reported = None
+
+        while self.__running:
+
+            time.sleep(self.threshold / 2000)
+
+            beat = self.__beat
+            blocked = time.monotonic() - beat - self.every / 1000
+
+            if blocked * 1000 <= self.threshold or beat == reported:
+                continue
+
+            reported = beat
+            frame = sys._current_frames().get(self.__thread_id)
+
+            if frame is None:
+                continue
+
+            stack = "".join(traceback.format_stack(frame))
+            self.__stack = stack
+
+            LOG.warning("IOLoop blocked for more than %u ms:\n%s",
+                        blocked * 1000, stack)
+
+
+def histogram_metrics(name, labels, histogram):
+    """Return the Prometheus samples of a histogram."""
+
+    lines = []
+
+    for bound, seen in histogram.buckets():
+        lines.append('%s_bucket{%sle="%s"} %u' %
+                     (name, labels, bound, seen))
+
+    lines.append('%s_bucket{%sle="+Inf"} %u' %
+                 (name, labels, histogram.count))
+
+    labels = "{%s}" % labels.rstrip(",") if labels else ""
+
+    lines.append('%s_sum%s %f' % (name, labels, histogram.sum))
+    lines.append('%s_count%s %u' % (name, labels, histogram.count))
+
+    return lines
+
+
+def prometheus_metrics(monitor, latency):
+    """Return the metrics in the Prometheus text format."""
+
+    lines = ["# HELP empower_ioloop_lag_seconds IOLoop callback lag.",
+             "# TYPE empower_ioloop_lag_seconds histogram"]
+
+    lines += histogram_metrics("empower_ioloop_lag_seconds", "",
+                               monitor.lag)
+
+    lines += ["# HELP empower_ioloop_stalls_total IOLoop stalls longer "
+              "than the threshold.",
+              "# TYPE empower_ioloop_stalls_total counter",
+              "empower_ioloop_stalls_total %u" % monitor.stalls,
+              "# HELP empower_ioloop_max_stall_seconds Longest IOLoop stall.",
+              "# TYPE empower_ioloop_max_stall_seconds gauge",
+              "empower_ioloop_max_stall_seconds %f" %
+              (monitor.max_stall / 1000)]
+
+    lines += ["# HELP empower_handler_latency_seconds Time spent handling "
+              "an inbound message.",
+              "# TYPE empower_handler_latency_seconds histogram"]
+
+    for (proto, msg_type), histogram in sorted(latency.histograms.items(),
+                                               key=str):
+        labels = 'protocol="%s",type="%s",' % (proto, msg_type)
+        lines += histogram_metrics("empower_handler_latency_seconds", labels,
+                                   histogram)
+
+    return "\n".join(lines) + "\n"
+
+
+class LoopMonitorHandler(EmpowerAPIHandler):
+    """Loop monitor handler. Used to query the IOLoop lag, the stalls and
+    the handler latency histograms."""
+
+    HANDLERS = [r"/api/v1/loopmonitor/?",
+                r"/api/v1/loopmonitor/(metrics)/?"]
+
+    def get(self, *args, **kwargs):
+        """ Return the loop monitor statistics.
+
+        Args:
+            metrics: return the Prometheus text format (optional)
+
+        Example URLs:
+            GET /api/v1/loopmonitor
+            GET /api/v1/loopmonitor/metrics
+        """
+
+        if args:
+            self.set_header('Content-Type', 'text/plain; version=0.0.4')
+            self.write(prometheus_metrics(self.server, HANDLER_LATENCY))
+            return
+
+        out = self.server.to_dict()
+        out['handlers'] = HANDLER_LATENCY.to_dict()
+
+        self.write_as_json(out)
+
+
+HANDLER_LATENCY = HandlerLatency()
+LOOP_MONITOR = LoopMonitor()
+
+
+def launch(every=DEFAULT_EVERY, threshold=DEFAULT_THRESHOLD):
+    """Start the loop monitor."""
+
+    LOOP_MONITOR.every = int(every)
+    LOOP_MONITOR.threshold = int(threshold)
+    LOOP_MONITOR.start()
+
+    rest_server = RUNTIME.components[RESTServer.__module__]
+    rest_server.add_handler_class(LoopMonitorHandler, LOOP_MONITOR)
+
+    LOG.info("Loop monitor every %u ms, stall threshold %u ms",
+             LOOP_MONITOR.every, LOOP_MONITOR.threshold)
+
+    return LOOP_MONITOR
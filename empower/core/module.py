@@ -30,22 +30,24 @@
 import re
 import json
 import types
-import xmlrpc.client
 
 import tornado.web
 import tornado.httpserver
-from tornado.ioloop import IOLoop
 
 from uuid import UUID
-from multiprocessing.pool import ThreadPool
 
 import empower.logger
 
-from protobuf_to_dict import protobuf_to_dict
+from empower.vbspp.accessors import message_xid
 
 from empower.core.jsonserializer import EmpowerEncoder
+from empower.core.timerwheel import TIMERS
+from empower.core.idallocator import IdAllocator
+from empower.core.callbacktransport import TRANSPORT
+from empower.restserver.apihandlers import EmpowerAPIHandler
 from empower.restserver.apihandlers import EmpowerAPIHandlerAdminUsers
 from empower.restserver.restserver import RESTServer
+from empower.restserver.streamhandler import STREAM
 from empower.lvapp.lvappserver import LVAPPServer
 from empower.lvnfp.lvnfpserver import LVNFPServer
 from empower.vbspp.vbspserver import VBSPServer
@@ -55,32 +57,41 @@ from empower.main import RUNTIME
 LOG = empower.logger.get_logger()
 
 
-_WORKERS = ThreadPool(10)
-
-
 def exec_xmlrpc(callback, args=()):
     """Execute XML-RPC call."""
 
     LOG.info("Calling %s:%s", callback[0], callback[1])
 
-    proxy = xmlrpc.client.ServerProxy(callback[0])
-    func = getattr(proxy, callback[1])
-    run_background(func, on_complete, args)
+    TRANSPORT.send(callback[0], callback[1], args)
 
 
-def run_background(func, callback, args=(), kwds={}):
-    """Run callback in background."""
+class ModulePayload(object):
+    """Lazily serialized module result.
 
-    def _callback(result):
-        IOLoop.instance().add_callback(lambda: callback(result))
+    The JSON representation of the result is built the first time it is
+    requested and then shared by every remote subscriber. Local callbacks
+    receive the original object and never pay for the serialization.
 
-    _WORKERS.apply_async(func, args, kwds, _callback)
+    Attributes:
+        serializable: an object implementing the to_dict() method
+    """
 
+    __slots__ = ('serializable', '_json')
 
-def on_complete(res):
-    """XML RPC Callback."""
+    def __init__(self, serializable):
+
+        self.serializable = serializable
+        self._json = None
+
+    @property
+    def json(self):
+        """Return the JSON representation of the result."""
 
-    pass
+        if self._json is None:
+            as_dict = self.serializable.to_dict()
+            self._json = json.dumps(as_dict, cls=EmpowerEncoder)
+
+        return self._json
 
 
 class ModuleHandler(EmpowerAPIHandlerAdminUsers):
@@ -105,8 +116,7 @@ class ModuleHandler(EmpowerAPIHandlerAdminUsers):
                 raise ValueError("Invalid URL")
             tenant_id = UUID(args[0])
 
-            resp = {k: v for k, v in self.server.modules.items()
-                    if v.tenant_id == tenant_id}
+            resp = self.server.tenant_modules.get(tenant_id, {})
 
             if len(args) == 1:
                 self.write_as_json(resp.values())
@@ -221,7 +231,6 @@ class Module(object):
         self.__tenant_id = None
         self.__every = 5000
         self.__callback = None
-        self.__worker = None
         self.log = empower.logger.get_logger()
 
     def handle_callback(self, serializable):
@@ -234,6 +243,11 @@ class Module(object):
             None
         """
 
+        payload = ModulePayload(serializable)
+
+        # push result to the stream subscribers
+        STREAM.publish(self, payload)
+
         # call callback if defined
         if not self.callback:
             return
@@ -242,9 +256,6 @@ class Module(object):
 
         try:
 
-            as_dict = serializable.to_dict()
-            as_json = json.dumps(as_dict, cls=EmpowerEncoder)
-
             if isinstance(callback, types.FunctionType) or \
                isinstance(callback, types.MethodType):
 
@@ -252,7 +263,7 @@ class Module(object):
 
             elif isinstance(callback, list) and len(callback) == 2:
 
-                exec_xmlrpc(callback, (as_json, ))
+                exec_xmlrpc(callback, (payload.json, ))
 
             else:
 
@@ -335,32 +346,52 @@ class Module(object):
     def __hash__(self):
         return hash(str(self.tenant_id) + str(self.module_id))
 
+    @property
+    def key(self):
+        """Return the identity key of the module.
+
+        Modules with the same key are equivalent, the worker returns the
+        existing module instead of creating a new one. Subclasses extend the
+        key with their own parameters. A None key means that the module is
+        never deduplicated.
+        """
+
+        return (self.module_type, self.tenant_id, self.every)
+
     def __eq__(self, other):
 
         if isinstance(other, Module):
-            return self.module_type == other.module_type and \
-                self.tenant_id == other.tenant_id and \
-                self.every == other.every
+            key = self.key
+            return key is not None and key == other.key
 
         return False
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
+    @property
+    def target(self):
+        """Return the address of the PNFDev polled by this module.
+
+        Periodic modules with the same period and target are run in the
+        same scheduling round. Modules that do not talk to a specific
+        PNFDev return None.
+        """
+
+        return None
+
     def start(self):
         """Start worker."""
 
         if self.every == -1:
             self.run_once()
         else:
-            self.__worker = tornado.ioloop.PeriodicCallback(self.run_once,
-                                                            self.every)
-            self.__worker.start()
+            SCHEDULER.add(self)
 
     def stop(self):
         """Stop worker."""
 
-        self.__worker.stop()
+        SCHEDULER.remove(self)
 
     def run_once(self):
         """Period task."""
@@ -373,6 +404,122 @@ class Module(object):
         pass
 
 
+class ModuleScheduler(object):
+    """Group periodic modules into scheduling rounds.
+
+    Modules with the same period and the same target PNFDev share a single
+    timer task. Every time the task fires all the modules in the round are
+    run back to back, so their requests end up in the same outbound queue
+    flush of the PNFDev connection. The number of timer tasks (and of
+    wakeups) thus depends on the number of PNFDevs rather than on the
+    number of modules.
+
+    Attributes:
+        rounds: dictionary of rounds, (every, target) -> {id: module}
+        wakeups: the number of rounds executed so far
+        runs: the number of module run_once calls executed so far
+    """
+
+    def __init__(self):
+
+        self.rounds = {}
+        self.wakeups = 0
+        self.runs = 0
+        self.__tasks = {}
+        self.__keys = {}
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        return {'rounds': len(self.rounds),
+                'modules': len(self.__keys),
+                'wakeups': self.wakeups,
+                'runs': self.runs,
+                'saved_wakeups': self.runs - self.wakeups,
+                'runs_per_wakeup':
+                    self.runs / self.wakeups if self.wakeups else 0}
+
+    def add(self, module):
+        """Add a module to the round matching its period and target."""
+
+        if id(module) in self.__keys:
+            return
+
+        key = (module.every, module.target)
+
+        if key not in self.rounds:
+            self.rounds[key] = {}
+            self.__tasks[key] = TIMERS.add(lambda: self.run(key),
+                                           module.every)
+
+        self.rounds[key][id(module)] = module
+        self.__keys[id(module)] = key
+
+    def remove(self, module):
+        """Remove a module from its round."""
+
+        if id(module) not in self.__keys:
+            return
+
+        key = self.__keys.pop(id(module))
+
+        del self.rounds[key][id(module)]
+
+        if not self.rounds[key]:
+            del self.rounds[key]
+            self.__tasks.pop(key).stop()
+
+    def run(self, key):
+        """Run all the modules in a round."""
+
+        if key not in self.rounds:
+            return
+
+        self.wakeups += 1
+
+        moved = []
+
+        for module in list(self.rounds[key].values()):
+
+            # the module may have been removed by a previous one
+            if self.__keys.get(id(module)) != key:
+                continue
+
+            self.runs += 1
+
+            try:
+                module.run_once()
+            except Exception as ex:
+                LOG.exception(ex)
+
+            # the target may have changed, e.g. after an handover
+            if id(module) in self.__keys and module.target != key[1]:
+                moved.append(module)
+
+        for module in moved:
+            self.remove(module)
+            self.add(module)
+
+
+class ModuleSchedulerHandler(EmpowerAPIHandler):
+    """Module scheduler handler. Used to query the number of wakeups saved
+    by grouping the periodic modules."""
+
+    HANDLERS = [r"/api/v1/scheduler/?"]
+
+    def get(self, *args, **kwargs):
+        """ Return the module scheduler statistics.
+
+        Example URLs:
+            GET /api/v1/scheduler
+        """
+
+        self.write_as_json(self.server.to_dict())
+
+
+SCHEDULER = ModuleScheduler()
+
+
 class ModuleWorker(object):
     """Module worker.
 
@@ -381,6 +528,8 @@ class ModuleWorker(object):
     Attributes:
         module_id: Next module id
         modules: dictionary of modules currently active in this tenant
+        keys: dictionary of modules indexed by identity key
+        tenant_modules: dictionary of modules indexed by tenant id
     """
 
     MODULE_NAME = None
@@ -390,6 +539,9 @@ class ModuleWorker(object):
 
         self.__module_id = 0
         self.modules = {}
+        self.keys = {}
+        self.tenant_modules = {}
+        self.__module_keys = {}
         self.pt_type = pt_type
         self.pt_packet = pt_packet
         self.module = module
@@ -491,10 +643,11 @@ class ModuleWorker(object):
             raise KeyError("tenant %s not defined" % module.tenant_id)
 
         # check if an equivalent module has already been defined in the tenant
-        for val in self.modules.values():
-            # if so return a reference to that trigger
-            if val == module:
-                return val
+        # if so return a reference to that module
+        key = module.key
+
+        if key is not None and key in self.keys:
+            return self.keys[key]
 
         # otherwise generate a new module id
         module.module_id = self.module_id
@@ -505,8 +658,18 @@ class ModuleWorker(object):
         # start module
         module.start()
 
-        # add to dict
+        # add to dicts
         self.modules[module.module_id] = module
+
+        if key is not None:
+            self.keys[key] = module
+            self.__module_keys[module.module_id] = key
+
+        if module.tenant_id not in self.tenant_modules:
+            self.tenant_modules[module.tenant_id] = {}
+
+        self.tenant_modules[module.tenant_id][module.module_id] = module
+
         return module
 
     def remove_module(self, module_id):
@@ -525,11 +688,24 @@ class ModuleWorker(object):
         if module_id not in self.modules:
             return
 
-        if self.modules[module_id].every >= 0:
-            self.modules[module_id].stop()
+        module = self.modules[module_id]
+
+        if module.every >= 0:
+            module.stop()
 
         del self.modules[module_id]
 
+        key = self.__module_keys.pop(module_id, None)
+
+        if key is not None:
+            del self.keys[key]
+
+        tenant_modules = self.tenant_modules[module.tenant_id]
+        del tenant_modules[module_id]
+
+        if not tenant_modules:
+            del self.tenant_modules[module.tenant_id]
+
 
 class ModuleEventWorker(ModuleWorker):
     """Module event worker.
@@ -541,18 +717,32 @@ class ModuleEventWorker(ModuleWorker):
         modules: dictionary of modules currently active in this tenant
     """
 
+    def tenants(self, event):
+        """Return the ids of the tenants concerned by an event.
+
+        The default implementation returns every tenant with at least one
+        module, workers override it to narrow down the event delivery.
+        """
+
+        return list(self.tenant_modules.keys())
+
     def handle_packet(self, event):
         """Handle response message."""
 
-        for module in self.modules.values():
+        for tenant_id in self.tenants(event):
+
+            if tenant_id not in RUNTIME.tenants:
+                continue
 
-            if module.tenant_id not in RUNTIME.tenants:
+            if tenant_id not in self.tenant_modules:
                 continue
 
-            LOG.info("New event %s: (id=%u)", self.module.MODULE_NAME,
-                     module.module_id)
+            for module in list(self.tenant_modules[tenant_id].values()):
 
-            module.handle_response(event)
+                LOG.info("New event %s: (id=%u)", self.module.MODULE_NAME,
+                         module.module_id)
+
+                module.handle_response(event)
 
 
 class ModuleLVAPPWorker(ModuleWorker):
@@ -664,45 +854,47 @@ class ModuleVBSPPWorker(ModuleWorker):
     Attributes:
         module_id: Next module id
         modules: dictionary of modules currently active in this tenant
+        module_ids: the module id allocator (IdAllocator)
     """
 
     def __init__(self, module, pt_type, pt_packet=None):
+
+        from empower.vbspp import RESERVED_MODULE_IDS
+        from empower.vbspp import MAX_MODULE_ID
+
         ModuleWorker.__init__(self, VBSPServer.__module__, module, pt_type,
                               pt_packet)
 
-    def add_module(self, **kwargs):
-        """ Prevent assgining the same module_id to different modules"""
+        self.module_ids = IdAllocator(1, MAX_MODULE_ID, RESERVED_MODULE_IDS)
 
-        from empower.vbspp import RESERVED_MODULE_IDS
-        from empower.vbspp import MAX_MODULE_ID
+    @property
+    def module_id(self):
+        """Return new module id.
+
+        Module ids are used as xid of the requests sent to the VBSPs, they
+        are allocated skipping the reserved ids and recycled once the
+        module is removed.
+        """
 
-        no_module_id_flag = 0
+        return self.module_ids.allocate()
 
-        while True:
-            module_id = self.module_id
+    def remove_module(self, module_id):
+        """Remove a module and release its id."""
 
-            if module_id > MAX_MODULE_ID:
-                no_module_id_flag += 1
-                self.module_id = 0 # Reset the module_id
-                module_id = 0
-                if no_module_id_flag > 1:
-                    LOG.info("No module ids left to assign")
-                    return
+        from empower.vbspp.reporttimers import REPORT_TIMERS
 
-            if module_id not in RESERVED_MODULE_IDS and module_id not in self.modules:
-                # Decrement is because of the increment and then assginment in super().add_module function
-                self.module_id = module_id - 1
-                break
+        if module_id not in self.modules:
+            return
 
-        return super().add_module(**kwargs)
+        super().remove_module(module_id)
 
+        REPORT_TIMERS.remove(module_id)
+        self.module_ids.release(module_id)
 
     def handle_packet(self, response):
         """Handle response message."""
 
-        msg_type = response.WhichOneof("msg")
-        dict_form_msg = protobuf_to_dict(response)
-        id_module = dict_form_msg[msg_type]["header"]["xid"]
+        id_module = message_xid(response)
 
         if id_module not in self.modules:
             return
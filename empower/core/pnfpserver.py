@@ -322,6 +322,8 @@ class PNFPServer():
 
             tenant_pnfdevs[pnfdev.addr] = pnfdev
 
+            RUNTIME.index_pnfdev(tenant, pnfdev)
+
     def to_dict(self):
         """ Return a dict representation of the object. """
 
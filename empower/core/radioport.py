@@ -58,6 +58,8 @@ class RadioPort():
       block, the block that this port is configuring
     """
 
+    __slots__ = ('_lvap', '_block')
+
     def __init__(self, lvap, block):
 
         self._lvap = lvap
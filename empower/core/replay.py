@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Replay a signalling capture against a fresh runtime.
+
+The records of a capture (see empower.core.capture) are fed to new LVAPP,
+VBSP and LVNFP connection objects, as if the devices were connected to this
+controller. Inbound frames go through the same receive path used for live
+sockets, outbound traffic is counted and dropped.
+
+Captures can be replayed at the original speed, N times faster or as fast
+as possible (speed 0). At the end the tool reports, for every protocol, the
+number of messages replayed and the handler throughput, i.e. the messages
+handled per second of time spent in the handlers.
+
+The runtime is loaded from the configuration database, which must contain
+the devices seen in the capture.
+
+Usage:
+    python3 -m empower.core.replay empower.cap --speed 10
+"""
+
+import time
+import logging
+
+from collections import namedtuple
+from argparse import ArgumentParser
+
+import tornado.ioloop
+
+import empower.main
+from empower.core.core import EmpowerRuntime
+from empower.core.capture import capture_files
+from empower.core.capture import read_capture
+from empower.core.capture import PROTOCOLS
+from empower.core.capture import PROTO_LVAPP
+from empower.core.capture import PROTO_VBSP
+from empower.core.capture import PROTO_LVNFP
+from empower.core.capture import KIND_OPEN
+from empower.core.capture import KIND_IN
+from empower.core.capture import KIND_OUT
+from empower.core.capture import KIND_CLOSE
+
+# the protocol servers import modules which bind the runtime at import
+# time, they are imported only after the runtime has been created
+
+DEFAULT_SPEED = 0.0
+DEFAULT_BATCH = 1000
+
+ReplayRequest = namedtuple("ReplayRequest", ["remote_ip"])
+
+
+class ReplayStream(object):
+    """In-memory stand-in for the IOStream of a TCP connection.
+
+    The connection registers its receive buffer with read_into, feed copies
+    the replayed bytes into it and runs the read callback.
+
+    Attributes:
+        writes: the number of writes issued by the connection
+        written: the number of bytes written by the connection
+    """
+
+    def __init__(self):
+
+        self.writes = 0
+        self.written = 0
+        self.__buffer = None
+        self.__callback = None
+        self.__close_callback = None
+        self.__closed = False
+
+    def set_close_callback(self, callback):
+        """Set the callback run when the stream is closed."""
+
+        self.__close_callback = callback
+
+    def read_into(self, buffer, callback, partial=False):
+        """Register the buffer and the callback for the next read."""
+
+        self.__buffer = buffer
+        self.__callback = callback
+
+    def write(self, data):
+        """Count and drop the outbound data."""
+
+        self.writes += 1
+        self.written += len(data)
+
+    def closed(self):
+        """Return True if the stream has been closed."""
+
+        return self.__closed
+
+    def close(self):
+        """Close the stream and run the close callback."""
+
+        if self.__closed:
+            return
+
+        self.__closed = True
+
+        if self.__close_callback:
+            self.__close_callback()
+
+    def feed(self, data):
+        """Deliver data to the connection."""
+
+        view = memoryview(data)
+
+        while view and self.__callback and not self.__closed:
+            nbytes = min(len(view), len(self.__buffer))
+            self.__buffer[0:nbytes] = view[0:nbytes]
+            view = view[nbytes:]
+            callback = self.__callback
+            self.__callback = None
+            callback(nbytes)
+
+
+def lvnfp_endpoint(server, addr):
+    """Return an LVNFP handler bound to no socket."""
+
+    from empower.lvnfp.lvnfpmainhandler import LVNFPMainHandler
+
+    class ReplayLVNFPHandler(LVNFPMainHandler):
+        """LVNFP handler whose outbound messages are counted and dropped."""
+
+        def __init__(self):
+            self.request = ReplayRequest(addr)
+            self.writes = 0
+            self.written = 0
+            self.__closed = False
+            self.initialize(server)
+
+        def write_message(self, message, binary=False):
+            self.writes += 1
+            self.written += len(message)
+
+        def close(self, code=None, reason=None):
+            if self.__closed:
+                return
+            self.__closed = True
+            self.on_close()
+
+        def feed(self, data):
+            self.on_message(data.decode())
+
+    return ReplayLVNFPHandler()
+
+
+class ProtocolStats(object):
+    """Replay counters of a protocol.
+
+    Attributes:
+        connections: the number of connections replayed
+        messages: the number of inbound messages replayed
+        bytes: the number of inbound bytes replayed
+        outbound: the number of outbound writes found in the capture
+        replies: the number of outbound writes issued during the replay
+        handler_time: the time spent handling inbound messages (s)
+    """
+
+    def __init__(self):
+
+        self.connections = 0
+        self.messages = 0
+        self.bytes = 0
+        self.outbound = 0
+        self.replies = 0
+        self.handler_time = 0.0
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        return {'connections': self.connections,
+                'messages': self.messages,
+                'bytes': self.bytes,
+                'outbound': self.outbound,
+                'replies': self.replies,
+                'handler_time': self.handler_time,
+                'rate': self.messages / self.handler_time
+                        if self.handler_time else 0}
+
+
+class Replayer(object):
+    """Feed the records of a capture to fresh connections.
+
+    Attributes:
+        servers: the protocol servers, indexed by protocol id; records of
+          protocols without a server are skipped
+        speed: the replay speed, 1 is the original speed, 0 means as fast
+          as possible
+        stats: the ProtocolStats, indexed by protocol id
+        wall: the replay duration (s)
+    """
+
+    def __init__(self, servers, speed=DEFAULT_SPEED, batch=DEFAULT_BATCH):
+
+        self.servers = servers
+        self.speed = float(speed)
+        self.batch = int(batch)
+        self.stats = {proto: ProtocolStats() for proto in servers}
+        self.wall = 0.0
+        self.__endpoints = {}
+        self.__records = None
+        self.__pending = None
+        self.__deferred = None
+        self.__first = None
+        self.__started = None
+
+    def endpoint(self, proto, addr):
+        """Create the connection object receiving the replayed frames."""
+
+        server = self.servers[proto]
+
+        if proto == PROTO_LVAPP:
+            from empower.lvapp.lvappconnection import LVAPPConnection
+            stream = ReplayStream()
+            LVAPPConnection(stream, tuple(addr.rsplit(":", 1)), server)
+            return stream
+
+        if proto == PROTO_VBSP:
+            from empower.vbspp.vbspconnection import VBSPConnection
+            stream = ReplayStream()
+            VBSPConnection(stream, tuple(addr.rsplit(":", 1)), server)
+            return stream
+
+        return lvnfp_endpoint(server, addr)
+
+    def handle(self, record):
+        """Replay a single record."""
+
+        if record.proto not in self.servers:
+            return
+
+        stats = self.stats[record.proto]
+
+        if record.kind == KIND_OPEN:
+            self.__endpoints[record.conn] = \
+                (record.proto, self.endpoint(record.proto,
+                                             record.data.decode()))
+            stats.connections += 1
+            return
+
+        if record.conn not in self.__endpoints:
+            return
+
+        _, endpoint = self.__endpoints[record.conn]
+
+        if record.kind == KIND_IN:
+            started = time.perf_counter()
+            endpoint.feed(record.data)
+            stats.handler_time += time.perf_counter() - started
+            stats.messages += 1
+            stats.bytes += len(record.data)
+
+        elif record.kind == KIND_OUT:
+            stats.outbound += 1
+
+        elif record.kind == KIND_CLOSE:
+            self.close(record.conn)
+
+    def close(self, conn):
+        """Close a replayed connection."""
+
+        proto, endpoint = self.__endpoints.pop(conn)
+        endpoint.close()
+        self.stats[proto].replies += endpoint.writes
+
+    def run(self, records):
+        """Replay the records and return when done."""
+
+        self.__records = iter(records)
+        self.__pending = None
+        self.__first = None
+        self.__started = time.time()
+
+        loop = tornado.ioloop.IOLoop.current()
+        loop.add_callback(self.__step)
+        loop.start()
+
+        # connections still open at the end of the capture
+        for conn in list(self.__endpoints):
+            self.close(conn)
+        self.wall = time.time() - self.__started
+
+    def __step(self):
+
+        loop = tornado.ioloop.IOLoop.current()
+
+        for _ in range(self.batch):
+
+            record = self.__pending or next(self.__records, None)
+            self.__pending = None
+
+            if record is None:
+                loop.stop()
+                return
+
+            if self.__first is None:
+                self.__first = record.ts
+
+            if self.speed:
+                due = self.__started + \
+                    (record.ts - self.__first) / self.speed
+                delay = due - time.time()
+                if delay > 0:
+                    self.__pending = record
+                    loop.call_later(delay, self.__step)
+                    return
+
+            # let the connection flush its replies before closing it
+            if record.kind == KIND_CLOSE and record is not self.__deferred:
+                self.__pending = record
+                self.__deferred = record
+                loop.add_callback(self.__step)
+                return
+
+            self.handle(record)
+
+        # give the IOLoop a chance to run the callbacks set by the handlers
+        loop.add_callback(self.__step)
+
+
+def capture_records(path):
+    """Yield the records of a capture, rotated files included."""
+
+    files = capture_files(path)
+
+    if not files:
+        raise ValueError("No capture found at %s" % path)
+
+    for name in files:
+        for record in read_capture(name):
+            yield record
+
+
+def create_servers(protocols):
+    """Start the protocol servers on ephemeral ports."""
+
+    servers = {}
+
+    if PROTO_LVAPP in protocols:
+        from empower.lvapp import PT_TYPES
+        from empower.lvapp import PT_TYPES_HANDLERS
+        from empower.lvapp.lvappserver import LVAPPServer
+        servers[PROTO_LVAPP] = LVAPPServer(0, PT_TYPES, PT_TYPES_HANDLERS)
+
+    if PROTO_VBSP in protocols:
+        from empower.vbspp import PRT_TYPES
+        from empower.vbspp import PRT_TYPES_HANDLERS
+        from empower.vbspp.vbspserver import VBSPServer
+        servers[PROTO_VBSP] = VBSPServer(0, PRT_TYPES, PRT_TYPES_HANDLERS)
+
+    if PROTO_LVNFP in protocols:
+        from empower.lvnfp import PT_TYPES
+        from empower.lvnfp import PT_TYPES_HANDLERS
+        from empower.lvnfp.lvnfpserver import LVNFPServer
+        servers[PROTO_LVNFP] = LVNFPServer(0, PT_TYPES, PT_TYPES_HANDLERS)
+
+    return servers
+
+
+def print_report(replayer):
+    """Print the replay results."""
+
+    print("replayed in %.2f s" % replayer.wall)
+
+    for proto, stats in sorted(replayer.stats.items()):
+        out = stats.to_dict()
+        print("%s: %u connections, %u messages (%u bytes), "
+              "%u writes captured, %u writes replayed, "
+              "%.0f msg/s handler throughput" %
+              (PROTOCOLS[proto], out['connections'], out['messages'],
+               out['bytes'], out['outbound'], out['replies'], out['rate']))
+
+
+def parse_args(args=None):
+    """Parse the command line arguments."""
+
+    parser = ArgumentParser(description="Replay a signalling capture")
+
+    parser.add_argument("path", help="the capture log")
+    parser.add_argument("--speed", type=float, default=DEFAULT_SPEED,
+                        help="replay speed, 1 is the original speed, "
+                             "0 is as fast as possible")
+    parser.add_argument("--protocols", default=",".join(PROTOCOLS.values()),
+                        help="comma separated protocols to replay")
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Replay a capture."""
+
+    logging.basicConfig(level=logging.WARNING)
+
+    args = parse_args(args)
+
+    names = {name: proto for proto, name in PROTOCOLS.items()}
+    protocols = [names[name] for name in args.protocols.split(",")]
+
+    empower.main.RUNTIME = EmpowerRuntime()
+
+    replayer = Replayer(create_servers(protocols), args.speed)
+    replayer.run(capture_records(args.path))
+
+    print_report(replayer)
+
+
+if __name__ == "__main__":
+    main()
@@ -61,10 +61,18 @@ REVERSE_TX_MCAST = {TX_MCAST_LEGACY_H: TX_MCAST_LEGACY,
                     TX_MCAST_DMS_H: TX_MCAST_DMS,
                     TX_MCAST_UR_H: TX_MCAST_UR}
 
+# default MCS sets, shared by every block until its supports are changed
+SUPPORTS_HT = frozenset([0, 1, 2, 3, 4, 5, 6, 7])
+SUPPORTS_5GHZ = frozenset([6.0, 9.0, 12.0, 18.0, 24.0, 36.0, 48.0, 54.0])
+SUPPORTS_24GHZ = frozenset([1.0, 2.0, 5.5, 11.0,
+                            6.0, 9.0, 12.0, 18.0, 24.0, 36.0, 48, 54.0])
+
 
 class TxPolicyProp(dict):
     """Override getitem behaviour by a default TxPolicy."""
 
+    __slots__ = ('block', )
+
     def __init__(self, block, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.block = block
@@ -97,6 +105,9 @@ class TxPolicy(object):
           an 11n device it will report [0, 1, 2, 3, 4, 5, 6, 7]
     """
 
+    __slots__ = ('addr', 'block', '_no_ack', '_rts_cts', '_mcast', '_mcs',
+                 '_ur_count')
+
     def __init__(self, addr, block):
 
         self.addr = addr
@@ -202,6 +213,8 @@ class CQM(dict):
     """Override getitem behaviour by returning -inf instead of KeyError
     when the key is missing."""
 
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -249,11 +262,14 @@ def build_block(block):
         raise ValueError("Expected ResourceBlock or tuple, got %s",
                          type(block))
 
-    for supported in requested.radio.supports:
-        if supported == requested:
-            return supported
+    supported = requested.radio.supports.find(requested.hwaddr,
+                                              requested.channel,
+                                              requested.band)
 
-    raise KeyError(requested)
+    if supported is None or supported != requested:
+        raise KeyError(requested)
+
+    return supported
 
 
 class ResourcePool(set):
@@ -267,19 +283,75 @@ class ResourcePool(set):
 
     The class Overrides the set object's "and" method for ResourceBlock
     objects by excluding the Resource Block address form the matching.from
+
+    The blocks are indexed by (channel, band) and by (hwaddr, channel, band).
+    The indexes are built the first time they are needed and dropped
+    whenever the pool is modified, so that intersections are linear in the
+    size of the smaller pool and exact lookups are O(1).
     """
 
+    __slots__ = ('_channels', '_blocks')
+
     def __init__(self, *args, **kwds):
         super(ResourcePool, self).__init__(*args, **kwds)
+        self._channels = None
+        self._blocks = None
+
+    def _index(self):
+        """Build the (channel, band) and (hwaddr, channel, band) indexes."""
+
+        channels = {}
+        blocks = {}
+
+        for rblock in self:
+            key = (rblock.channel, rblock.band)
+            if key not in channels:
+                channels[key] = [rblock]
+            else:
+                channels[key].append(rblock)
+            blocks[(rblock.hwaddr, rblock.channel, rblock.band)] = rblock
+
+        self._channels = channels
+        self._blocks = blocks
+
+    @property
+    def channels(self):
+        """Return the blocks indexed by (channel, band)."""
+
+        if self._channels is None:
+            self._index()
+
+        return self._channels
+
+    def find(self, hwaddr, channel, band):
+        """Return the block with the given hwaddr, channel and band.
+
+        Returns:
+            the ResourceBlock, None if the pool has no such block
+        """
+
+        if self._blocks is None:
+            self._index()
+
+        return self._blocks.get((hwaddr, channel, band))
 
     def __and__(self, other):
+
+        if not isinstance(other, ResourcePool):
+            other = ResourcePool(other)
+
         result = ResourcePool()
-        for rblock in self:
-            for rblock_other in other:
-                if rblock.channel == rblock_other.channel and \
-                   rblock.band == rblock_other.band:
 
-                    result.add(rblock)
+        if len(self) <= len(other):
+            channels = other.channels
+            for rblock in self:
+                if (rblock.channel, rblock.band) in channels:
+                    set.add(result, rblock)
+        else:
+            channels = self.channels
+            for key in other.channels:
+                if key in channels:
+                    set.update(result, channels[key])
 
         return result
 
@@ -291,6 +363,62 @@ class ResourcePool(set):
             result.add(rblock)
         return result
 
+    def _invalidate(self):
+        self._channels = None
+        self._blocks = None
+
+    def add(self, *args, **kwargs):
+        self._invalidate()
+        return super().add(*args, **kwargs)
+
+    def discard(self, *args, **kwargs):
+        self._invalidate()
+        return super().discard(*args, **kwargs)
+
+    def remove(self, *args, **kwargs):
+        self._invalidate()
+        return super().remove(*args, **kwargs)
+
+    def pop(self, *args, **kwargs):
+        self._invalidate()
+        return super().pop(*args, **kwargs)
+
+    def clear(self, *args, **kwargs):
+        self._invalidate()
+        return super().clear(*args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        self._invalidate()
+        return super().update(*args, **kwargs)
+
+    def difference_update(self, *args, **kwargs):
+        self._invalidate()
+        return super().difference_update(*args, **kwargs)
+
+    def intersection_update(self, *args, **kwargs):
+        self._invalidate()
+        return super().intersection_update(*args, **kwargs)
+
+    def symmetric_difference_update(self, *args, **kwargs):
+        self._invalidate()
+        return super().symmetric_difference_update(*args, **kwargs)
+
+    def __ior__(self, other):
+        self._invalidate()
+        return super().__ior__(other)
+
+    def __iand__(self, other):
+        self._invalidate()
+        return super().__iand__(other)
+
+    def __isub__(self, other):
+        self._invalidate()
+        return super().__isub__(other)
+
+    def __ixor__(self, other):
+        self._invalidate()
+        return super().__ixor__(other)
+
 
 class ResourceBlock(object):
     """ EmPOWER resource block.
@@ -311,28 +439,81 @@ class ResourceBlock(object):
           reported by the device, that is if the device is an 11a
           device it will report [6, 12, 18, 36, 54]. If the device is
           an 11n device it will report [0, 1, 2, 3, 4, 5, 6, 7]
+        tx_policies: the transmission policies, indexed by station address
+
+    Most blocks, e.g. the blocks supported by an LVAP, never use their
+    channel quality maps and transmission policies, these containers are
+    only allocated the first time they are accessed. The default MCS set
+    is shared by all the blocks and copied when it is changed. Blocks
+    themselves are never shared between radios: they are mutable and they
+    are hashed and compared together with their radio and hwaddr.
     """
 
+    __slots__ = ('_radio', '_hwaddr', '_channel', '_band', '_supports',
+                 '_ucqm', '_ncqm', '_tx_policies', '__dict__')
+
     def __init__(self, radio, hwaddr, channel, band):
 
         self._radio = radio
         self._hwaddr = hwaddr
         self._channel = channel
         self._band = band
-        self.ucqm = CQM()
-        self.ncqm = CQM()
-        self.tx_policies = TxPolicyProp(self)
+        self._ucqm = None
+        self._ncqm = None
+        self._tx_policies = None
 
         if self.band == BT_HT20 or self.band == BT_HT40:
-            self._supports = set([0, 1, 2, 3, 4, 5, 6, 7])
+            self._supports = SUPPORTS_HT
         else:
             if self.channel > 14:
-                self._supports = \
-                    set([6.0, 9.0, 12.0, 18.0, 24.0, 36.0, 48.0, 54.0])
+                self._supports = SUPPORTS_5GHZ
             else:
-                self._supports = \
-                    set([1.0, 2.0, 5.5, 11.0,
-                         6.0, 9.0, 12.0, 18.0, 24.0, 36.0, 48, 54.0])
+                self._supports = SUPPORTS_24GHZ
+
+    @property
+    def ucqm(self):
+        """ Return the user channel quality map. """
+
+        if self._ucqm is None:
+            self._ucqm = CQM()
+
+        return self._ucqm
+
+    @ucqm.setter
+    def ucqm(self, ucqm):
+        """ Set the user channel quality map. """
+
+        self._ucqm = ucqm
+
+    @property
+    def ncqm(self):
+        """ Return the network channel quality map. """
+
+        if self._ncqm is None:
+            self._ncqm = CQM()
+
+        return self._ncqm
+
+    @ncqm.setter
+    def ncqm(self, ncqm):
+        """ Set the network channel quality map. """
+
+        self._ncqm = ncqm
+
+    @property
+    def tx_policies(self):
+        """ Return the transmission policies. """
+
+        if self._tx_policies is None:
+            self._tx_policies = TxPolicyProp(self)
+
+        return self._tx_policies
+
+    @tx_policies.setter
+    def tx_policies(self, tx_policies):
+        """ Set the transmission policies. """
+
+        self._tx_policies = tx_policies
 
     @property
     def addr(self):
@@ -362,6 +543,9 @@ class ResourceBlock(object):
     def supports(self, supports):
         """ Set the band. """
 
+        if isinstance(self._supports, frozenset):
+            self._supports = set(self._supports)
+
         for supported in supports:
             self._supports.add(int(supported))
 
@@ -411,7 +595,8 @@ class ResourceBlock(object):
         """ Return a JSON-serializable dictionary representing the Resource
         Pool """
 
-        tx_policies = {str(k): v for k, v in self.tx_policies.items()}
+        tx_policies = {str(k): v for k, v in
+                       (self._tx_policies or {}).items()}
 
         return {'addr': self.radio.addr,
                 'hwaddr': self.hwaddr,
@@ -419,8 +604,8 @@ class ResourceBlock(object):
                 'supports': sorted(self.supports),
                 'tx_policies': tx_policies,
                 'band': BANDS[self.band],
-                'ucqm': {str(k): v for k, v in self.ucqm.items()},
-                'ncqm': {str(k): v for k, v in self.ncqm.items()}}
+                'ucqm': {str(k): v for k, v in (self._ucqm or {}).items()},
+                'ncqm': {str(k): v for k, v in (self._ncqm or {}).items()}}
 
     def __hash__(self):
 
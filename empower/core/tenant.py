@@ -95,6 +95,39 @@ class Tenant(object):
         tokens = [self.tenant_id.hex[0:12][i:i + 2] for i in range(0, 12, 2)]
         return EtherAddress(':'.join(tokens))
 
+    def add_vap(self, vap):
+        """Add a new VAP to the Tenant.
+
+        Args:
+            vap, a VAP object
+
+        Returns:
+            None
+        """
+
+        self.vaps[vap.net_bssid] = vap
+
+        from empower.main import RUNTIME
+        RUNTIME.index_vap(self, vap)
+
+    def remove_vap(self, vap):
+        """Remove a VAP from the Tenant.
+
+        Args:
+            vap, a VAP object
+
+        Returns:
+            None
+        """
+
+        if vap.net_bssid not in self.vaps:
+            return
+
+        del self.vaps[vap.net_bssid]
+
+        from empower.main import RUNTIME
+        RUNTIME.unindex_vap(self, vap)
+
     def add_pnfdev(self, pnfdev):
         """Add a new PNF Dev to the Tenant.
 
@@ -115,6 +148,9 @@ class Tenant(object):
 
         pnfdevs[pnfdev.addr] = pnfdev
 
+        from empower.main import RUNTIME
+        RUNTIME.index_pnfdev(self, pnfdev)
+
         belongs = TblBelongs(tenant_id=self.tenant_id, addr=pnfdev.addr)
 
         session = Session()
@@ -140,6 +176,9 @@ class Tenant(object):
 
         del pnfdevs[pnfdev.addr]
 
+        from empower.main import RUNTIME
+        RUNTIME.unindex_pnfdev(self, pnfdev)
+
         belongs = Session().query(TblBelongs) \
                            .filter(TblBelongs.tenant_id == self.tenant_id,
                                    TblBelongs.addr == pnfdev.addr) \
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Hashed timer wheel shared by the periodic tasks of the controller.
+
+The wheel statistics (tasks, tick run time, overruns, skipped ticks) are
+exposed as JSON:
+
+    GET /api/v1/timers
+"""
+
+import time
+import random
+import tornado.ioloop
+
+from empower.restserver.apihandlers import EmpowerAPIHandler
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+DEFAULT_TICK = 50
+DEFAULT_SLOTS = 1024
+
+
+class TimerTask(object):
+    """A periodic task registered with a TimerWheel.
+
+    Attributes:
+        callback: the function to be called
+        every: the task period (ms)
+        slot: the wheel slot currently holding the task
+        rounds: the number of wheel revolutions before the task fires
+    """
+
+    __slots__ = ('wheel', 'callback', 'every', 'slot', 'rounds', 'active')
+
+    def __init__(self, wheel, callback, every):
+
+        self.wheel = wheel
+        self.callback = callback
+        self.every = every
+        self.slot = None
+        self.rounds = 0
+        self.active = True
+
+    def stop(self):
+        """Cancel the task."""
+
+        self.wheel.cancel(self)
+
+    def is_running(self):
+        """Return True if the task has not been cancelled."""
+
+        return self.active
+
+
+class TimerWheel(object):
+    """Hashed timer wheel.
+
+    A single IOLoop PeriodicCallback advances the wheel by one slot every
+    tick. Tasks are hashed into the slot where they expire, tasks whose
+    period is longer than one wheel revolution also keep a rounds counter.
+    Adding and cancelling a task are O(1) operations.
+
+    New tasks are given a random phase within their first period, so that
+    tasks with the same period do not all fire during the same tick.
+
+    After a stall longer than one wheel revolution the full revolutions are
+    skipped at once: every task loses one round per skipped revolution and
+    the tasks that should have fired in the meantime fire at the next tick.
+
+    Attributes:
+        tick: the tick duration (ms)
+        nb_slots: the number of slots in the wheel
+        ticks: the number of ticks processed so far
+        fired: the number of callbacks executed so far
+        overruns: the number of ticks that took longer than one tick
+        skipped: the number of ticks skipped after long stalls
+        late: the number of tasks fired late because of skipped ticks
+        last_run: the run time of the last tick (ms)
+        max_run: the longest tick run time (ms)
+    """
+
+    def __init__(self, tick=DEFAULT_TICK, nb_slots=DEFAULT_SLOTS):
+
+        self.tick = int(tick)
+        self.nb_slots = int(nb_slots)
+        self.ticks = 0
+        self.fired = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.late = 0
+        self.last_run = 0.0
+        self.max_run = 0.0
+        self.total_run = 0.0
+        self.__slots = [set() for _ in range(self.nb_slots)]
+        self.__cursor = 0
+        self.__nb_tasks = 0
+        self.__last_tick = None
+        self.__worker = None
+
+    @property
+    def nb_tasks(self):
+        """Return the number of active tasks."""
+
+        return self.__nb_tasks
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        return {'tick': self.tick,
+                'slots': self.nb_slots,
+                'tasks': self.nb_tasks,
+                'ticks': self.ticks,
+                'fired': self.fired,
+                'overruns': self.overruns,
+                'skipped': self.skipped,
+                'late': self.late,
+                'last_run': self.last_run,
+                'max_run': self.max_run,
+                'avg_run': self.total_run / self.ticks if self.ticks else 0}
+
+    def add(self, callback, every, jitter=True):
+        """Register a new periodic task.
+
+        Args:
+            callback: the function to be called
+            every: the task period (ms)
+            jitter: if True the first execution happens at a random time
+              within the first period, otherwise after one full period
+
+        Returns:
+            a TimerTask object
+        """
+
+        every = int(every)
+
+        if every <= 0:
+            raise ValueError("Invalid period %d" % every)
+
+        task = TimerTask(self, callback, every)
+
+        if jitter:
+            self.__schedule(task, random.randint(1, every))
+        else:
+            self.__schedule(task, every)
+
+        self.__nb_tasks += 1
+
+        if not self.__worker:
+            self.start()
+
+        return task
+
+    def cancel(self, task):
+        """Cancel a task."""
+
+        if not task.active:
+            return
+
+        task.active = False
+        self.__nb_tasks -= 1
+
+        if task.slot is not None:
+            self.__slots[task.slot].discard(task)
+            task.slot = None
+
+    def start(self):
+        """Start the wheel."""
+
+        if self.__worker:
+            return
+
+        self.__last_tick = time.monotonic()
+        self.__worker = tornado.ioloop.PeriodicCallback(self._on_tick,
+                                                        self.tick)
+        self.__worker.start()
+
+    def stop(self):
+        """Stop the wheel."""
+
+        if not self.__worker:
+            return
+
+        self.__worker.stop()
+        self.__worker = None
+
+    def __schedule(self, task, delay):
+        """Hash the task into the slot where it expires."""
+
+        ticks = max(1, int(round(delay / self.tick)))
+
+        task.slot = (self.__cursor + ticks) % self.nb_slots
+        task.rounds = (ticks - 1) // self.nb_slots
+
+        self.__slots[task.slot].add(task)
+
+    def _on_tick(self):
+        """Advance the wheel, catching up with any missed tick."""
+
+        started = time.monotonic()
+
+        # the ioloop may have been busy, process every elapsed tick
+        elapsed = int((started - self.__last_tick) * 1000 / self.tick)
+
+        if elapsed < 1:
+            return
+
+        self.__last_tick += elapsed * self.tick / 1000
+
+        # process at most one revolution, skip the others
+        revolutions = (elapsed - 1) // self.nb_slots
+
+        if revolutions:
+            self.__skip(revolutions)
+            elapsed -= revolutions * self.nb_slots
+
+        for _ in range(elapsed):
+            self.__advance()
+
+        run = (time.monotonic() - started) * 1000
+
+        self.ticks += 1
+        self.last_run = run
+        self.total_run += run
+        self.max_run = max(self.max_run, run)
+
+        if run > self.tick or elapsed > 1:
+            self.overruns += 1
+
+    def __skip(self, revolutions):
+        """Skip full wheel revolutions without firing any task.
+
+        Each slot would have been visited once per revolution, so every task
+        loses as many rounds. Tasks without enough rounds left are overdue,
+        they are moved to the next slot so that they fire at the next tick.
+        """
+
+        overdue = []
+
+        for bucket in self.__slots:
+            for task in list(bucket):
+                if task.rounds >= revolutions:
+                    task.rounds -= revolutions
+                else:
+                    bucket.discard(task)
+                    overdue.append(task)
+
+        slot = (self.__cursor + 1) % self.nb_slots
+
+        for task in overdue:
+            task.slot = slot
+            task.rounds = 0
+            self.__slots[slot].add(task)
+
+        self.skipped += revolutions * self.nb_slots
+        self.late += len(overdue)
+
+        LOG.warning("Timer wheel skipped %u ticks, %u tasks late",
+                    revolutions * self.nb_slots, len(overdue))
+
+    def __advance(self):
+        """Move to the next slot and fire the expired tasks."""
+
+        self.__cursor = (self.__cursor + 1) % self.nb_slots
+
+        bucket = self.__slots[self.__cursor]
+
+        for task in list(bucket):
+
+            if task.rounds > 0:
+                task.rounds -= 1
+                continue
+
+            bucket.discard(task)
+            task.slot = None
+
+            try:
+                task.callback()
+            except Exception as ex:
+                LOG.exception(ex)
+
+            self.fired += 1
+
+            if task.active and task.slot is None:
+                self.__schedule(task, task.every)
+
+
+class TimerWheelHandler(EmpowerAPIHandler):
+    """Timer wheel handler. Used to query the timer wheel statistics."""
+
+    HANDLERS = [r"/api/v1/timers/?"]
+
+    def get(self, *args, **kwargs):
+        """ Return the timer wheel statistics.
+
+        Example URLs:
+            GET /api/v1/timers
+        """
+
+        self.write_as_json(self.server.to_dict())
+
+
+TIMERS = TimerWheel()
@@ -43,6 +43,7 @@ class VBSP(BasePNFDev):
         every: update period (in ms)
         uplink_bytes: signalling channel uplink bytes
         downlink_bytes: signalling channel downlink bytes
+        mac_stats: MAC statistics time-series (MACStatsStore)
     """
 
     ALIAS = "vbsps"
@@ -50,6 +51,7 @@ class VBSP(BasePNFDev):
 
     def __init__(self, addr, label):
         super().__init__(addr, label)
+        self.mac_stats = None
 
     def to_dict(self):
         """Return a JSON-serializable dictionary representing the VBSP."""
@@ -63,4 +63,6 @@ class WTP(BasePNFDev):
 
         out = super().to_dict()
         out['supports'] = self.supports
+        out['flush_stats'] = \
+            self.connection.flush_stats if self.connection else None
         return out
@@ -81,10 +81,11 @@ class Counter(Module):
     _tx_samples = []
     _rx_samples = []
 
-    def __eq__(self, other):
+    @property
+    def key(self):
+        """Return the identity key of the module."""
 
-        return super().__eq__(other) and self.lvap == other.lvap and \
-            self.bins == other.bins
+        return super().key + (self.lvap, tuple(self.bins))
 
     @property
     def lvap(self):
@@ -94,6 +95,17 @@ class Counter(Module):
     def lvap(self, value):
         self._lvap = EtherAddress(value)
 
+    @property
+    def target(self):
+        """Return the address of the WTP hosting the LVAP."""
+
+        if self.lvap not in RUNTIME.lvaps:
+            return None
+
+        wtp = RUNTIME.lvaps[self.lvap].wtp
+
+        return wtp.addr if wtp else None
+
     def to_dict(self):
         """ Return a JSON-serializable dictionary representing the Stats """
 
@@ -133,7 +145,7 @@ class Counter(Module):
                       lvap.addr, lvap.wtp.addr, self.module_id)
 
         msg = STATS_REQUEST.build(stats_req)
-        lvap.wtp.connection.stream.write(msg)
+        lvap.wtp.connection.send_message(msg)
 
     def fill_samples(self, data):
         pass
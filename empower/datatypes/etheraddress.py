@@ -27,55 +27,134 @@
 
 """EmPOWER EtherAddress Class."""
 
+# instances are interned, i.e. the same address is always represented by the
+# same object, the tables are cleared when they grow above INTERN_MAX entries
+INTERN_MAX = 1 << 16
+
+_RAW = {}
+_TEXT = {}
+
+
+def _parse(addr):
+    """Return the 6 raw bytes of a textual address."""
+
+    if len(addr) == 6:
+        # raw
+        return addr.encode('latin-1')
+
+    if len(addr) == 17:
+        if addr[2::3] != ':::::' and addr[2::3] != '-----':
+            raise RuntimeError("Bad format for ethernet address")
+        # Address of form xx:xx:xx:xx:xx:xx
+        # Pick out the hex digits only
+        addr = ''.join((addr[x * 3:x * 3 + 2] for x in range(0, 6)))
+    elif len(addr) == 12:
+        pass
+    elif addr.count(':') == 5:
+        # Assume it's hex digits but they may not all be in two-digit
+        # groupings (e.g., xx:x:x:xx:x:x). This actually comes up.
+        addr = ''.join(["%02x" % (int(x, 16),) for x in addr.split(":")])
+    else:
+        raise ValueError("Expected 6 raw bytes or some hex")
+
+    # We should now have 12 hex digits (xxxxxxxxxxxx).
+    raw = bytes.fromhex(addr)
+
+    if len(raw) != 6:
+        raise ValueError("Expected 6 raw bytes or some hex")
+
+    return raw
+
 
 class EtherAddress(object):
-    """An Ethernet (MAC) address type."""
+    """An Ethernet (MAC) address type.
+
+    The address is stored both as 6 raw bytes and as a 48 bits integer.
+    Instances are immutable and interned, so the same address used as a
+    dictionary key in different places is the same object.
+    """
 
-    def __init__(self, addr):
+    __slots__ = ('_value', '_int', '_hash')
+
+    def __new__(cls, addr):
         """
         Understands Ethernet address is various forms. Hex strings, raw bytes
         strings, etc.
         """
-        # Always stores as a 6 character string
-        if isinstance(addr, bytes) or isinstance(addr, str):
+
+        if addr.__class__ is bytes:
+            try:
+                return _RAW[addr]
+            except KeyError:
+                pass
             if len(addr) == 6:
-                # raw
+                return cls.from_raw(addr)
+            addr = addr.decode('latin-1')
+
+        if isinstance(addr, str):
+            try:
+                return _TEXT[addr]
+            except KeyError:
                 pass
-            elif len(addr) == 17 or len(addr) == 12 or addr.count(':') == 5:
-                # hex
-                if len(addr) == 17:
-                    if addr[2::3] != ':::::' and addr[2::3] != '-----':
-                        raise RuntimeError("Bad format for ethernet address")
-                    # Address of form xx:xx:xx:xx:xx:xx
-                    # Pick out the hex digits only
-                    addr = ''.join(
-                        (addr[x * 3:x * 3 + 2] for x in range(0, 6)))
-                elif len(addr) == 12:
-                    pass
-                else:
-                    # Assume it's hex digits but they may not all be in
-                    # two-digit groupings (e.g., xx:x:x:xx:x:x). This actually
-                    # comes up.
-                    addr = ''.join(["%02x" % (int(x, 16),)
-                                    for x in addr.split(":")])
-
-                # We should now have 12 hex digits (xxxxxxxxxxxx).
-                # Convert to 6 raw bytes.
-                addr = b''.join(bytes((int(addr[x * 2:x * 2 + 2], 16),))
-                                for x in range(0, 6))
-            else:
-                raise ValueError("Expected 6 raw bytes or some hex")
-            self._value = addr
-        elif isinstance(addr, EtherAddress):
-            self._value = addr.to_raw()
-        elif (type(addr) == list or
-              (hasattr(addr, '__len__') and len(addr) == 6 and
-               hasattr(addr, '__iter__'))):
-            self._value = ''.join((chr(int(x, 16)) for x in addr))
-        elif addr is None:
-            self._value = '\x00' * 6
-        else:
-            raise ValueError("EtherAddress must be a string of 6 raw bytes")
+            ether = cls.from_raw(_parse(addr))
+            if len(_TEXT) >= INTERN_MAX:
+                _TEXT.clear()
+            _TEXT[addr] = ether
+            return ether
+
+        if isinstance(addr, EtherAddress):
+            return addr
+
+        if isinstance(addr, (bytearray, memoryview)) and len(addr) == 6:
+            return cls.from_raw(addr)
+
+        if (type(addr) == list or
+                (hasattr(addr, '__len__') and len(addr) == 6 and
+                 hasattr(addr, '__iter__'))):
+            return cls.from_raw(bytes((int(x, 16) for x in addr)))
+
+        if addr is None:
+            return cls.from_raw(b'\x00' * 6)
+
+        raise ValueError("EtherAddress must be a string of 6 raw bytes")
+
+    @classmethod
+    def from_raw(cls, raw):
+        """
+        Returns the address whose 6 raw bytes are raw. This is the fast path
+        for addresses taken from the wire.
+        """
+
+        if raw.__class__ is not bytes:
+            raw = bytes(raw)
+
+        try:
+            return _RAW[raw]
+        except KeyError:
+            pass
+
+        if len(raw) != 6:
+            raise ValueError("Expected 6 raw bytes")
+
+        ether = object.__new__(cls)
+        object.__setattr__(ether, '_value', raw)
+        object.__setattr__(ether, '_int', int.from_bytes(raw, 'big'))
+        object.__setattr__(ether, '_hash', hash(raw))
+
+        if len(_RAW) >= INTERN_MAX:
+            _RAW.clear()
+
+        _RAW[raw] = ether
+
+        return ether
+
+    @classmethod
+    def from_int(cls, value):
+        """
+        Returns the address whose 48 bits integer representation is value.
+        """
+
+        return cls.from_raw(value.to_bytes(6, 'big'))
 
     def is_global(self):
         """
@@ -87,13 +166,13 @@ class EtherAddress(object):
         """
         Returns True if this is a locally-administered (non-global) address.
         """
-        return True if (self._value[0] & 2) else False
+        return True if (self._int >> 41) & 1 else False
 
     def is_multicast(self):
         """
         Returns True if this is a multicast address.
         """
-        return True if (self._value[0] & 1) else False
+        return True if (self._int >> 40) & 1 else False
 
     def to_raw(self):
         """
@@ -106,65 +185,66 @@ class EtherAddress(object):
         Returns a 6-entry long tuple where each entry is the numeric value
         of the corresponding byte of the address.
         """
-        return tuple((x for x in self._value))
+        return tuple(self._value)
 
     def to_str(self, separator=':'):
         """
         Returns the address as string consisting of 12 hex chars separated
         by separator.
         """
-        return separator.join(('%02x' % (x,) for x in self._value)).upper()
+        return separator.join(('%02X' % (x,) for x in self._value))
 
     def to_int(self, separator=':'):
         """
-        Returns the address as string consisting of 12 hex chars separated
-        by separator.
+        Returns the address as a 48 bits integer.
         """
-        return int(self.to_str().replace(":", ""), 16)
+        return self._int
 
     def match(self, other):
         """ Bitwise match. """
-        if type(other) == EtherAddress:
-            other = other.to_raw()
-        elif type(other) == bytes:
-            pass
+        if other.__class__ is EtherAddress:
+            other = other._int
+        elif other.__class__ is bytes:
+            other = int.from_bytes(other, 'big')
         else:
             try:
-                other = EtherAddress(other).to_raw()
+                other = EtherAddress(other)._int
             except RuntimeError:
                 return False
-        for cnt in range(0, 6):
-            if (self._value[cnt] & other[cnt]) != self._value[cnt]:
-                return False
-        return True
+        return (self._int & other) == self._int
 
     def __str__(self):
         return self.to_str()
 
     def __eq__(self, other):
-        if type(other) == EtherAddress:
-            other = other.to_raw()
-        elif type(other) == bytes:
-            pass
-        else:
-            try:
-                other = EtherAddress(other).to_raw()
-            except RuntimeError:
-                return False
-        if self._value == other:
+        if self is other:
             return True
-        return False
+        if other.__class__ is EtherAddress:
+            return self._int == other._int
+        if other.__class__ is bytes:
+            return self._value == other
+        try:
+            return self._value == EtherAddress(other)._value
+        except RuntimeError:
+            return False
 
     def __hash__(self):
-        return self._value.__hash__()
+        return self._hash
 
     def __repr__(self):
         return self.__class__.__name__ + "('" + self.to_str() + "')"
 
     def __setattr__(self, a, v):
-        if hasattr(self, '_value'):
-            raise TypeError("This object is immutable")
-        object.__setattr__(self, a, v)
+        raise TypeError("This object is immutable")
+
+    def __reduce__(self):
+        return (self.__class__, (self._value,))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     @classmethod
     def bcast(cls):
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""EtherAddress micro-benchmark.
+
+Compares the interned, integer-backed EtherAddress with the previous
+implementation (LegacyEtherAddress, kept here for reference) on the
+operations found in the controller hot paths: parsing addresses from the
+wire and from strings, dictionary lookups, comparisons, bitwise matches and
+the memory used by a table of addresses.
+
+Usage:
+    python3 -m empower.datatypes.etheraddressbench --number 100000
+"""
+
+import os
+import timeit
+import tracemalloc
+
+from argparse import ArgumentParser
+
+from empower.datatypes.etheraddress import EtherAddress
+
+DEFAULT_NUMBER = 100000
+DEFAULT_ADDRESSES = 10000
+
+
+class LegacyEtherAddress(object):
+    """The previous EtherAddress implementation."""
+
+    def __init__(self, addr):
+        if isinstance(addr, bytes) or isinstance(addr, str):
+            if len(addr) == 6:
+                pass
+            elif len(addr) == 17:
+                addr = ''.join((addr[x * 3:x * 3 + 2] for x in range(0, 6)))
+                addr = b''.join(bytes((int(addr[x * 2:x * 2 + 2], 16),))
+                                for x in range(0, 6))
+            else:
+                raise ValueError("Expected 6 raw bytes or some hex")
+            self._value = addr
+        elif isinstance(addr, LegacyEtherAddress):
+            self._value = addr.to_raw()
+        else:
+            raise ValueError("EtherAddress must be a string of 6 raw bytes")
+
+    def to_raw(self):
+        return self._value
+
+    def to_str(self, separator=':'):
+        return separator.join(('%02x' % (x,) for x in self._value)).upper()
+
+    def to_int(self, separator=':'):
+        return int(self.to_str().replace(":", ""), 16)
+
+    def match(self, other):
+        if type(other) == LegacyEtherAddress:
+            other = other.to_raw()
+        elif type(other) == bytes:
+            pass
+        else:
+            other = LegacyEtherAddress(other).to_raw()
+        for cnt in range(0, 6):
+            if (self._value[cnt] & other[cnt]) != self._value[cnt]:
+                return False
+        return True
+
+    def __eq__(self, other):
+        if type(other) == LegacyEtherAddress:
+            other = other.to_raw()
+        elif type(other) == bytes:
+            pass
+        else:
+            other = LegacyEtherAddress(other).to_raw()
+        return self._value == other
+
+    def __hash__(self):
+        return self._value.__hash__()
+
+    def __setattr__(self, a, v):
+        if hasattr(self, '_value'):
+            raise TypeError("This object is immutable")
+        object.__setattr__(self, a, v)
+
+
+def table_size(cls, raws):
+    """Return the memory (bytes) used by a dict of addresses."""
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    table = {cls(raw): None for raw in raws}
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del table
+
+    return after - before
+
+
+def run(cls, number, addresses):
+    """Time the hot path operations of an address class."""
+
+    raws = [os.urandom(6) for _ in range(addresses)]
+    raw = raws[0]
+    text = ':'.join('%02X' % x for x in raw)
+    addr = cls(raw)
+    other = cls(raws[1])
+    mask = cls(b'\xff' * 6)
+    table = {cls(x): None for x in raws}
+
+    tests = [
+        ("from raw", lambda: cls(raw)),
+        ("from str", lambda: cls(text)),
+        ("dict lookup (raw)", lambda: cls(raw) in table),
+        ("eq", lambda: addr == other),
+        ("eq str", lambda: addr == text),
+        ("match", lambda: addr.match(mask)),
+        ("to_int", addr.to_int),
+    ]
+
+    out = []
+
+    for name, test in tests:
+        elapsed = min(timeit.repeat(test, number=number, repeat=3))
+        out.append((name, elapsed / number * 1e9))
+
+    out.append(("table of %u (KiB)" % addresses,
+                table_size(cls, raws) / 1024))
+
+    return out
+
+
+def parse_args(args=None):
+    """Parse the command line arguments."""
+
+    parser = ArgumentParser(description="EtherAddress micro-benchmark")
+
+    parser.add_argument("--number", type=int, default=DEFAULT_NUMBER,
+                        help="iterations per operation")
+    parser.add_argument("--addresses", type=int, default=DEFAULT_ADDRESSES,
+                        help="number of addresses in the table")
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Run the benchmark."""
+
+    args = parse_args(args)
+
+    legacy = run(LegacyEtherAddress, args.number, args.addresses)
+    current = run(EtherAddress, args.number, args.addresses)
+
+    print("%-24s %12s %12s %8s" % ("operation (ns)", "legacy", "current",
+                                   "speedup"))
+
+    for (name, old), (_, new) in zip(legacy, current):
+        print("%-24s %12.1f %12.1f %7.1fx" % (name, old, new,
+                                              old / new if new else 0))
+
+
+if __name__ == "__main__":
+    main()
@@ -51,7 +51,12 @@ class CPPDown(Module):
 class CPPDownWorker(ModuleLVNFPEventWorker):
     """ Counter worker. """
 
-    pass
+    def tenants(self, register):
+        """Return the tenants including the CPP."""
+
+        return [x for x in self.tenant_modules
+                if x in RUNTIME.tenants and
+                register['addr'] in RUNTIME.tenants[x].cpps]
 
 
 def cppdown(**kwargs):
@@ -47,7 +47,10 @@ class LVAPJoin(Module):
 class LVAPJoinWorker(ModuleLVAPPEventWorker):
     """LVAPJoin."""
 
-    pass
+    def tenants(self, lvap):
+        """Return the tenant of the LVAP."""
+
+        return [lvap.tenant.tenant_id] if lvap.tenant else []
 
 
 def lvapjoin(**kwargs):
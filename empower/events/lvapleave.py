@@ -47,7 +47,10 @@ class LVAPLeave(Module):
 class LVAPLeaveWorker(ModuleLVAPPEventWorker):
     """LVAPLeave."""
 
-    pass
+    def tenants(self, lvap):
+        """Return the tenant of the LVAP."""
+
+        return [lvap.tenant.tenant_id] if lvap.tenant else []
 
 
 def lvapleave(**kwargs):
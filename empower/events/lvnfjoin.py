@@ -49,7 +49,10 @@ class LVNFJoin(Module):
 class LVNFJoinWorker(ModuleLVNFPEventWorker):
     """ Counter worker. """
 
-    pass
+    def tenants(self, lvnf):
+        """Return the tenant of the LVNF."""
+
+        return [lvnf.tenant_id]
 
 
 def lvnfjoin(**kwargs):
@@ -49,7 +49,10 @@ class LVNFLeave(Module):
 class LVNFLeaveWorker(ModuleLVNFPEventWorker):
     """ Counter worker. """
 
-    pass
+    def tenants(self, lvnf):
+        """Return the tenant of the LVNF."""
+
+        return [lvnf.tenant_id]
 
 
 def lvnfleave(**kwargs):
@@ -49,7 +49,12 @@ class WTPDown(Module):
 class WTPDownWorker(ModuleLVAPPEventWorker):
     """ Counter worker. """
 
-    pass
+    def tenants(self, wtp):
+        """Return the tenants including the WTP."""
+
+        return [x for x in self.tenant_modules
+                if x in RUNTIME.tenants and
+                wtp.addr in RUNTIME.tenants[x].wtps]
 
 
 def wtpdown(**kwargs):
@@ -51,7 +51,12 @@ class WTPUp(Module):
 class WTPUpWorker(ModuleLVAPPEventWorker):
     """ Counter worker. """
 
-    pass
+    def tenants(self, caps):
+        """Return the tenants including the WTP."""
+
+        return [x for x in self.tenant_modules
+                if x in RUNTIME.tenants and
+                caps.wtp in RUNTIME.tenants[x].wtps]
 
 
 def wtpup(**kwargs):
@@ -83,9 +83,11 @@ class LVAPStats(Module):
     # data structure
     rates = {}
 
-    def __eq__(self, other):
+    @property
+    def key(self):
+        """Return the identity key of the module."""
 
-        return super().__eq__(other) and self.lvap == other.lvap
+        return super().key + (self.lvap, )
 
     @property
     def lvap(self):
@@ -99,6 +101,17 @@ class LVAPStats(Module):
 
         self._lvap = EtherAddress(value)
 
+    @property
+    def target(self):
+        """Return the address of the WTP hosting the LVAP."""
+
+        if self.lvap not in RUNTIME.lvaps:
+            return None
+
+        wtp = RUNTIME.lvaps[self.lvap].wtp
+
+        return wtp.addr if wtp else None
+
     def to_dict(self):
         """ Return a JSON-serializable."""
 
@@ -136,7 +149,7 @@ class LVAPStats(Module):
                       lvap.addr, lvap.wtp.addr, self.module_id)
 
         msg = RATES_REQUEST.build(rates_req)
-        lvap.wtp.connection.stream.write(msg)
+        lvap.wtp.connection.send_message(msg)
 
     def handle_response(self, response):
         """Handle an incoming RATES_RESPONSE message.
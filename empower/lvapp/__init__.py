@@ -42,6 +42,10 @@ from construct import Padding
 
 PT_VERSION = 0x00
 
+CODEC_CONSTRUCT = "construct"
+CODEC_FAST = "fast"
+CODECS = [CODEC_CONSTRUCT, CODEC_FAST]
+
 PT_BYE = 0x00
 PT_REGISTER = 0x01
 PT_LVAP_JOIN = 0x02
@@ -64,6 +68,7 @@ PT_DEL_VAP = 0x32
 PT_STATUS_VAP = 0x33
 
 HEADER = Struct("header", UBInt8("version"), UBInt8("type"), UBInt16("length"))
+HEADER_LEN = 4
 
 SSIDS = Range(1, 10, Struct("ssids", UBInt8("length"),
                             Bytes("ssid", lambda ctx: ctx.length)))
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Precompiled struct-based codec for the LVAPP messages.
+
+Every message of the LVAPP catalogue is compiled once into a struct.Struct
+covering its fixed-size part plus a small handler for the variable-length
+tail (SSIDs, CAPS blocks and ports, MCS lists). Parsed messages are returned
+as named tuples exposing the same fields as the construct containers, so
+they can be passed unchanged to the message handlers.
+"""
+
+import struct
+
+from collections import namedtuple
+
+from empower.lvapp import PT_HELLO
+from empower.lvapp import PT_PROBE_REQUEST
+from empower.lvapp import PT_PROBE_RESPONSE
+from empower.lvapp import PT_AUTH_REQUEST
+from empower.lvapp import PT_AUTH_RESPONSE
+from empower.lvapp import PT_ASSOC_REQUEST
+from empower.lvapp import PT_ASSOC_RESPONSE
+from empower.lvapp import PT_ADD_LVAP
+from empower.lvapp import PT_DEL_LVAP
+from empower.lvapp import PT_STATUS_LVAP
+from empower.lvapp import PT_CAPS
+from empower.lvapp import PT_SET_PORT
+from empower.lvapp import PT_STATUS_PORT
+from empower.lvapp import PT_ADD_VAP
+from empower.lvapp import PT_STATUS_VAP
+
+HDR = "BBHI"
+HDR_FIELDS = ("version", "type", "length", "seq")
+
+SSIDEntry = namedtuple("ssids", ("length", "ssid"))
+
+
+class Flags(object):
+    """A flags field. Bits are listed from the most significant one and are
+    right-aligned in the field, the remaining bits are padding."""
+
+    def __init__(self, name, bits):
+
+        self.bits = bits
+        self.record = namedtuple(name, bits)
+
+    def parse(self, value):
+        """Split an integer in its bits."""
+
+        last = len(self.bits) - 1
+        return self.record(*[(value >> (last - i)) & 1
+                             for i in range(last + 1)])
+
+    def build(self, flags):
+        """Join the bits of flags in an integer."""
+
+        value = 0
+
+        for bit in self.bits:
+            value = (value << 1) | (1 if getattr(flags, bit) else 0)
+
+        return value
+
+
+class TailBytes(object):
+    """Raw bytes running until the end of the message."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def parse(self, data, offset, values):
+        """Parse the tail, return the value and the new offset."""
+
+        end = values[2]
+        return bytes(data[offset:end]), end
+
+    def build(self, obj):
+        """Return the tail as bytes."""
+
+        return bytes(getattr(obj, self.name))
+
+
+class TailSSIDs(object):
+    """A sequence of (length, ssid) entries (from 1 to 10)."""
+
+    MAX_SSIDS = 10
+
+    def __init__(self, name):
+        self.name = name
+
+    def parse(self, data, offset, values):
+        """Parse the tail, return the value and the new offset."""
+
+        ssids = []
+        end = len(data)
+
+        while offset < end and len(ssids) < self.MAX_SSIDS:
+
+            length = data[offset]
+
+            if offset + 1 + length > end:
+                break
+
+            ssid = bytes(data[offset + 1:offset + 1 + length])
+            ssids.append(SSIDEntry(length, ssid))
+            offset += 1 + length
+
+        return ssids, offset
+
+    def build(self, obj):
+        """Return the tail as bytes."""
+
+        out = []
+
+        for entry in getattr(obj, self.name):
+            out.append(bytes((entry.length, )))
+            out.append(bytes(entry.ssid))
+
+        return b''.join(out)
+
+
+class TailArray(object):
+    """An array whose length is given by a field of the fixed part."""
+
+    def __init__(self, name, count, fmt, scalar=False):
+        self.name = name
+        self.count = count
+        self.index = None
+        self.packer = struct.Struct("!" + fmt)
+        self.scalar = scalar
+
+    def parse(self, data, offset, values):
+        """Parse the tail, return the value and the new offset."""
+
+        out = []
+        size = self.packer.size
+        unpack_from = self.packer.unpack_from
+
+        for _ in range(values[self.index]):
+            entry = unpack_from(data, offset)
+            out.append(entry[0] if self.scalar else list(entry))
+            offset += size
+
+        return out, offset
+
+    def build(self, obj):
+        """Return the tail as bytes."""
+
+        pack = self.packer.pack
+
+        if self.scalar:
+            return b''.join(pack(x) for x in getattr(obj, self.name))
+
+        return b''.join(pack(*self.entry(x)) for x in getattr(obj, self.name))
+
+    def entry(self, entry):
+        """Return the packable values of an entry."""
+
+        return [x if isinstance(x, (int, bytes)) else 0 for x in entry]
+
+
+class FastStruct(object):
+    """An LVAPP message compiled into a struct.Struct and a tail.
+
+    Attributes:
+        name: the message name (same as the construct version)
+        packer: the struct.Struct for the fixed-size part
+        fields: the names of the fields in the fixed-size part
+        flags: a (field name, Flags) tuple, if the message has flags
+        tails: the handlers for the variable-length part
+        record: the named tuple returned by parse()
+    """
+
+    def __init__(self, name, fmt, fields, flags=None, tails=()):
+
+        self.name = name
+        self.packer = struct.Struct("!" + HDR + fmt)
+        self.fields = HDR_FIELDS + fields
+        self.flags = None
+        self.tails = tails
+        self.record = namedtuple(name, self.fields +
+                                 tuple(x.name for x in tails))
+
+        if flags:
+            self.flags = (self.fields.index(flags[0]), flags[1])
+
+        for tail in tails:
+            if isinstance(tail, TailArray):
+                tail.index = self.fields.index(tail.count)
+
+    def parse(self, data):
+        """Parse data (bytes, bytearray, or memoryview)."""
+
+        values = list(self.packer.unpack_from(data, 0))
+
+        if self.flags:
+            index, flags = self.flags
+            values[index] = flags.parse(values[index])
+
+        offset = self.packer.size
+
+        for tail in self.tails:
+            value, offset = tail.parse(data, offset, values)
+            values.append(value)
+
+        return self.record(*values)
+
+    def build(self, obj):
+        """Build a message from an object exposing the message fields."""
+
+        values = [getattr(obj, x) for x in self.fields]
+
+        if self.flags:
+            index, flags = self.flags
+            values[index] = flags.build(values[index])
+
+        out = [self.packer.pack(*values)]
+
+        for tail in self.tails:
+            out.append(tail.build(obj))
+
+        return b''.join(out)
+
+
+LVAP_FLAGS = Flags("flags", ("set_mask", "associated", "authenticated"))
+
+PORT_FLAGS = Flags("flags", ("no_ack", ))
+
+HELLO = FastStruct("hello", "6sIII",
+                   ("wtp", "period", "uplink_bytes", "downlink_bytes"))
+
+PROBE_REQUEST = FastStruct("probe_request", "6s6s6sBB",
+                           ("wtp", "sta", "hwaddr", "channel", "band"),
+                           tails=(TailBytes("ssid"), ))
+
+PROBE_RESPONSE = FastStruct("probe_response", "6s", ("sta", ))
+
+AUTH_REQUEST = FastStruct("auth_request", "6s6s6s", ("wtp", "sta", "bssid"))
+
+AUTH_RESPONSE = FastStruct("auth_response", "6s6s", ("sta", "bssid"))
+
+ASSOC_REQUEST = FastStruct("assoc_request", "6s6s6s",
+                           ("wtp", "sta", "bssid"),
+                           tails=(TailBytes("ssid"), ))
+
+ASSOC_RESPONSE = FastStruct("assoc_response", "6s", ("sta", ))
+
+ADD_LVAP = FastStruct("add_lvap", "HH6sBB6s6s6s6s",
+                      ("flags", "assoc_id", "hwaddr", "channel", "band",
+                       "sta", "encap", "net_bssid", "lvap_bssid"),
+                      flags=("flags", LVAP_FLAGS),
+                      tails=(TailSSIDs("ssids"), ))
+
+DEL_LVAP = FastStruct("del_lvap", "6s", ("sta", ))
+
+STATUS_LVAP = FastStruct("status_lvap", "HH6s6s6s6sBB6s6s",
+                         ("flags", "assoc_id", "wtp", "sta", "encap",
+                          "hwaddr", "channel", "band", "net_bssid",
+                          "lvap_bssid"),
+                         flags=("flags", LVAP_FLAGS),
+                         tails=(TailSSIDs("ssids"), ))
+
+CAPS = FastStruct("caps", "6sBB",
+                  ("wtp", "nb_resources_elements", "nb_ports_elements"),
+                  tails=(TailArray("blocks", "nb_resources_elements",
+                                   "6sBBH"),
+                         TailArray("ports", "nb_ports_elements", "6sH10s")))
+
+SET_PORT = FastStruct("set_port", "H6sBB6sHBBB",
+                      ("flags", "hwaddr", "channel", "band", "sta",
+                       "rts_cts", "tx_mcast", "ur_mcast_count", "nb_mcses"),
+                      flags=("flags", PORT_FLAGS),
+                      tails=(TailArray("mcs", "nb_mcses", "B", True), ))
+
+STATUS_PORT = FastStruct("status_port", "H6s6s6sBBHBBB",
+                         ("flags", "wtp", "sta", "hwaddr", "channel", "band",
+                          "rts_cts", "tx_mcast", "ur_mcast_count",
+                          "nb_mcses"),
+                         flags=("flags", PORT_FLAGS),
+                         tails=(TailArray("mcs", "nb_mcses", "B", True), ))
+
+ADD_VAP = FastStruct("add_vap", "6sBB6s",
+                     ("hwaddr", "channel", "band", "net_bssid"),
+                     tails=(TailBytes("ssid"), ))
+
+STATUS_VAP = FastStruct("status_vap", "6s6sBB6s",
+                        ("wtp", "hwaddr", "channel", "band", "net_bssid"),
+                        tails=(TailBytes("ssid"), ))
+
+PT_TYPES = {PT_HELLO: HELLO,
+            PT_PROBE_REQUEST: PROBE_REQUEST,
+            PT_PROBE_RESPONSE: PROBE_RESPONSE,
+            PT_AUTH_REQUEST: AUTH_REQUEST,
+            PT_AUTH_RESPONSE: AUTH_RESPONSE,
+            PT_ASSOC_REQUEST: ASSOC_REQUEST,
+            PT_ASSOC_RESPONSE: ASSOC_RESPONSE,
+            PT_ADD_LVAP: ADD_LVAP,
+            PT_DEL_LVAP: DEL_LVAP,
+            PT_STATUS_LVAP: STATUS_LVAP,
+            PT_CAPS: CAPS,
+            PT_SET_PORT: SET_PORT,
+            PT_STATUS_PORT: STATUS_PORT,
+            PT_ADD_VAP: ADD_VAP,
+            PT_STATUS_VAP: STATUS_VAP}
+
+STRUCTS = {x.name: x for x in PT_TYPES.values()}
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""TTL-based eviction of probe-only LVAPs.
+
+An LVAP is spawned as soon as a station sends a probe request, however most
+of the probing stations never authenticate nor associate. Such LVAPs are
+never removed and the LVAP table keeps growing over time.
+
+The evictor records the last activity (probe, auth, assoc, and status
+messages) of every LVAP which has not completed the association. The LVAPs
+are kept in an ordered dictionary sorted by last activity, so a sweep only
+visits the expired entries at the head of the dictionary. Expired LVAPs are
+removed from the WTP (DEL_LVAP) and from the runtime. LVAPs that associate
+are no longer tracked.
+
+Statistics and the LVAP table size over time are exposed as JSON:
+
+    GET /api/v1/lvapevictor
+"""
+
+import time
+
+from collections import OrderedDict
+from collections import deque
+
+from empower.core.timerwheel import TIMERS
+from empower.restserver.restserver import RESTServer
+from empower.restserver.apihandlers import EmpowerAPIHandler
+
+from empower.main import RUNTIME
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+DEFAULT_TTL = 300000
+DEFAULT_EVERY = 5000
+DEFAULT_HISTORY = 720
+
+
+class LVAPEvictor(object):
+    """Evicts the LVAPs that never associated after a period of inactivity.
+
+    Attributes:
+        ttl: the inactivity period after which an LVAP is evicted (ms)
+        every: the sweep period (ms)
+        evicted: the number of LVAPs evicted so far
+        sweeps: the number of sweeps executed so far
+        last_sweep: the run time of the last sweep (ms)
+        history: the (timestamp, lvaps, tracked, evicted) samples taken at
+          every sweep, oldest first
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, every=DEFAULT_EVERY,
+                 history=DEFAULT_HISTORY):
+
+        self.ttl = int(ttl)
+        self.every = int(every)
+        self.evicted = 0
+        self.sweeps = 0
+        self.last_sweep = 0.0
+        self.history = deque(maxlen=int(history))
+        self.__last_seen = OrderedDict()
+        self.__worker = None
+
+    @property
+    def tracked(self):
+        """Return the number of tracked LVAPs."""
+
+        return len(self.__last_seen)
+
+    def start(self):
+        """Start sweeping."""
+
+        if self.__worker:
+            return
+
+        if self.ttl <= 0:
+            raise ValueError("Invalid ttl %d" % self.ttl)
+
+        self.__worker = TIMERS.add(self.sweep, self.every)
+
+    def stop(self):
+        """Stop sweeping and forget the tracked LVAPs."""
+
+        if not self.__worker:
+            return
+
+        self.__worker.stop()
+        self.__worker = None
+        self.__last_seen.clear()
+
+    def touch(self, lvap):
+        """Record activity from an LVAP.
+
+        Associated LVAPs are not tracked. Nothing is done if the evictor
+        is not running.
+        """
+
+        if not self.__worker:
+            return
+
+        if lvap.association_state:
+            self.__last_seen.pop(lvap.addr, None)
+            return
+
+        self.__last_seen[lvap.addr] = time.monotonic()
+        self.__last_seen.move_to_end(lvap.addr)
+
+    def sweep(self):
+        """Evict the LVAPs whose last activity is older than the ttl."""
+
+        started = time.monotonic()
+        deadline = started - self.ttl / 1000.0
+        evicted = 0
+
+        while self.__last_seen:
+
+            addr = next(iter(self.__last_seen))
+
+            if self.__last_seen[addr] > deadline:
+                break
+
+            del self.__last_seen[addr]
+
+            lvap = RUNTIME.lvaps.get(addr)
+
+            # already removed or associated in the meantime
+            if not lvap or lvap.association_state or lvap.tenant:
+                continue
+
+            self.evict(lvap)
+            evicted += 1
+
+        self.evicted += evicted
+        self.sweeps += 1
+        self.last_sweep = (time.monotonic() - started) * 1000
+        self.history.append((time.time(), len(RUNTIME.lvaps),
+                             len(self.__last_seen), evicted))
+
+        if evicted:
+            LOG.info("Evicted %u LVAPs, %u LVAPs left", evicted,
+                     len(RUNTIME.lvaps))
+
+    @staticmethod
+    def evict(lvap):
+        """Remove an LVAP from its WTP and from the runtime."""
+
+        LOG.info("Evicting idle LVAP %s", lvap.addr)
+
+        wtp = lvap.wtp
+
+        if wtp and wtp.connection:
+            wtp.connection.send_del_lvap(lvap)
+
+        lvap.clear_ports()
+
+        del RUNTIME.lvaps[lvap.addr]
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        return {'ttl': self.ttl,
+                'every': self.every,
+                'running': self.__worker is not None,
+                'tracked': self.tracked,
+                'lvaps': len(RUNTIME.lvaps),
+                'evicted': self.evicted,
+                'sweeps': self.sweeps,
+                'last_sweep': self.last_sweep,
+                'history': [{'timestamp': timestamp,
+                             'lvaps': lvaps,
+                             'tracked': tracked,
+                             'evicted': evicted}
+                            for timestamp, lvaps, tracked, evicted
+                            in self.history]}
+
+
+class LVAPEvictorHandler(EmpowerAPIHandler):
+    """LVAP evictor handler. Used to query the eviction statistics."""
+
+    HANDLERS = [r"/api/v1/lvapevictor/?"]
+
+    def get(self, *args, **kwargs):
+        """ Return the LVAP evictor statistics.
+
+        Example URLs:
+            GET /api/v1/lvapevictor
+        """
+
+        self.write_as_json(self.server.to_dict())
+
+
+LVAP_EVICTOR = LVAPEvictor()
+
+
+def launch(ttl=DEFAULT_TTL, every=DEFAULT_EVERY, history=DEFAULT_HISTORY):
+    """Start the LVAP evictor."""
+
+    LVAP_EVICTOR.ttl = int(ttl)
+    LVAP_EVICTOR.every = int(every)
+    LVAP_EVICTOR.history = deque(maxlen=int(history))
+    LVAP_EVICTOR.start()
+
+    rest_server = RUNTIME.components[RESTServer.__module__]
+    rest_server.add_handler_class(LVAPEvictorHandler, LVAP_EVICTOR)
+
+    LOG.info("LVAP evictor ttl %u ms, sweep every %u ms",
+             LVAP_EVICTOR.ttl, LVAP_EVICTOR.every)
+
+    return LVAP_EVICTOR
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""LVAP memory benchmark.
+
+Measures the memory used by the LVAPs spawned on probe requests, each one
+supporting the resource blocks in LVAP_BLOCKS, with the current
+ResourceBlock and with the previous representation (LegacyResourceBlock,
+kept here for reference), which allocated two channel quality maps, a
+transmission policy container and an MCS set for every block.
+
+Usage:
+    python3 -m empower.lvapp.lvapmembench --lvaps 50000
+"""
+
+import gc
+import tracemalloc
+
+from argparse import ArgumentParser
+
+import empower.main
+from empower.core.core import EmpowerRuntime
+from empower.datatypes.etheraddress import EtherAddress
+from empower.core.resourcepool import BT_HT20
+from empower.core.resourcepool import BT_HT40
+from empower.core.utils import generate_bssid
+
+# the LVAPP connection binds the runtime at import time, it is imported
+# only after the runtime has been created
+
+DEFAULT_LVAPS = 10000
+
+
+class LegacyCQM(dict):
+    """The previous CQM container."""
+
+    pass
+
+
+class LegacyTxPolicyProp(dict):
+    """The previous transmission policies container."""
+
+    def __init__(self, block, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.block = block
+
+
+class LegacyResourceBlock(object):
+    """The previous ResourceBlock allocations."""
+
+    def __init__(self, radio, hwaddr, channel, band):
+
+        self._radio = radio
+        self._hwaddr = hwaddr
+        self._channel = channel
+        self._band = band
+        self.ucqm = LegacyCQM()
+        self.ncqm = LegacyCQM()
+        self.tx_policies = LegacyTxPolicyProp(self)
+
+        if self._band == BT_HT20 or self._band == BT_HT40:
+            self._supports = set([0, 1, 2, 3, 4, 5, 6, 7])
+        else:
+            if self._channel > 14:
+                self._supports = \
+                    set([6.0, 9.0, 12.0, 18.0, 24.0, 36.0, 48.0, 54.0])
+            else:
+                self._supports = \
+                    set([1.0, 2.0, 5.5, 11.0,
+                         6.0, 9.0, 12.0, 18.0, 24.0, 36.0, 48, 54.0])
+
+    def __hash__(self):
+
+        return hash(self._radio.addr) + hash(self._hwaddr) + \
+            hash(self._channel) + hash(self._band)
+
+    def __eq__(self, other):
+
+        return (other._radio == self._radio and
+                other._hwaddr == self._hwaddr and
+                other._channel == self._channel and
+                other._band == self._band)
+
+
+def spawn(block_cls, nb_lvaps):
+    """Spawn LVAPs the way the probe request handler does."""
+
+    from empower.core.lvap import LVAP
+    from empower.lvapp.lvappconnection import BASE_MAC
+    from empower.lvapp.lvappconnection import LVAP_BLOCKS
+
+    lvaps = []
+
+    for index in range(nb_lvaps):
+        sta = EtherAddress.from_int(0x020000000000 + index)
+        net_bssid = generate_bssid(BASE_MAC, sta)
+        lvap = LVAP(sta, net_bssid, net_bssid)
+        for channel, band in LVAP_BLOCKS:
+            lvap.supports.add(block_cls(lvap, sta, channel, band))
+        lvaps.append(lvap)
+
+    return lvaps
+
+
+def measure(block_cls, nb_lvaps):
+    """Return the bytes allocated per LVAP."""
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    lvaps = spawn(block_cls, nb_lvaps)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del lvaps
+
+    return (after - before) / nb_lvaps
+
+
+def parse_args(args=None):
+    """Parse the command line arguments."""
+
+    parser = ArgumentParser(description="LVAP memory benchmark")
+
+    parser.add_argument("--lvaps", type=int, default=DEFAULT_LVAPS,
+                        help="number of LVAPs to spawn")
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Run the benchmark."""
+
+    args = parse_args(args)
+
+    empower.main.RUNTIME = EmpowerRuntime()
+
+    from empower.core.resourcepool import ResourceBlock
+
+    # the addresses are interned, spawn once so that they are not counted
+    spawn(ResourceBlock, args.lvaps)
+
+    legacy = measure(LegacyResourceBlock, args.lvaps)
+    current = measure(ResourceBlock, args.lvaps)
+
+    print("%u LVAPs" % args.lvaps)
+    print("legacy:  %8.0f bytes/LVAP" % legacy)
+    print("current: %8.0f bytes/LVAP" % current)
+    print("saving:  %8.1f%%" % (100.0 * (legacy - current) / legacy))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""LVAPP controller benchmark.
+
+Runs an LVAPPServer in this process and drives it with a swarm of simulated
+WTPs (see empower.lvapp.wtpsim) running in a separate process, scaling the
+number of WTPs and of stations per WTP. For every step it reports the
+association completion latency measured by the stations, the number of
+messages handled per second by the controller and the IOLoop lag.
+
+The tenant and the WTPs are created in memory only, the configuration
+database is not modified.
+
+Usage:
+    python3 -m empower.lvapp.lvappbench --wtps 10,100 --stations 1,10,100
+"""
+
+import time
+import uuid
+import queue
+import logging
+import multiprocessing
+
+from argparse import ArgumentParser
+
+import numpy as np
+import tornado.ioloop
+
+import empower.main
+from empower.core.core import EmpowerRuntime
+from empower.core.tenant import T_TYPE_UNIQUE
+from empower.datatypes.ssid import SSID
+from empower.datatypes.etheraddress import EtherAddress
+from empower.lvapp import CODECS
+from empower.lvapp import CODEC_FAST
+
+# the LVAPP server and the simulator import modules which bind the runtime
+# at import time, they are imported only after the runtime has been created
+
+DEFAULT_LAG_EVERY = 10
+DEFAULT_TIMEOUT = 120
+
+
+class LagMonitor(object):
+    """Measure how late the IOLoop runs a callback scheduled every ms."""
+
+    def __init__(self, every=DEFAULT_LAG_EVERY):
+        self.every = every / 1000
+        self.samples = []
+        self.__expected = None
+        self.__handle = None
+
+    def start(self):
+        """Start sampling the IOLoop lag."""
+
+        self.samples = []
+        self.__schedule()
+
+    def stop(self):
+        """Stop sampling the IOLoop lag."""
+
+        if self.__handle:
+            tornado.ioloop.IOLoop.current().remove_timeout(self.__handle)
+            self.__handle = None
+
+    def __schedule(self):
+
+        self.__expected = time.time() + self.every
+        self.__handle = tornado.ioloop.IOLoop.current().call_later(
+            self.every, self.__tick)
+
+    def __tick(self):
+
+        self.samples.append(max(time.time() - self.__expected, 0) * 1000)
+        self.__schedule()
+
+
+class TriggerRecorder(object):
+    """Count and time the LVAPP messages handled by the controller."""
+
+    def __init__(self):
+        self.latencies = {}
+
+    def reset(self):
+        """Drop the recorded samples."""
+
+        self.latencies = {}
+
+    def wrap(self, trigger):
+        """Return a timed version of the trigger method."""
+
+        recorder = self
+
+        def timed_trigger(connection, msg_type, frame):
+            started = time.perf_counter()
+            trigger(connection, msg_type, frame)
+            elapsed = time.perf_counter() - started
+            if msg_type not in recorder.latencies:
+                recorder.latencies[msg_type] = []
+            recorder.latencies[msg_type].append(elapsed)
+
+        return timed_trigger
+
+
+def setup(server, ssid, wtps):
+    """Create the tenant and the WTPs used by the simulated swarm."""
+
+    from empower.core.tenant import Tenant
+    from empower.core.wtp import WTP
+    from empower.lvapp.wtpsim import wtp_address
+
+    tenant_name = SSID(ssid)
+    tenant = RUNTIME().tenant_names.get(tenant_name)
+
+    if not tenant:
+        tenant = Tenant(uuid.uuid4(), tenant_name, "root", "LVAPP benchmark",
+                        T_TYPE_UNIQUE)
+        RUNTIME().tenants[tenant.tenant_id] = tenant
+        RUNTIME().tenant_names[tenant_name] = tenant
+
+    for index in range(1, wtps + 1):
+        addr = EtherAddress(wtp_address(index))
+        if addr in server.pnfdevs:
+            continue
+        wtp = WTP(addr, "Simulated WTP %u" % index)
+        server.pnfdevs[addr] = wtp
+        tenant.wtps[addr] = wtp
+        RUNTIME().index_pnfdev(tenant, wtp)
+
+
+def RUNTIME():
+    """Return the runtime created by the benchmark."""
+
+    return empower.main.RUNTIME
+
+
+def run_step(server, recorder, wtps, stations, args):
+    """Run a benchmark step and return its results."""
+
+    from empower.lvapp.wtpsim import run_swarm
+
+    setup(server, args.ssid, wtps)
+
+    swarm_args = ["--port", str(args.port),
+                  "--wtps", str(wtps),
+                  "--stations", str(stations),
+                  "--ssid", args.ssid,
+                  "--arrival-every", str(args.arrival_every)]
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=run_swarm, args=(swarm_args, results))
+
+    loop = tornado.ioloop.IOLoop.current()
+    lag = LagMonitor()
+    marks = {}
+
+    def poll():
+        try:
+            marks['swarm'] = results.get_nowait()
+        except queue.Empty:
+            if time.time() - marks['wall'] < args.timeout:
+                return
+        loop.stop()
+
+    recorder.reset()
+    lag.start()
+    marks['wall'] = time.time()
+    marks['cpu'] = time.process_time()
+
+    process.start()
+
+    poller = tornado.ioloop.PeriodicCallback(poll, 100)
+    poller.start()
+    loop.start()
+    poller.stop()
+
+    marks['wall'] = time.time() - marks['wall']
+    marks['cpu'] = time.process_time() - marks['cpu']
+    lag.stop()
+
+    process.join(5)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+
+    # let the controller process the disconnections
+    loop.call_later(0.5, loop.stop)
+    loop.start()
+
+    samples = [np.array(v) for v in recorder.latencies.values()]
+    every = np.concatenate(samples) if samples else np.zeros(0)
+    lags = np.array(lag.samples) if lag.samples else np.zeros(1)
+
+    out = {'wtps': wtps,
+           'stations': stations,
+           'messages': every.size,
+           'rate': every.size / marks['wall'],
+           'cpu': 100.0 * marks['cpu'] / marks['wall'],
+           'lag_p50': np.percentile(lags, 50),
+           'lag_p99': np.percentile(lags, 99),
+           'lag_max': lags.max(),
+           'swarm': marks.get('swarm', {})}
+
+    return out
+
+
+def print_step(step):
+    """Print the results of a benchmark step."""
+
+    swarm = step['swarm']
+
+    print("wtps=%u stations/wtp=%u: %.0f msg/s, cpu %.1f%%, "
+          "ioloop lag p50 %.1f ms p99 %.1f ms max %.1f ms" %
+          (step['wtps'], step['stations'], step['rate'], step['cpu'],
+           step['lag_p50'], step['lag_p99'], step['lag_max']))
+
+    if not swarm:
+        print("    swarm did not complete")
+        return
+
+    print("    %u/%u associated, %u failed" %
+          (swarm['associated'], swarm['stations'], swarm['failed']))
+
+    if swarm['associated']:
+        print("    association latency p50 %.1f ms p99 %.1f ms max %.1f ms" %
+              (swarm['latency_p50'], swarm['latency_p99'],
+               swarm['latency_max']))
+
+
+def parse_args(args=None):
+    """Parse the command line arguments."""
+
+    from empower.lvapp.lvappserver import DEFAULT_PORT
+    from empower.lvapp.wtpsim import DEFAULT_ARRIVAL_EVERY
+
+    parser = ArgumentParser(description="LVAPP controller benchmark")
+
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--codec", default=CODEC_FAST, choices=CODECS)
+    parser.add_argument("--wtps", default="10,100",
+                        help="comma separated number of WTPs")
+    parser.add_argument("--stations", default="1,10,100",
+                        help="comma separated number of stations per WTP")
+    parser.add_argument("--ssid", default="EmPOWER_bench")
+    parser.add_argument("--arrival-every", type=int,
+                        default=DEFAULT_ARRIVAL_EVERY,
+                        help="ms between station arrivals on a WTP")
+    parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT,
+                        help="maximum seconds per step")
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Run the benchmark."""
+
+    logging.basicConfig(level=logging.WARNING)
+
+    empower.main.RUNTIME = EmpowerRuntime()
+
+    args = parse_args(args)
+
+    from empower.lvapp import PT_TYPES
+    from empower.lvapp import PT_TYPES_HANDLERS
+    from empower.lvapp.lvappserver import LVAPPServer
+    from empower.lvapp.lvappconnection import LVAPPConnection
+
+    recorder = TriggerRecorder()
+    LVAPPConnection._trigger_message = \
+        recorder.wrap(LVAPPConnection._trigger_message)
+
+    server = LVAPPServer(args.port, PT_TYPES, PT_TYPES_HANDLERS,
+                         codec=args.codec)
+
+    for wtps in [int(x) for x in args.wtps.split(",")]:
+        for stations in [int(x) for x in args.stations.split(",")]:
+            print_step(run_step(server, recorder, wtps, stations, args))
+
+
+if __name__ == "__main__":
+    main()
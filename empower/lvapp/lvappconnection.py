@@ -29,6 +29,7 @@
 
 import tornado.ioloop
 import time
+import struct
 
 from construct import Container
 
@@ -38,7 +39,16 @@ from empower.core.resourcepool import ResourceBlock
 from empower.core.resourcepool import ResourcePool
 from empower.core.resourcepool import BT_L20
 from empower.core.radioport import RadioPort
-from empower.lvapp import HEADER
+from empower.core.framedecoder import FrameDecoder
+from empower.core.timerwheel import TIMERS
+from empower.core.capture import CAPTURE
+from empower.core.capture import PROTO_LVAPP
+from empower.core.capture import KIND_IN
+from empower.core.capture import KIND_OUT
+from empower.core.loopmonitor import HANDLER_LATENCY
+from empower.lvapp.lvapevictor import LVAP_EVICTOR
+from empower.lvapp import HEADER_LEN
+from empower.lvapp import CODEC_FAST
 from empower.lvapp import PT_VERSION
 from empower.lvapp import PT_BYE
 from empower.lvapp import PT_REGISTER
@@ -61,7 +71,8 @@ from empower.core.networkport import NetworkPort
 from empower.core.vap import VAP
 from empower.lvapp import PT_ADD_VAP
 from empower.lvapp import ADD_VAP
-from empower.core.tenant import T_TYPE_SHARED
+from empower.lvapp.fastcodec import PT_TYPES as FAST_PT_TYPES
+from empower.lvapp.fastcodec import STRUCTS as FAST_STRUCTS
 from empower.core.tenant import T_TYPE_UNIQUE
 from empower.core.utils import generate_bssid
 
@@ -72,6 +83,26 @@ LOG = empower.logger.get_logger()
 
 BASE_MAC = EtherAddress("00:1b:b3:00:00:00")
 
+# the (channel, band) of the blocks supported by every new LVAP. Only the
+# (channel, band) pairs are shared, each LVAP still gets its own blocks:
+# a block is hashed and compared together with its radio (the LVAP) and its
+# hwaddr (the station), it is mutable (ucqm, tx_policies, supports), and an
+# intersection with lvap.supports on the left hand side returns the LVAP
+# blocks, which must then carry the LVAP. The per-block cost is kept low by
+# the lazily allocated containers and the shared MCS sets in ResourceBlock.
+LVAP_BLOCKS = ((1, BT_L20), (2, BT_L20), (3, BT_L20), (4, BT_L20),
+               (5, BT_L20), (6, BT_L20), (7, BT_L20), (8, BT_L20),
+               (9, BT_L20), (10, BT_L20), (11, BT_L20), (36, BT_L20),
+               (48, BT_L20))
+
+FRAME_LENGTH = struct.Struct("!H")
+
+
+def frame_length(view, offset):
+    """Return the length of the LVAPP frame starting at offset."""
+
+    return FRAME_LENGTH.unpack_from(view, offset + 2)[0]
+
 
 class LVAPPConnection(object):
 
@@ -115,6 +146,11 @@ class LVAPPConnection(object):
         address: The connection source address, i.e. the WTP IP address.
         server: Pointer to the server object.
         wtp: Pointer to a WTP object.
+        flushes: Number of writes issued on the stream.
+        flushed_msgs: Number of messages sent over the stream.
+        flushed_bytes: Number of bytes sent over the stream.
+        capture_id: The connection id in the signalling capture, 0 if the
+          capture is disabled.
     """
 
     def __init__(self, stream, addr, server):
@@ -123,11 +159,16 @@ class LVAPPConnection(object):
         self.server = server
         self.wtp = None
         self.stream.set_close_callback(self._on_disconnect)
-        self.__buffer = b''
+        self.__decoder = FrameDecoder(HEADER_LEN, frame_length,
+                                      server.max_frame)
+        self.__outbound = []
+        self.__flush_pending = False
+        self.flushes = 0
+        self.flushed_msgs = 0
+        self.flushed_bytes = 0
         self._hb_interval_ms = 500
-        self._hb_worker = tornado.ioloop.PeriodicCallback(self._heartbeat_cb,
-                                                          self._hb_interval_ms)
-        self._hb_worker.start()
+        self._hb_worker = TIMERS.add(self._heartbeat_cb, self._hb_interval_ms)
+        self.capture_id = CAPTURE.open(PROTO_LVAPP, addr)
         self._wait()
 
     def to_dict(self):
@@ -135,6 +176,70 @@ class LVAPPConnection(object):
 
         return self.addr
 
+    @property
+    def flush_stats(self):
+        """Return the outbound queue counters."""
+
+        return {'flushes': self.flushes,
+                'messages': self.flushed_msgs,
+                'bytes': self.flushed_bytes,
+                'messages_per_flush':
+                    self.flushed_msgs / self.flushes if self.flushes else 0,
+                'bytes_per_flush':
+                    self.flushed_bytes / self.flushes if self.flushes else 0}
+
+    def send_message(self, msg, flush=False):
+        """Queue a message for the WTP.
+
+        Messages queued during the same IOLoop iteration are sent with a
+        single write at the end of the iteration. Latency critical replies
+        can set flush in order to push the queue out immediately.
+
+        Args:
+            msg: the encoded message
+            flush: write the outbound queue right away
+
+        Returns:
+            None
+        """
+
+        if self.stream.closed():
+            return
+
+        self.__outbound.append(msg)
+
+        if flush:
+            self.flush()
+            return
+
+        if not self.__flush_pending:
+            self.__flush_pending = True
+            tornado.ioloop.IOLoop.current().add_callback(self.flush)
+
+    def flush(self):
+        """Write all the queued messages to the stream."""
+
+        self.__flush_pending = False
+
+        if not self.__outbound:
+            return
+
+        outbound = self.__outbound
+        self.__outbound = []
+
+        if self.stream.closed():
+            return
+
+        data = b"".join(outbound)
+        self.stream.write(data)
+
+        if self.capture_id:
+            CAPTURE.write(PROTO_LVAPP, KIND_OUT, self.capture_id, data)
+
+        self.flushes += 1
+        self.flushed_msgs += len(outbound)
+        self.flushed_bytes += len(data)
+
     def _heartbeat_cb(self):
         """ Check if wtp connection is still active. Disconnect if no hellos
         have been received from the wtp for twice the hello period. """
@@ -147,34 +252,55 @@ class LVAPPConnection(object):
 
                 self.stream.close()
 
-    def _on_read(self, line):
-        """ Appends bytes read from socket to a buffer. Once the full packet
-        has been read the parser is invoked and the buffers is cleared. The
-        parsed packet is then passed to the suitable method or dropped if the
-        packet type in unknown. """
+    def _on_read(self, nbytes):
+        """ Commits the bytes read from socket to the receive buffer and
+        dispatches every complete frame found in it. Incomplete frames are
+        kept in the buffer until the next read. Frames longer than the
+        configured maximum close the connection. """
 
-        self.__buffer = self.__buffer + line
-        hdr = HEADER.parse(self.__buffer)
+        self.__decoder.commit(nbytes)
 
-        if len(self.__buffer) < hdr.length:
-            remaining = hdr.length - len(self.__buffer)
-            self.stream.read_bytes(remaining, self._on_read)
-            return
+        frames = self.__decoder.frames()
+
+        while True:
+
+            # only framing errors close the connection here, errors raised
+            # by the message handlers are propagated
+            try:
+                frame = next(frames, None)
+            except ValueError as ex:
+                LOG.error("Closing connection from %r: %s", self.addr, ex)
+                self.stream.close()
+                return
+
+            if frame is None:
+                break
+
+            if self.capture_id:
+                CAPTURE.write(PROTO_LVAPP, KIND_IN, self.capture_id, frame)
+
+            self._trigger_message(frame[1], frame)
 
-        self._trigger_message(hdr.type)
         self._wait()
 
-    def _trigger_message(self, msg_type):
+    def _trigger_message(self, msg_type, frame):
 
         if msg_type not in self.server.pt_types:
 
             LOG.error("Unknown message type %u", msg_type)
             return
 
-        if self.server.pt_types[msg_type]:
+        started = time.perf_counter()
+        msg = None
+        parser = self.server.pt_types[msg_type]
+
+        if parser:
 
-            msg = self.server.pt_types[msg_type].parse(self.__buffer)
-            handler_name = "_handle_%s" % self.server.pt_types[msg_type].name
+            if self.server.codec == CODEC_FAST:
+                parser = FAST_PT_TYPES.get(msg_type, parser)
+
+            msg = parser.parse(frame)
+            handler_name = "_handle_%s" % parser.name
 
             if hasattr(self, handler_name):
                 handler = getattr(self, handler_name)
@@ -184,6 +310,17 @@ class LVAPPConnection(object):
             for handler in self.server.pt_types_handlers[msg_type]:
                 handler(msg)
 
+        HANDLER_LATENCY.observe("lvapp", parser.name if parser else msg_type,
+                                time.perf_counter() - started)
+
+    def _build(self, parser, message):
+        """Build a message using the codec selected in the server."""
+
+        if self.server.codec == CODEC_FAST:
+            parser = FAST_STRUCTS[parser.name]
+
+        return parser.build(message)
+
     def _handle_hello(self, hello):
         """Handle an incoming HELLO message.
         Args:
@@ -258,7 +395,7 @@ class LVAPPConnection(object):
                 vap = VAP(net_bssid, block, wtp, tenant)
 
                 self.send_add_vap(vap)
-                RUNTIME.tenants[tenant_id].vaps[net_bssid] = vap
+                RUNTIME.tenants[tenant_id].add_vap(vap)
 
     def _handle_probe_request(self, request):
         """Handle an incoming PROBE_REQUEST message.
@@ -283,6 +420,7 @@ class LVAPPConnection(object):
         sta = EtherAddress(request.sta)
 
         if sta in RUNTIME.lvaps:
+            LVAP_EVICTOR.touch(RUNTIME.lvaps[sta])
             return
 
         if not RUNTIME.is_allowed(sta):
@@ -299,14 +437,7 @@ class LVAPPConnection(object):
             LOG.info("Probe request from %s ssid %s", sta, ssid)
 
         # generate list of available SSIDs
-        ssids = set()
-
-        for tenant in RUNTIME.tenants.values():
-            if tenant.bssid_type == T_TYPE_SHARED:
-                continue
-            for wtp_in_tenant in tenant.wtps.values():
-                if wtp_addr == wtp_in_tenant.addr:
-                    ssids.add(tenant.tenant_name)
+        ssids = set(RUNTIME.wtp_ssids.get(wtp_addr, ()))
 
         if not ssids:
             LOG.info("No SSIDs available at this WTP")
@@ -319,21 +450,11 @@ class LVAPPConnection(object):
         lvap.set_ssids(ssids)
 
         RUNTIME.lvaps[sta] = lvap
+        LVAP_EVICTOR.touch(lvap)
 
         # TODO: This should be built starting from the probe request
-        lvap.supports.add(ResourceBlock(lvap, sta, 1, BT_L20))
-        lvap.supports.add(ResourceBlock(lvap, sta, 2, BT_L20))
-        lvap.supports.add(ResourceBlock(lvap, sta, 3, BT_L20))
-        lvap.supports.add(ResourceBlock(lvap, sta, 4, BT_L20))
-        lvap.supports.add(ResourceBlock(lvap, sta, 5, BT_L20))
-        lvap.supports.add(ResourceBlock(lvap, sta, 6, BT_L20))
-        lvap.supports.add(ResourceBlock(lvap, sta, 7, BT_L20))
-        lvap.supports.add(ResourceBlock(lvap, sta, 8, BT_L20))
-        lvap.supports.add(ResourceBlock(lvap, sta, 9, BT_L20))
-        lvap.supports.add(ResourceBlock(lvap, sta, 10, BT_L20))
-        lvap.supports.add(ResourceBlock(lvap, sta, 11, BT_L20))
-        lvap.supports.add(ResourceBlock(lvap, sta, 36, BT_L20))
-        lvap.supports.add(ResourceBlock(lvap, sta, 48, BT_L20))
+        for channel, band in LVAP_BLOCKS:
+            lvap.supports.add(ResourceBlock(lvap, sta, channel, band))
 
         # This will trigger an LVAP ADD message (and REMOVE if necessary)
         requested = ResourcePool()
@@ -375,6 +496,7 @@ class LVAPPConnection(object):
             return
 
         lvap = RUNTIME.lvaps[sta]
+        LVAP_EVICTOR.touch(lvap)
 
         if not RUNTIME.is_allowed(sta):
             LOG.info("Auth request from %s ignored (white list)", sta)
@@ -392,18 +514,10 @@ class LVAPPConnection(object):
             lvap_bssid = lvap.net_bssid
 
         # else if is a shared bssid
-        else:
+        # look for bssid in shared tenants
+        elif bssid in RUNTIME.wtp_shared_vaps.get(wtp_addr, {}):
 
-            shared_tenants = [x for x in RUNTIME.tenants.values()
-                              if x.bssid_type == T_TYPE_SHARED]
-
-            wtp = RUNTIME.wtps[wtp_addr]
-
-            # look for bssid in shared tenants
-            for tenant in shared_tenants:
-                if bssid in tenant.vaps and tenant.vaps[bssid].wtp == wtp:
-                    lvap_bssid = bssid
-                    break
+            lvap_bssid = bssid
 
         # invalid bssid, ignore request
         if not lvap_bssid:
@@ -443,6 +557,7 @@ class LVAPPConnection(object):
             return
 
         lvap = RUNTIME.lvaps[sta]
+        LVAP_EVICTOR.touch(lvap)
 
         if not RUNTIME.is_allowed(sta):
             LOG.info("Assoc request from %s ignored (white list)", sta)
@@ -458,15 +573,10 @@ class LVAPPConnection(object):
         tenant_name = None
 
         # look for ssid in shared tenants
-        for tenant_id in RUNTIME.tenants:
-
-            tenant = RUNTIME.tenants[tenant_id]
-
-            if tenant.bssid_type == T_TYPE_UNIQUE:
-                continue
+        vap = RUNTIME.wtp_shared_vaps.get(wtp_addr, {}).get(bssid)
 
-            if bssid in tenant.vaps and ssid == tenant.tenant_name:
-                tenant_name = tenant.tenant_name
+        if vap and ssid == vap.ssid:
+            tenant_name = vap.ssid
 
         # otherwise this must be the lvap unique bssid
         if lvap.net_bssid == bssid and ssid in lvap.ssids:
@@ -490,12 +600,21 @@ class LVAPPConnection(object):
 
     def _wait(self):
         """ Wait for incoming packets on signalling channel """
-        self.__buffer = b''
-        self.stream.read_bytes(4, self._on_read)
+
+        if self.stream.closed():
+            return
+
+        self.stream.read_into(self.__decoder.writable(), self._on_read,
+                              partial=True)
 
     def _on_disconnect(self):
         """ Handle WTP disconnection """
 
+        self._hb_worker.stop()
+
+        if self.capture_id:
+            CAPTURE.close(PROTO_LVAPP, self.capture_id)
+
         if not self.wtp:
             return
 
@@ -529,7 +648,7 @@ class LVAPPConnection(object):
 
         for vap in to_be_removed:
             LOG.info("Deleting VAP: %s", vap.net_bssid)
-            del RUNTIME.tenants[vap.tenant_id].vaps[vap.net_bssid]
+            RUNTIME.tenants[vap.tenant_id].remove_vap(vap)
 
     def send_bye_message_to_self(self):
         """Send a unsollicited BYE message to senf."""
@@ -580,19 +699,9 @@ class LVAPPConnection(object):
             lvap = LVAP(sta_addr, net_bssid_addr, lvap_bssid_addr)
 
             # TODO: This should be built starting from the status message
-            lvap.supports.add(ResourceBlock(lvap, sta_addr, 1, BT_L20))
-            lvap.supports.add(ResourceBlock(lvap, sta_addr, 2, BT_L20))
-            lvap.supports.add(ResourceBlock(lvap, sta_addr, 3, BT_L20))
-            lvap.supports.add(ResourceBlock(lvap, sta_addr, 4, BT_L20))
-            lvap.supports.add(ResourceBlock(lvap, sta_addr, 5, BT_L20))
-            lvap.supports.add(ResourceBlock(lvap, sta_addr, 6, BT_L20))
-            lvap.supports.add(ResourceBlock(lvap, sta_addr, 7, BT_L20))
-            lvap.supports.add(ResourceBlock(lvap, sta_addr, 8, BT_L20))
-            lvap.supports.add(ResourceBlock(lvap, sta_addr, 9, BT_L20))
-            lvap.supports.add(ResourceBlock(lvap, sta_addr, 10, BT_L20))
-            lvap.supports.add(ResourceBlock(lvap, sta_addr, 11, BT_L20))
-            lvap.supports.add(ResourceBlock(lvap, sta_addr, 36, BT_L20))
-            lvap.supports.add(ResourceBlock(lvap, sta_addr, 48, BT_L20))
+            for channel, band in LVAP_BLOCKS:
+                lvap.supports.add(ResourceBlock(lvap, sta_addr, channel,
+                                                band))
 
             RUNTIME.lvaps[sta_addr] = lvap
 
@@ -632,6 +741,8 @@ class LVAPPConnection(object):
         lvap.authentication_state = bool(status.flags.authenticated)
         lvap.association_state = bool(status.flags.associated)
 
+        LVAP_EVICTOR.touch(lvap)
+
         lvap._assoc_id = status.assoc_id
         lvap._encap = EtherAddress(status.encap)
         ssids = [SSID(x.ssid) for x in status.ssids]
@@ -813,19 +924,12 @@ class LVAPPConnection(object):
 
         net_bssid_addr = EtherAddress(status.net_bssid)
         ssid = SSID(status.ssid)
-        tenant_id = None
+        tenant = RUNTIME.load_tenant(ssid)
 
-        for tenant in RUNTIME.tenants.values():
-            if tenant.tenant_name == ssid:
-                tenant_id = tenant.tenant_id
-                break
-
-        if not tenant_id:
+        if not tenant:
             LOG.info("VAP %s from unknown tenant %s", net_bssid_addr, ssid)
             return
 
-        tenant = RUNTIME.tenants[tenant_id]
-
         vap = None
         hwaddr = EtherAddress(status.hwaddr)
         block = ResourceBlock(wtp, hwaddr, status.channel, status.band)
@@ -835,8 +939,7 @@ class LVAPPConnection(object):
 
         # If the VAP does not exists, then create a new one
         if net_bssid_addr not in tenant.vaps:
-            tenant.vaps[net_bssid_addr] = \
-                VAP(net_bssid_addr, block, wtp, tenant)
+            tenant.add_vap(VAP(net_bssid_addr, block, wtp, tenant))
 
         vap = tenant.vaps[net_bssid_addr]
         LOG.info("VAP status %s", vap)
@@ -864,8 +967,8 @@ class LVAPPConnection(object):
         add_vap.length = add_vap.length + len(vap.ssid)
         LOG.info("Add vap %s", vap)
 
-        msg = ADD_VAP.build(add_vap)
-        self.stream.write(msg)
+        msg = self._build(ADD_VAP, add_vap)
+        self.send_message(msg)
 
     def send_assoc_response(self, lvap):
         """Send a ASSOC_RESPONSE message.
@@ -883,8 +986,8 @@ class LVAPPConnection(object):
                              seq=self.wtp.seq,
                              sta=lvap.addr.to_raw())
 
-        msg = ASSOC_RESPONSE.build(response)
-        self.stream.write(msg)
+        msg = self._build(ASSOC_RESPONSE, response)
+        self.send_message(msg, flush=True)
 
     def send_auth_response(self, lvap):
         """Send a AUTH_RESPONSE message.
@@ -903,8 +1006,8 @@ class LVAPPConnection(object):
                              sta=lvap.addr.to_raw(),
                              bssid=lvap.lvap_bssid.to_raw())
 
-        msg = AUTH_RESPONSE.build(response)
-        self.stream.write(msg)
+        msg = self._build(AUTH_RESPONSE, response)
+        self.send_message(msg, flush=True)
 
     def send_probe_response(self, lvap):
         """Send a PROBE_RESPONSE message.
@@ -922,8 +1025,8 @@ class LVAPPConnection(object):
                              seq=self.wtp.seq,
                              sta=lvap.addr.to_raw())
 
-        msg = PROBE_RESPONSE.build(response)
-        self.stream.write(msg)
+        msg = self._build(PROBE_RESPONSE, response)
+        self.send_message(msg, flush=True)
 
     def send_del_lvap(self, lvap):
         """Send a DEL_LVAP message.
@@ -941,8 +1044,8 @@ class LVAPPConnection(object):
                              seq=self.wtp.seq,
                              sta=lvap.addr.to_raw())
 
-        msg = DEL_LVAP.build(del_lvap)
-        self.stream.write(msg)
+        msg = self._build(DEL_LVAP, del_lvap)
+        self.send_message(msg)
 
     def send_set_port(self, tx_policy):
         """Send a SET_PORT message.
@@ -972,8 +1075,8 @@ class LVAPPConnection(object):
                              nb_mcses=len(rates),
                              mcs=rates)
 
-        msg = SET_PORT.build(set_port)
-        self.stream.write(msg)
+        msg = self._build(SET_PORT, set_port)
+        self.send_message(msg)
 
     def send_add_lvap(self, lvap, block, set_mask):
         """Send a ADD_LVAP message.
@@ -1024,5 +1127,5 @@ class LVAPPConnection(object):
             add_lvap.ssids.append(tmp)
             add_lvap.length = add_lvap.length + len(b_ssid) + 1
 
-        msg = ADD_LVAP.build(add_lvap)
-        self.stream.write(msg)
+        msg = self._build(ADD_LVAP, add_lvap)
+        self.send_message(msg)
@@ -37,6 +37,8 @@ from empower.lvapp.lvappconnection import LVAPPConnection
 from empower.persistence.persistence import TblWTP
 from empower.core.wtp import WTP
 
+from empower.lvapp import CODECS
+from empower.lvapp import CODEC_CONSTRUCT
 from empower.lvapp import PT_TYPES
 from empower.lvapp import PT_TYPES_HANDLERS
 from empower.lvapp.lvaphandler import LVAPHandler
@@ -51,6 +53,7 @@ import empower.logger
 LOG = empower.logger.get_logger()
 
 DEFAULT_PORT = 4433
+DEFAULT_MAX_FRAME = 65535
 
 
 class TenantWTPHandler(BaseTenantPNFDevHandler):
@@ -73,12 +76,18 @@ class LVAPPServer(PNFPServer, TCPServer):
     PNFDEV = WTP
     TBL_PNFDEV = TblWTP
 
-    def __init__(self, port, pt_types, pt_types_handlers):
+    def __init__(self, port, pt_types, pt_types_handlers,
+                 max_frame=DEFAULT_MAX_FRAME, codec=CODEC_CONSTRUCT):
+
+        if codec not in CODECS:
+            raise ValueError("Invalid codec %s" % codec)
 
         PNFPServer.__init__(self, pt_types, pt_types_handlers)
         TCPServer.__init__(self)
 
         self.port = int(port)
+        self.max_frame = int(max_frame)
+        self.codec = codec
         self.connection = None
 
         self.listen(self.port)
@@ -98,10 +107,12 @@ class LVAPPServer(PNFPServer, TCPServer):
         return self.__assoc_id
 
 
-def launch(port=DEFAULT_PORT):
+def launch(port=DEFAULT_PORT, max_frame=DEFAULT_MAX_FRAME,
+           codec=CODEC_CONSTRUCT):
     """Start LVAPP Server Module."""
 
-    server = LVAPPServer(int(port), PT_TYPES, PT_TYPES_HANDLERS)
+    server = LVAPPServer(int(port), PT_TYPES, PT_TYPES_HANDLERS,
+                         int(max_frame), codec)
 
     rest_server = RUNTIME.components[RESTServer.__module__]
     rest_server.add_handler_class(TenantWTPHandler, server)
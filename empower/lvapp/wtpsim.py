@@ -0,0 +1,660 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Simulated WTP swarm for LVAPP controller testing and benchmarking.
+
+Every simulated WTP connects to an LVAPPServer, sends its hellos and its
+capabilities and then lets a number of synthetic stations join the network
+by going through the probe/auth/assoc sequence. The time between the first
+probe request and the association response is recorded for every station.
+
+The WTPs also answer the statistics (counters and rates), poller (user and
+network channel quality maps) and summary requests issued by the
+controller modules with synthetic payloads.
+
+Usage:
+    python3 -m empower.lvapp.wtpsim --wtps 10 --stations 100 --ssid EmPOWER
+"""
+
+import time
+import socket
+import random
+import struct
+import logging
+
+from argparse import ArgumentParser
+
+import numpy as np
+import tornado.ioloop
+import tornado.iostream
+
+from empower.lvapp import PT_VERSION
+from empower.lvapp.lvappserver import DEFAULT_PORT
+from empower.lvapp import PT_HELLO
+from empower.lvapp import PT_CAPS
+from empower.lvapp import PT_PROBE_REQUEST
+from empower.lvapp import PT_PROBE_RESPONSE
+from empower.lvapp import PT_AUTH_REQUEST
+from empower.lvapp import PT_AUTH_RESPONSE
+from empower.lvapp import PT_ASSOC_REQUEST
+from empower.lvapp import PT_ASSOC_RESPONSE
+from empower.lvapp import PT_ADD_LVAP
+from empower.lvapp import PT_STATUS_PORT
+from empower.lvapp.fastcodec import HELLO
+from empower.lvapp.fastcodec import CAPS
+from empower.lvapp.fastcodec import PROBE_REQUEST
+from empower.lvapp.fastcodec import PROBE_RESPONSE
+from empower.lvapp.fastcodec import AUTH_REQUEST
+from empower.lvapp.fastcodec import AUTH_RESPONSE
+from empower.lvapp.fastcodec import ASSOC_REQUEST
+from empower.lvapp.fastcodec import ASSOC_RESPONSE
+from empower.lvapp.fastcodec import ADD_LVAP
+from empower.lvapp.fastcodec import STATUS_PORT
+from empower.core.resourcepool import BT_L20
+from empower.counters.counters import PT_STATS_REQUEST
+from empower.counters.counters import PT_STATS_RESPONSE
+from empower.lvap_stats.lvap_stats import PT_RATES_REQUEST
+from empower.lvap_stats.lvap_stats import PT_RATES_RESPONSE
+from empower.maps.ucqm import PT_POLLER_REQUEST as PT_UCQM_REQUEST
+from empower.maps.ucqm import PT_POLLER_RESPONSE as PT_UCQM_RESPONSE
+from empower.maps.ncqm import PT_POLLER_REQUEST as PT_NCQM_REQUEST
+from empower.maps.ncqm import PT_POLLER_RESPONSE as PT_NCQM_RESPONSE
+from empower.triggers.summary import PT_ADD_SUMMARY
+from empower.triggers.summary import PT_SUMMARY
+from empower.triggers.summary import PT_DEL_SUMMARY
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+DEFAULT_STATIONS = 10
+DEFAULT_HELLO_EVERY = 2000
+DEFAULT_ARRIVAL_EVERY = 10
+DEFAULT_ASSOC_TIMEOUT = 5000
+DEFAULT_CHANNELS = "6,36"
+
+HEADER = struct.Struct("!BBHI")
+
+# module requests, only the fields used by the simulator are decoded
+MODULE_REQUEST = struct.Struct("!BBHII")
+STATS_REQUEST = struct.Struct("!BBHII6s")
+POLLER_REQUEST = struct.Struct("!BBHII6s6sBB")
+ADD_SUMMARY = struct.Struct("!BBHII6s6sBBhH")
+
+STATS_RESPONSE = struct.Struct("!BBHII6s6sHH")
+STATS_ENTRY = struct.Struct("!HI")
+RATES_RESPONSE = struct.Struct("!BBHII6s6sH")
+RATES_ENTRY = struct.Struct("!BB")
+POLLER_RESPONSE = struct.Struct("!BBHII6s6sBBH")
+POLLER_ENTRY = struct.Struct("!6sIiIIii")
+SUMMARY = struct.Struct("!BBHII6sH")
+SUMMARY_ENTRY = struct.Struct("!6sQHbBBBI")
+
+POLLER_RESPONSES = {PT_UCQM_REQUEST: PT_UCQM_RESPONSE,
+                    PT_NCQM_REQUEST: PT_NCQM_RESPONSE}
+
+
+def wtp_address(index):
+    """Return the address of the index-th simulated WTP."""
+
+    return b"\x04\x00" + struct.pack("!I", index)
+
+
+def sta_address(wtp_index, sta_index):
+    """Return the address of a simulated station."""
+
+    return b"\x02" + struct.pack("!H", wtp_index) + \
+        struct.pack("!I", sta_index)[1:]
+
+
+def encode(fast_struct, **fields):
+    """Build an LVAPP message, filling the header."""
+
+    fields['version'] = PT_VERSION
+    fields['length'] = 0
+    fields.setdefault('seq', 0)
+
+    data = bytearray(fast_struct.build(fast_struct.record(**fields)))
+    struct.pack_into("!H", data, 2, len(data))
+
+    return bytes(data)
+
+
+def encode_raw(packer, msg_type, *fields, tail=b""):
+    """Build a module message from a struct.Struct and a raw tail."""
+
+    length = packer.size + len(tail)
+    return packer.pack(PT_VERSION, msg_type, length, 0, *fields) + tail
+
+
+class Station(object):
+    """A synthetic station."""
+
+    __slots__ = ('addr', 'bssid', 'started', 'latency', 'state')
+
+    def __init__(self, addr):
+        self.addr = addr
+        self.bssid = None
+        self.started = None
+        self.latency = None
+        self.state = None
+
+
+class SimulatedWTP(object):
+    """A simulated WTP.
+
+    Attributes:
+        index: the WTP index, used to build the addresses (int)
+        addr: the WTP address (bytes)
+        host: the controller address (str)
+        port: the controller port (int)
+        ssid: the SSID the stations associate to (bytes)
+        stations: the synthetic stations, indexed by address (dict)
+        channels: the channels of the radio resource blocks (list)
+        hello_every: hello period in ms (int)
+        arrival_every: ms between two station arrivals (int)
+        assoc_timeout: ms after which an association is failed (int)
+        sent: number of messages sent, by message type (dict)
+        received: number of messages received, by message type (dict)
+    """
+
+    def __init__(self, index, host="127.0.0.1", port=DEFAULT_PORT,
+                 ssid="EmPOWER", stations=DEFAULT_STATIONS,
+                 channels=(6, 36), hello_every=DEFAULT_HELLO_EVERY,
+                 arrival_every=DEFAULT_ARRIVAL_EVERY,
+                 assoc_timeout=DEFAULT_ASSOC_TIMEOUT):
+
+        self.index = int(index)
+        self.addr = wtp_address(self.index)
+        self.host = host
+        self.port = int(port)
+        self.ssid = ssid.encode() if isinstance(ssid, str) else ssid
+        self.channels = [int(x) for x in channels]
+        self.hello_every = int(hello_every)
+        self.arrival_every = int(arrival_every)
+        self.assoc_timeout = int(assoc_timeout)
+        self.stations = {}
+        self.sent = {}
+        self.received = {}
+        self.sent_bytes = 0
+        self.failed = 0
+        self.stream = None
+        self.__seq = 0
+        self.__waiting = [sta_address(self.index, x)
+                          for x in range(int(stations))]
+        self.__workers = []
+        self.__summaries = {}
+        self.__buffer = b""
+
+        self.blocks = [(b"\x06" + self.addr[2:] + bytes((i, )), channel,
+                        BT_L20) for i, channel in enumerate(self.channels)]
+
+    @property
+    def seq(self):
+        """Return the next sequence number."""
+
+        self.__seq += 1
+        return self.__seq
+
+    @property
+    def latencies(self):
+        """Return the association latencies in ms."""
+
+        return [x.latency for x in self.stations.values()
+                if x.latency is not None]
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'wtp': self.index,
+                'stations': len(self.stations),
+                'associated': len(self.latencies),
+                'failed': self.failed,
+                'sent': self.sent,
+                'received': self.received,
+                'sent_bytes': self.sent_bytes}
+
+    def start(self):
+        """Connect to the controller."""
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self.stream = tornado.iostream.IOStream(sock)
+        self.stream.set_close_callback(self.stop)
+        self.stream.connect((self.host, self.port), self._on_connect)
+
+    def stop(self):
+        """Stop the simulation and close the connection."""
+
+        for worker in self.__workers:
+            worker.stop()
+
+        for worker in self.__summaries.values():
+            worker.stop()
+
+        self.__workers = []
+        self.__summaries = {}
+
+        if self.stream and not self.stream.closed():
+            self.stream.close()
+
+    def send(self, msg_type, data):
+        """Send an encoded message."""
+
+        if not self.stream or self.stream.closed():
+            return
+
+        self.stream.write(data)
+        self.sent[msg_type] = self.sent.get(msg_type, 0) + 1
+        self.sent_bytes += len(data)
+
+    def _on_connect(self):
+
+        self.send_hello()
+        self.send_caps()
+
+        workers = [(self.send_hello, self.hello_every),
+                   (self.arrive, self.arrival_every),
+                   (self.check_timeouts, self.assoc_timeout)]
+
+        for callback, every in workers:
+            worker = tornado.ioloop.PeriodicCallback(callback, every)
+            worker.start()
+            self.__workers.append(worker)
+
+        self._wait()
+
+    def _wait(self):
+
+        if self.stream.closed():
+            return
+
+        self.stream.read_bytes(HEADER.size, self._on_header)
+
+    def _on_header(self, header):
+
+        length = HEADER.unpack(header)[2]
+
+        if length <= HEADER.size:
+            self._on_message(header)
+            return
+
+        self.__buffer = header
+        self.stream.read_bytes(length - HEADER.size, self._on_body)
+
+    def _on_body(self, body):
+
+        data = self.__buffer + body
+        self.__buffer = b""
+        self._on_message(data)
+
+    def _on_message(self, data):
+
+        msg_type = data[1]
+        self.received[msg_type] = self.received.get(msg_type, 0) + 1
+
+        handler = self.HANDLERS.get(msg_type)
+
+        if handler:
+            handler(self, msg_type, data)
+
+        self._wait()
+
+    def send_hello(self):
+        """Send an hello message."""
+
+        self.send(PT_HELLO, encode(HELLO, type=PT_HELLO, seq=self.seq,
+                                   wtp=self.addr, period=self.hello_every,
+                                   uplink_bytes=0,
+                                   downlink_bytes=self.sent_bytes))
+
+    def send_caps(self):
+        """Send the WTP capabilities."""
+
+        blocks = [[hwaddr, channel, band, 0]
+                  for hwaddr, channel, band in self.blocks]
+
+        self.send(PT_CAPS, encode(CAPS, type=PT_CAPS, seq=self.seq,
+                                  wtp=self.addr,
+                                  nb_resources_elements=len(blocks),
+                                  nb_ports_elements=0,
+                                  blocks=blocks, ports=[]))
+
+    def arrive(self):
+        """Let the next station send its first probe request."""
+
+        if not self.__waiting:
+            return
+
+        addr = self.__waiting.pop()
+        station = Station(addr)
+        station.started = time.time()
+        station.state = PT_PROBE_REQUEST
+        self.stations[addr] = station
+
+        hwaddr, channel, band = self.blocks[0]
+
+        self.send(PT_PROBE_REQUEST,
+                  encode(PROBE_REQUEST, type=PT_PROBE_REQUEST, seq=self.seq,
+                         wtp=self.addr, sta=addr, hwaddr=hwaddr,
+                         channel=channel, band=band, ssid=self.ssid))
+
+    def check_timeouts(self):
+        """Fail the associations taking too long."""
+
+        deadline = time.time() - self.assoc_timeout / 1000
+
+        for station in self.stations.values():
+            if station.state and station.started < deadline:
+                station.state = None
+                self.failed += 1
+
+    def _handle_add_lvap(self, msg_type, data):
+
+        add_lvap = ADD_LVAP.parse(data)
+        station = self.stations.get(add_lvap.sta)
+
+        if station:
+            station.bssid = add_lvap.net_bssid
+
+    def _handle_probe_response(self, msg_type, data):
+
+        response = PROBE_RESPONSE.parse(data)
+        station = self.stations.get(response.sta)
+
+        if not station or station.state != PT_PROBE_REQUEST:
+            return
+
+        if not station.bssid:
+            return
+
+        station.state = PT_AUTH_REQUEST
+
+        self.send(PT_AUTH_REQUEST,
+                  encode(AUTH_REQUEST, type=PT_AUTH_REQUEST, seq=self.seq,
+                         wtp=self.addr, sta=station.addr,
+                         bssid=station.bssid))
+
+    def _handle_auth_response(self, msg_type, data):
+
+        response = AUTH_RESPONSE.parse(data)
+        station = self.stations.get(response.sta)
+
+        if not station or station.state != PT_AUTH_REQUEST:
+            return
+
+        station.state = PT_ASSOC_REQUEST
+
+        self.send(PT_ASSOC_REQUEST,
+                  encode(ASSOC_REQUEST, type=PT_ASSOC_REQUEST, seq=self.seq,
+                         wtp=self.addr, sta=station.addr,
+                         bssid=station.bssid, ssid=self.ssid))
+
+    def _handle_assoc_response(self, msg_type, data):
+
+        response = ASSOC_RESPONSE.parse(data)
+        station = self.stations.get(response.sta)
+
+        if not station or station.state != PT_ASSOC_REQUEST:
+            return
+
+        station.state = None
+        station.latency = (time.time() - station.started) * 1000
+
+        hwaddr, channel, band = self.blocks[0]
+
+        self.send(PT_STATUS_PORT,
+                  encode(STATUS_PORT, type=PT_STATUS_PORT, seq=self.seq,
+                         flags=STATUS_PORT.flags[1].record(0),
+                         wtp=self.addr, sta=station.addr, hwaddr=hwaddr,
+                         channel=channel, band=band, rts_cts=2436,
+                         tx_mcast=0, ur_mcast_count=3, nb_mcses=2,
+                         mcs=[12, 108]))
+
+    def _handle_stats_request(self, msg_type, data):
+
+        _, _, _, _, module_id, sta = STATS_REQUEST.unpack_from(data)
+
+        entries = [(random.randint(64, 1500), random.randint(0, 1000))
+                   for _ in range(4)]
+        tail = b"".join(STATS_ENTRY.pack(*x) for x in entries)
+
+        self.send(PT_STATS_RESPONSE,
+                  encode_raw(STATS_RESPONSE, PT_STATS_RESPONSE, module_id,
+                             self.addr, sta, 2, 2, tail=tail))
+
+    def _handle_rates_request(self, msg_type, data):
+
+        _, _, _, _, module_id, sta = STATS_REQUEST.unpack_from(data)
+
+        entries = [(rate, random.randint(0, 100)) for rate in (12, 24, 108)]
+        tail = b"".join(RATES_ENTRY.pack(*x) for x in entries)
+
+        self.send(PT_RATES_RESPONSE,
+                  encode_raw(RATES_RESPONSE, PT_RATES_RESPONSE, module_id,
+                             self.addr, sta, len(entries), tail=tail))
+
+    def _handle_poller_request(self, msg_type, data):
+
+        _, _, _, _, module_id, _, hwaddr, channel, band = \
+            POLLER_REQUEST.unpack_from(data)
+
+        response_type = POLLER_RESPONSES[msg_type]
+        entries = []
+
+        for station in list(self.stations.values())[:32]:
+            rssi = random.randint(-90, -30)
+            entries.append(POLLER_ENTRY.pack(station.addr, 2, rssi, 10, 100,
+                                             rssi, rssi))
+
+        self.send(response_type,
+                  encode_raw(POLLER_RESPONSE, response_type, module_id,
+                             self.addr, hwaddr, channel, band, len(entries),
+                             tail=b"".join(entries)))
+
+    def _handle_add_summary(self, msg_type, data):
+
+        _, _, _, _, module_id, _, _, _, _, limit, period = \
+            ADD_SUMMARY.unpack_from(data)
+
+        if module_id in self.__summaries:
+            self.__summaries[module_id].stop()
+
+        state = {'left': limit}
+
+        def send_summary():
+            if state['left'] == 0:
+                self.__summaries.pop(module_id).stop()
+                return
+            if state['left'] > 0:
+                state['left'] -= 1
+            self.send_summary(module_id)
+
+        worker = tornado.ioloop.PeriodicCallback(send_summary,
+                                                 max(period, 1))
+        worker.start()
+        self.__summaries[module_id] = worker
+
+    def _handle_del_summary(self, msg_type, data):
+
+        module_id = MODULE_REQUEST.unpack_from(data)[4]
+
+        if module_id in self.__summaries:
+            self.__summaries.pop(module_id).stop()
+
+    def send_summary(self, module_id):
+        """Send a summary of synthetic frames."""
+
+        tsft = int(time.time() * 1000000)
+        entries = []
+
+        for seq, station in enumerate(list(self.stations.values())[:16]):
+            entries.append(SUMMARY_ENTRY.pack(station.addr, tsft, seq,
+                                              random.randint(-90, -30),
+                                              108, 2, 0, 1500))
+
+        self.send(PT_SUMMARY,
+                  encode_raw(SUMMARY, PT_SUMMARY, module_id, self.addr,
+                             len(entries), tail=b"".join(entries)))
+
+    HANDLERS = {PT_ADD_LVAP: _handle_add_lvap,
+                PT_PROBE_RESPONSE: _handle_probe_response,
+                PT_AUTH_RESPONSE: _handle_auth_response,
+                PT_ASSOC_RESPONSE: _handle_assoc_response,
+                PT_STATS_REQUEST: _handle_stats_request,
+                PT_RATES_REQUEST: _handle_rates_request,
+                PT_UCQM_REQUEST: _handle_poller_request,
+                PT_NCQM_REQUEST: _handle_poller_request,
+                PT_ADD_SUMMARY: _handle_add_summary,
+                PT_DEL_SUMMARY: _handle_del_summary}
+
+
+def summarize(wtps, elapsed):
+    """Return the aggregated results of a swarm."""
+
+    latencies = np.array([x for wtp in wtps for x in wtp.latencies])
+    sent = sum(sum(wtp.sent.values()) for wtp in wtps)
+
+    out = {'wtps': len(wtps),
+           'stations': sum(len(wtp.stations) for wtp in wtps),
+           'associated': int(latencies.size),
+           'failed': sum(wtp.failed for wtp in wtps),
+           'sent': sent,
+           'sent_rate': sent / elapsed if elapsed else 0}
+
+    if latencies.size:
+        out['latency_p50'] = float(np.percentile(latencies, 50))
+        out['latency_p99'] = float(np.percentile(latencies, 99))
+        out['latency_max'] = float(latencies.max())
+
+    return out
+
+
+def run_swarm(args, results=None):
+    """Run a swarm of simulated WTPs.
+
+    Args:
+        args: the command line arguments (list)
+        results: an optional queue where the results are put
+
+    Returns:
+        the aggregated results (dict)
+    """
+
+    args = parse_args(args)
+
+    channels = [int(x) for x in args.channels.split(",")]
+
+    wtps = []
+
+    for index in range(args.wtp_base, args.wtp_base + args.wtps):
+        wtp = SimulatedWTP(index, args.host, args.port, args.ssid,
+                           args.stations, channels, args.hello_every,
+                           args.arrival_every, args.assoc_timeout)
+        wtp.start()
+        wtps.append(wtp)
+
+    loop = tornado.ioloop.IOLoop.current()
+    started = time.time()
+
+    def check_done():
+        done = all(len(wtp.stations) == args.stations for wtp in wtps) and \
+            all(x.state is None for wtp in wtps
+                for x in wtp.stations.values())
+        if done and args.duration == 0:
+            loop.stop()
+
+    if args.duration > 0:
+        loop.call_later(args.duration, loop.stop)
+
+    checker = tornado.ioloop.PeriodicCallback(check_done, 100)
+    checker.start()
+
+    try:
+        loop.start()
+    except KeyboardInterrupt:
+        pass
+
+    checker.stop()
+    elapsed = time.time() - started
+
+    out = summarize(wtps, elapsed)
+
+    for wtp in wtps:
+        wtp.stop()
+
+    if results is not None:
+        results.put(out)
+
+    return out
+
+
+def parse_args(args=None):
+    """Parse the command line arguments."""
+
+    parser = ArgumentParser(description="Simulated WTP swarm")
+
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--wtps", type=int, default=1)
+    parser.add_argument("--wtp-base", type=int, default=1)
+    parser.add_argument("--stations", type=int, default=DEFAULT_STATIONS,
+                        help="stations per WTP")
+    parser.add_argument("--ssid", default="EmPOWER")
+    parser.add_argument("--channels", default=DEFAULT_CHANNELS)
+    parser.add_argument("--hello-every", type=int,
+                        default=DEFAULT_HELLO_EVERY)
+    parser.add_argument("--arrival-every", type=int,
+                        default=DEFAULT_ARRIVAL_EVERY)
+    parser.add_argument("--assoc-timeout", type=int,
+                        default=DEFAULT_ASSOC_TIMEOUT)
+    parser.add_argument("--duration", type=int, default=0,
+                        help="seconds to run, 0 stops when all the "
+                             "stations are done")
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Run a swarm from the command line."""
+
+    logging.basicConfig(level=logging.INFO)
+
+    out = run_swarm(args)
+
+    LOG.info("%u WTPs, %u/%u stations associated, %u failed, "
+             "%.0f msg/s sent", out['wtps'], out['associated'],
+             out['stations'], out['failed'], out['sent_rate'])
+
+    if out['associated']:
+        LOG.info("association latency p50 %.1f ms, p99 %.1f ms, "
+                 "max %.1f ms", out['latency_p50'], out['latency_p99'],
+                 out['latency_max'])
+
+
+if __name__ == "__main__":
+    main()
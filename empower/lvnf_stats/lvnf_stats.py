@@ -62,9 +62,25 @@ class LVNFStats(Module):
 
         self._lvnf = UUID(value)
 
-    def __eq__(self, other):
+    @property
+    def key(self):
+        """Return the identity key of the module."""
+
+        return super().key + (self.lvnf, )
+
+    @property
+    def target(self):
+        """Return the address of the CPP hosting the LVNF."""
+
+        if self.tenant_id not in RUNTIME.tenants:
+            return None
+
+        lvnfs = RUNTIME.tenants[self.tenant_id].lvnfs
+
+        if self.lvnf not in lvnfs:
+            return None
 
-        return super().__eq__(other) and self.lvnf == other.lvnf
+        return lvnfs[self.lvnf].cpp.addr
 
     def to_dict(self):
         """Return a JSON-serializable representation of this object."""
@@ -37,6 +37,11 @@ import tornado.websocket
 from empower.core.networkport import NetworkPort
 from empower.datatypes.etheraddress import EtherAddress
 from empower.core.jsonserializer import EmpowerEncoder
+from empower.core.capture import CAPTURE
+from empower.core.capture import PROTO_LVNFP
+from empower.core.capture import KIND_IN
+from empower.core.capture import KIND_OUT
+from empower.core.loopmonitor import HANDLER_LATENCY
 from empower.lvnfp import PT_ADD_LVNF
 from empower.lvnfp import PT_DEL_LVNF
 from empower.lvnfp import PT_LVNF_JOIN
@@ -69,6 +74,7 @@ class LVNFPMainHandler(tornado.websocket.WebSocketHandler):
         self.pnfdev = None
         self.addr = None
         self.server = server
+        self.capture_id = 0
 
     def to_dict(self):
         """Return dict representation of object."""
@@ -78,7 +84,16 @@ class LVNFPMainHandler(tornado.websocket.WebSocketHandler):
     def open(self):
         """On socket opened."""
 
-        pass
+        self.capture_id = CAPTURE.open(PROTO_LVNFP, self.request.remote_ip)
+
+    def write_message(self, message, binary=False):
+        """Send a message, recording it if the capture is enabled."""
+
+        if self.capture_id:
+            data = message.encode() if isinstance(message, str) else message
+            CAPTURE.write(PROTO_LVNFP, KIND_OUT, self.capture_id, data)
+
+        return super().write_message(message, binary)
 
     def encode_message(self, message):
         """Encode JSON message."""
@@ -88,6 +103,10 @@ class LVNFPMainHandler(tornado.websocket.WebSocketHandler):
     def on_message(self, message):
         """Handle incoming message."""
 
+        if self.capture_id:
+            data = message.encode() if isinstance(message, str) else message
+            CAPTURE.write(PROTO_LVNFP, KIND_IN, self.capture_id, data)
+
         try:
             msg = json.loads(message)
             self.handle_message(msg)
@@ -107,6 +126,7 @@ class LVNFPMainHandler(tornado.websocket.WebSocketHandler):
         LOG.info("Received %s seq %u from %s", msg['type'], msg['seq'],
                  self.request.remote_ip)
 
+        started = time.perf_counter()
         handler_name = "_handle_%s" % msg['type']
 
         if hasattr(self, handler_name):
@@ -121,6 +141,9 @@ class LVNFPMainHandler(tornado.websocket.WebSocketHandler):
             for handler in self.server.pt_types_handlers[msg['type']]:
                 handler(msg)
 
+        HANDLER_LATENCY.observe("lvnfp", msg['type'],
+                                time.perf_counter() - started)
+
     def send_bye_message_to_self(self):
         """Send bye message to self."""
 
@@ -144,6 +167,9 @@ class LVNFPMainHandler(tornado.websocket.WebSocketHandler):
     def on_close(self):
         """ Handle PNFDev disconnection """
 
+        if self.capture_id:
+            CAPTURE.close(PROTO_LVNFP, self.capture_id)
+
         if not self.pnfdev:
             return
 
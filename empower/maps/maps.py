@@ -27,17 +27,17 @@
 
 """Common channel quality and conflict maps module."""
 
+import numpy as np
+
 from construct import Container
 from construct import Struct
-from construct import Array
 from construct import UBInt8
 from construct import UBInt16
 from construct import UBInt32
 from construct import Bytes
-from construct import SBInt32
-from construct import Sequence
 
 from empower.datatypes.etheraddress import EtherAddress
+from empower.core.entries import filter_entries
 from empower.core.resourcepool import CQM
 from empower.core.resourcepool import ResourceBlock
 from empower.core.resourcepool import ResourcePool
@@ -50,14 +50,13 @@ PT_POLLER_REQ_MSG_TYPE = 0x27
 PT_POLLER_RESP_MSG_TYPE = 0x28
 
 
-POLLER_ENTRY_TYPE = Sequence("img_entries",
-                             Bytes("addr", 6),
-                             UBInt32("last_rssi_std"),
-                             SBInt32("last_rssi_avg"),
-                             UBInt32("last_packets"),
-                             UBInt32("hist_packets"),
-                             SBInt32("ewma_rssi"),
-                             SBInt32("sma_rssi"))
+POLLER_ENTRY_TYPE = np.dtype([('addr', 'V6'),
+                              ('last_rssi_std', '>u4'),
+                              ('last_rssi_avg', '>i4'),
+                              ('last_packets', '>u4'),
+                              ('hist_packets', '>u4'),
+                              ('ewma_rssi', '>i4'),
+                              ('sma_rssi', '>i4')])
 
 POLLER_REQUEST = Struct("poller_request", UBInt8("version"),
                         UBInt8("type"),
@@ -79,7 +78,8 @@ POLLER_RESPONSE = Struct("poller_response", UBInt8("version"),
                          UBInt8("channel"),
                          UBInt8("band"),
                          UBInt16("nb_entries"),
-                         Array(lambda ctx: ctx.nb_entries, POLLER_ENTRY_TYPE))
+                         Bytes("img_entries", lambda ctx:
+                               ctx.nb_entries * POLLER_ENTRY_TYPE.itemsize))
 
 
 class Maps(Module):
@@ -91,11 +91,11 @@ class Maps(Module):
     _addrs = EtherAddress('FF:FF:FF:FF:FF:FF')
     _block = None
 
-    def __eq__(self, other):
+    @property
+    def key(self):
+        """Return the identity key of the module."""
 
-        return super().__eq__(other) and \
-            self.addrs == other.addrs and \
-            self.block == other.block
+        return super().key + (self.addrs, self.block)
 
     @property
     def addrs(self):
@@ -156,6 +156,12 @@ class Maps(Module):
         else:
             return {}
 
+    @property
+    def target(self):
+        """Return the address of the WTP hosting the block."""
+
+        return self.block.radio.addr if self.block else None
+
     def to_dict(self):
         """ Return a JSON-serializable dictionary. """
 
@@ -201,7 +207,7 @@ class Maps(Module):
                       self.MODULE_NAME, self.block, self.module_id)
 
         msg = POLLER_REQUEST.build(req)
-        wtp.connection.stream.write(msg)
+        wtp.connection.send_message(msg)
 
     def handle_response(self, response):
         """Handle an incoming poller response message.
@@ -232,12 +238,12 @@ class Maps(Module):
         setattr(self.block, self.MODULE_NAME, CQM())
         map_entry = getattr(self.block, self.MODULE_NAME)
 
-        for entry in response.img_entries:
+        entries = filter_entries(response.img_entries, POLLER_ENTRY_TYPE,
+                                 response.nb_entries, self.addrs)
 
-            addr = EtherAddress(entry[0])
+        for entry in entries.tolist():
 
-            if not addr.match(self.addrs):
-                continue
+            addr = EtherAddress(entry[0])
 
             value = {'addr': addr,
                      'last_rssi_std': entry[1] / 1000.0,
@@ -35,6 +35,9 @@ from uuid import UUID
 from empower import settings
 from empower.core.account import ROLE_ADMIN, ROLE_USER
 from empower.restserver.apihandlers import EmpowerAPIHandler
+from empower.restserver.streamhandler import ModuleStreamHandler
+from empower.core.timerwheel import TimerWheelHandler
+from empower.core.timerwheel import TIMERS
 from empower.main import _do_launch
 from empower.main import _parse_args
 from empower.main import RUNTIME
@@ -1146,7 +1149,8 @@ class RESTServer(tornado.web.Application):
                 PendingTenantHandler,
                 TenantHandler,
                 AllowHandler,
-                DenyHandler]
+                DenyHandler,
+                ModuleStreamHandler]
 
     parms = {
         "template_path": settings.TEMPLATE_PATH,
@@ -1203,5 +1207,14 @@ def launch(port=DEFAULT_PORT, cert=None, key=None):
     """ Start REST Server module. """
 
     server = RESTServer(int(port), cert, key)
+
+    server.add_handler_class(TimerWheelHandler, TIMERS)
+
+    # empower.core.module imports this module, import it only here
+    from empower.core.module import ModuleSchedulerHandler
+    from empower.core.module import SCHEDULER
+
+    server.add_handler_class(ModuleSchedulerHandler, SCHEDULER)
+
     LOG.info("REST Server available at %u", server.port)
     return server
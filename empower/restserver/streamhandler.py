@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Streaming of module results over WebSocket."""
+
+import json
+import tornado.ioloop
+import tornado.websocket
+
+from collections import deque
+from uuid import UUID
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+DEFAULT_BACKLOG = 100
+
+
+class ModuleStreamHandler(tornado.websocket.WebSocketHandler):
+    """Push module results to the subscribers.
+
+    Every result produced by a module is pushed as a JSON document with
+    the following fields: tenant_id, module_type, module_id and result.
+
+    Subscribers can filter the results by tenant and by module type, both
+    arguments can be repeated. Each subscriber has a bounded backlog, when
+    a subscriber does not keep up the oldest messages are dropped.
+
+    Example URLs:
+
+        ws://localhost:8888/api/v1/stream
+        ws://localhost:8888/api/v1/stream?module_type=ucqm
+        ws://localhost:8888/api/v1/stream?tenant_id=52313ecb-9d00-4b7d-b873-
+            b55d3d9ada26&module_type=bytes_counter&module_type=ucqm
+    """
+
+    HANDLERS = [r"/api/v1/stream/?"]
+
+    def initialize(self, server=None):
+        """Set pointer to actual rest server."""
+
+        self.server = server
+        self.tenants = set()
+        self.module_types = set()
+        self.backlog = deque(maxlen=STREAM.backlog)
+        self.sending = False
+        self.sent = 0
+        self.dropped = 0
+
+    def open(self, *args, **kwargs):
+        """Register the subscriber."""
+
+        try:
+            self.tenants = \
+                set(UUID(x) for x in self.get_arguments("tenant_id"))
+        except ValueError as ex:
+            self.close(code=1003, reason=str(ex))
+            return
+
+        self.module_types = set(self.get_arguments("module_type"))
+
+        STREAM.subscribe(self)
+
+    def on_message(self, message):
+        """Ignore incoming messages."""
+
+        pass
+
+    def on_close(self):
+        """Unregister the subscriber."""
+
+        STREAM.unsubscribe(self)
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        return {'addr': self.request.remote_ip,
+                'tenants': list(self.tenants),
+                'module_types': list(self.module_types),
+                'backlog': len(self.backlog),
+                'sent': self.sent,
+                'dropped': self.dropped}
+
+    def match(self, tenant_id, module_type):
+        """Return True if the subscriber is interested in the result."""
+
+        if self.tenants and tenant_id not in self.tenants:
+            return False
+
+        if self.module_types and module_type not in self.module_types:
+            return False
+
+        return True
+
+    def push(self, message):
+        """Queue a message, dropping the oldest one if needed."""
+
+        if len(self.backlog) == self.backlog.maxlen:
+            self.dropped += 1
+
+        self.backlog.append(message)
+
+        if not self.sending:
+            self._send_next()
+
+    def _send_next(self, future=None):
+        """Send the next message once the previous one has been written."""
+
+        self.sending = False
+
+        # retrieve the outcome of the previous write, a failed write means
+        # that the subscriber is gone
+        if future is not None and future.exception() is not None:
+            LOG.info("Stream subscriber %s write failed: %r",
+                     self.request.remote_ip, future.exception())
+            self.backlog.clear()
+            STREAM.unsubscribe(self)
+            return
+
+        if not self.backlog or not self.ws_connection:
+            return
+
+        self.sending = True
+        self.sent += 1
+
+        try:
+            future = self.write_message(self.backlog.popleft())
+        except tornado.websocket.WebSocketClosedError:
+            self.sending = False
+            return
+
+        tornado.ioloop.IOLoop.current().add_future(future, self._send_next)
+
+
+class ModuleStream(object):
+    """Fan out module results to the stream subscribers.
+
+    Each result is encoded once, the same message is then queued to every
+    matching subscriber.
+
+    Attributes:
+        backlog: the maximum number of messages queued per subscriber
+        subscribers: the set of subscribers
+        published: the number of results published
+        encoded: the number of results encoded
+    """
+
+    def __init__(self, backlog=DEFAULT_BACKLOG):
+
+        self.backlog = backlog
+        self.subscribers = set()
+        self.published = 0
+        self.encoded = 0
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        return {'backlog': self.backlog,
+                'published': self.published,
+                'encoded': self.encoded,
+                'subscribers': [x.to_dict() for x in self.subscribers]}
+
+    def subscribe(self, subscriber):
+        """Add a subscriber."""
+
+        LOG.info("New stream subscriber %s", subscriber.request.remote_ip)
+        self.subscribers.add(subscriber)
+
+    def unsubscribe(self, subscriber):
+        """Remove a subscriber."""
+
+        self.subscribers.discard(subscriber)
+
+    def publish(self, module, payload):
+        """Push a module result to the matching subscribers.
+
+        Args:
+            module: the module producing the result
+            payload: a ModulePayload object
+
+        Returns:
+            None
+        """
+
+        self.published += 1
+
+        if not self.subscribers:
+            return
+
+        targets = [x for x in self.subscribers
+                   if x.match(module.tenant_id, module.module_type)]
+
+        if not targets:
+            return
+
+        message = '{"tenant_id": "%s", "module_type": %s, ' \
+                  '"module_id": %u, "result": %s}' % \
+                  (module.tenant_id, json.dumps(module.module_type),
+                   module.module_id, payload.json)
+
+        self.encoded += 1
+
+        for subscriber in targets:
+            subscriber.push(message)
+
+
+STREAM = ModuleStream()
@@ -138,7 +138,7 @@ class RSSI(Module):
                       self.MODULE_NAME, self.block, self.module_id)
 
         msg = ADD_RSSI_TRIGGER.build(req)
-        wtp.connection.stream.write(msg)
+        wtp.connection.send_message(msg)
 
     @property
     def addr(self):
@@ -226,6 +226,12 @@ class RSSI(Module):
         self.events.append(rssi_event)
         self.handle_callback(self)
 
+    @property
+    def target(self):
+        """Return the address of the WTP hosting the block."""
+
+        return self.block.radio.addr if self.block else None
+
     def to_dict(self):
         """ Return a JSON-serializable dictionary representing the Trigger """
 
@@ -266,9 +272,11 @@ class RSSI(Module):
 
         self._value = int(value)
 
-    def __eq__(self, other):
-        return self.addr == other.addr and self.relation == other.relation \
-            and self.value == other.value
+    @property
+    def key(self):
+        """Return the identity key of the module."""
+
+        return (self.module_type, self.addr, self.relation, self.value)
 
 
 class RssiWorker(ModuleLVAPPWorker):
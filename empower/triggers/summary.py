@@ -27,23 +27,22 @@
 
 """Summary triggers module."""
 
+import numpy as np
+
 from construct import Container
 from construct import Struct
-from construct import SBInt8
 from construct import UBInt8
 from construct import UBInt16
 from construct import SBInt16
 from construct import UBInt32
-from construct import UBInt64
 from construct import Bytes
-from construct import Sequence
-from construct import Array
 
 from empower.core.resourcepool import ResourceBlock
 from empower.core.resourcepool import ResourcePool
 from empower.core.resourcepool import BT_L20
 from empower.core.app import EmpowerApp
 from empower.datatypes.etheraddress import EtherAddress
+from empower.core.entries import filter_entries
 from empower.lvapp import PT_VERSION
 from empower.core.module import Module
 from empower.core.module import ModuleLVAPPWorker
@@ -66,15 +65,14 @@ ADD_SUMMARY = Struct("add_summary", UBInt8("version"),
                      SBInt16("limit"),
                      UBInt16("period"))
 
-SUMMARY_ENTRY = Sequence("frames",
-                         Bytes("addr", 6),
-                         UBInt64("tsft"),
-                         UBInt16("seq"),
-                         SBInt8("rssi"),
-                         UBInt8("rate"),
-                         UBInt8("type"),
-                         UBInt8("subtype"),
-                         UBInt32("length"))
+SUMMARY_ENTRY = np.dtype([('addr', 'V6'),
+                          ('tsft', '>u8'),
+                          ('seq', '>u2'),
+                          ('rssi', 'i1'),
+                          ('rate', 'u1'),
+                          ('type', 'u1'),
+                          ('subtype', 'u1'),
+                          ('length', '>u4')])
 
 SUMMARY_TRIGGER = Struct("summary", UBInt8("version"),
                          UBInt8("type"),
@@ -83,7 +81,8 @@ SUMMARY_TRIGGER = Struct("summary", UBInt8("version"),
                          UBInt32("module_id"),
                          Bytes("wtp", 6),
                          UBInt16("nb_entries"),
-                         Array(lambda ctx: ctx.nb_entries, SUMMARY_ENTRY))
+                         Bytes("frames", lambda ctx:
+                               ctx.nb_entries * SUMMARY_ENTRY.itemsize))
 
 DEL_SUMMARY = Struct("del_summary", UBInt8("version"),
                      UBInt8("type"),
@@ -189,9 +188,11 @@ class Summary(Module):
         """ Set the address. """
         self._addrs = EtherAddress(addrs)
 
-    def __eq__(self, other):
-        return super().__eq__(other) and self.addrs == other.addrs and \
-            self.limit == other.limit and self.period == other.period
+    @property
+    def key(self):
+        """Return the identity key of the module."""
+
+        return super().key + (self.addrs, self.limit, self.period)
 
     def run_once(self):
         """ Send out rate request. """
@@ -226,7 +227,7 @@ class Summary(Module):
                       self.MODULE_NAME, self.block, self.module_id)
 
         msg = ADD_SUMMARY.build(req)
-        wtp.connection.stream.write(msg)
+        wtp.connection.send_message(msg)
 
     def handle_response(self, response):
         """Handle an incoming response message.
@@ -248,7 +249,10 @@ class Summary(Module):
 
         self.frames = []
 
-        for recv in response.frames:
+        entries = filter_entries(response.frames, SUMMARY_ENTRY,
+                                 response.nb_entries, self.addrs)
+
+        for recv in entries.tolist():
 
             if self.block.band == BT_L20:
                 rate = float(recv[4]) / 2
@@ -289,6 +293,12 @@ class Summary(Module):
 
         self.handle_callback(self)
 
+    @property
+    def target(self):
+        """Return the address of the WTP hosting the block."""
+
+        return self.block.radio.addr if self.block else None
+
     def to_dict(self):
         """ Return a JSON-serializable dictionary representing the Summary """
 
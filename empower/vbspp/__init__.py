@@ -46,8 +46,6 @@ MAC_CELL_STATS_TYPES = {}
 
 MAC_UE_STATS_TYPES = {}
 
-TIMER_IDS = []
-
 HELLO_MSG_MODULE_ID = 4294967294
 MISC_MSG_MODULE_ID = 4294967295
 
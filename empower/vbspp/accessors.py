@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Direct field accessors for progran messages.
+
+The helpers in this module read the few fields the controller needs on the
+hot path (transaction ids, RNTIs and radio measurements) straight from the
+parsed protobuf messages, avoiding a full conversion to nested dictionaries.
+"""
+
+import empower.vbspp.messages.config_common_pb2 as config_common_pb2
+
+
+def message_body(message):
+    """Return the body of a progran message.
+
+    Args:
+        message, a progran_message
+
+    Returns:
+        the sub-message selected by the msg oneof, or None
+    """
+
+    msg_type = message.WhichOneof("msg")
+
+    if not msg_type:
+        return None
+
+    return getattr(message, msg_type)
+
+
+def message_xid(message):
+    """Return the xid carried in the header of a progran message.
+
+    Args:
+        message, a progran_message
+
+    Returns:
+        the xid as an int, or None if the message has no body
+    """
+
+    body = message_body(message)
+
+    if body is None:
+        return None
+
+    return body.header.xid
+
+
+def ue_state_rnti(message):
+    """Return the RNTI of a UE state change message."""
+
+    return message.ue_state_change_msg.config.rnti
+
+
+def ue_state_deactivated(message):
+    """Return True if the UE state change is a deactivation."""
+
+    return message.ue_state_change_msg.type == \
+        config_common_pb2.PRUESC_DEACTIVATED
+
+
+def ue_rrc_rnti(message):
+    """Return the RNTI of a UE RRC measurements reply."""
+
+    return message.ue_rrc_measurements_reply_msg.rnti
+
+
+def ue_rrc_pcell(message):
+    """Return the (rsrp, rsrq) tuple of the primary cell."""
+
+    measurements = message.ue_rrc_measurements_reply_msg.measurements
+
+    return measurements.PCell_rsrp, measurements.PCell_rsrq
+
+
+def ue_rrc_neighbours(message):
+    """Iterate over the neighbour cells measurements of a RRC reply.
+
+    Args:
+        message, a ue_rrc_measurements_reply progran_message
+
+    Yields:
+        (meas_id, rat_type, phys_cell_id, rsrp, rsrq) tuples
+    """
+
+    measurements = message.ue_rrc_measurements_reply_msg.measurements
+
+    if not measurements.HasField("meas_result_neigh_cells"):
+        return
+
+    meas_id = measurements.measId
+    neigh_cells = measurements.meas_result_neigh_cells
+
+    for field, values in neigh_cells.ListFields():
+        for measurement in values:
+            yield (meas_id,
+                   field.name,
+                   measurement.phys_cell_id,
+                   measurement.meas_result.rsrp,
+                   measurement.meas_result.rsrq)
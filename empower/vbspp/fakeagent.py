@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Fake eNB agent for VBSP controller testing and benchmarking.
+
+The agent speaks the progran protocol to a VBSPServer over TCP. It sends
+periodic hellos, activates a configurable number of UEs and then emits
+periodic MAC stats replies and RRC measurement replies. It answers eNB
+configuration requests and reuses the xid of the last stats request it has
+received in its stats replies.
+
+Messages are serialized in advance (a few variants per message type) so
+that the agent itself adds as little CPU load as possible.
+
+Usage:
+    python3 -m empower.vbspp.fakeagent --agents 4 --ues 64 --duration 30
+"""
+
+import time
+import socket
+import random
+import struct
+import logging
+
+from argparse import ArgumentParser
+
+import tornado.ioloop
+import tornado.iostream
+
+import empower.vbspp.messages.progran_pb2 as progran_pb2
+import empower.vbspp.messages.header_pb2 as header_pb2
+import empower.vbspp.messages.config_common_pb2 as config_common_pb2
+
+from empower.vbspp import PROGRAN_VERSION
+from empower.vbspp import DEFAULT_PORT
+
+import empower.logger
+LOG = empower.logger.get_logger()
+
+FRAME_LENGTH = struct.Struct("!I")
+
+DEFAULT_ENB_BASE = 0x100
+DEFAULT_UES = 16
+DEFAULT_HELLO_EVERY = 1000
+DEFAULT_STATS_EVERY = 100
+DEFAULT_RRC_EVERY = 1000
+DEFAULT_CHURN_EVERY = 0
+DEFAULT_VARIANTS = 8
+FIRST_RNTI = 1000
+
+
+def build_frame(message):
+    """Return the length-prefixed serialization of a progran message."""
+
+    data = message.SerializeToString()
+
+    return FRAME_LENGTH.pack(len(data)) + data
+
+
+def set_header(header, message_type, xid, enb_id):
+    """Fill a progran header."""
+
+    header.version = PROGRAN_VERSION
+    header.type = message_type
+    header.xid = xid
+    header.eid = enb_id
+
+
+class FakeAgent(object):
+    """A fake eNB agent.
+
+    Attributes:
+        enb_id: the eNB id announced in the hellos (int)
+        host: the controller address (str)
+        port: the controller port (int)
+        ues: the number of UEs attached to the eNB (int)
+        hello_every: hello period in ms (int)
+        stats_every: MAC stats reply period in ms, 0 disables them (int)
+        rrc_every: RRC measurements period in ms, 0 disables them (int)
+        churn_every: period in ms of the UE detach/attach, 0 disables it
+        sent: number of messages sent, by message type (dict)
+        received: number of messages received, by message type (dict)
+        sent_bytes: number of bytes sent (int)
+    """
+
+    def __init__(self, enb_id, host="127.0.0.1", port=DEFAULT_PORT,
+                 ues=DEFAULT_UES, hello_every=DEFAULT_HELLO_EVERY,
+                 stats_every=DEFAULT_STATS_EVERY, rrc_every=DEFAULT_RRC_EVERY,
+                 churn_every=DEFAULT_CHURN_EVERY, variants=DEFAULT_VARIANTS):
+
+        self.enb_id = int(enb_id)
+        self.host = host
+        self.port = int(port)
+        self.ues = int(ues)
+        self.hello_every = int(hello_every)
+        self.stats_every = int(stats_every)
+        self.rrc_every = int(rrc_every)
+        self.churn_every = int(churn_every)
+        self.variants = int(variants)
+        self.stream = None
+        self.stats_xid = 0
+        self.sent = {}
+        self.received = {}
+        self.sent_bytes = 0
+        self.__xid = 0
+        self.__round = 0
+        self.__workers = []
+        self.__stats = {}
+        self.__rrc = []
+
+    @property
+    def rntis(self):
+        """Return the RNTIs of the UEs of this agent."""
+
+        return range(FIRST_RNTI, FIRST_RNTI + self.ues)
+
+    @property
+    def xid(self):
+        """Return a new transaction id."""
+
+        self.__xid += 1
+        return self.__xid
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'enb_id': self.enb_id,
+                'ues': self.ues,
+                'sent': self.sent,
+                'received': self.received,
+                'sent_bytes': self.sent_bytes}
+
+    def start(self):
+        """Connect to the controller and start sending messages."""
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self.stream = tornado.iostream.IOStream(sock)
+        self.stream.set_close_callback(self.stop)
+        self.stream.connect((self.host, self.port), self._on_connect)
+
+    def stop(self):
+        """Stop sending messages and close the connection."""
+
+        for worker in self.__workers:
+            worker.stop()
+
+        self.__workers = []
+
+        if self.stream and not self.stream.closed():
+            self.stream.close()
+
+    def _on_connect(self):
+        """Send the first hello, activate the UEs and start the workers."""
+
+        self._build_rrc()
+
+        self.send_hello()
+        self.send_ue_states(self.rntis, config_common_pb2.PRUESC_ACTIVATED)
+
+        workers = [(self.send_hello, self.hello_every),
+                   (self.send_stats, self.stats_every),
+                   (self.send_rrc, self.rrc_every),
+                   (self.churn, self.churn_every)]
+
+        for callback, every in workers:
+            if every <= 0:
+                continue
+            worker = tornado.ioloop.PeriodicCallback(callback, every)
+            worker.start()
+            self.__workers.append(worker)
+
+        self._wait()
+
+    def _wait(self):
+        """Wait for the next frame from the controller."""
+
+        if self.stream.closed():
+            return
+
+        self.stream.read_bytes(FRAME_LENGTH.size, self._on_length)
+
+    def _on_length(self, data):
+
+        length = FRAME_LENGTH.unpack(data)[0]
+        self.stream.read_bytes(length, self._on_message)
+
+    def _on_message(self, data):
+
+        message = progran_pb2.progran_message()
+        message.ParseFromString(data)
+
+        msg_type = message.WhichOneof("msg")
+        self.received[msg_type] = self.received.get(msg_type, 0) + 1
+
+        handler_name = "_handle_%s" % msg_type
+
+        if hasattr(self, handler_name):
+            getattr(self, handler_name)(message)
+
+        self._wait()
+
+    def _handle_enb_config_request_msg(self, message):
+
+        reply = progran_pb2.progran_message()
+        reply.msg_dir = progran_pb2.SUCCESSFUL_OUTCOME
+        xid = message.enb_config_request_msg.header.xid
+        set_header(reply.enb_config_reply_msg.header,
+                   header_pb2.PRPT_GET_ENB_CONFIG_REPLY, xid, self.enb_id)
+        reply.enb_config_reply_msg.eNB_id = self.enb_id
+
+        self.send(reply)
+
+    def _handle_stats_request_msg(self, message):
+
+        self.stats_xid = message.stats_request_msg.header.xid
+        self.__stats = {}
+
+    def _write(self, msg_type, frame, count=1):
+
+        if not self.stream or self.stream.closed():
+            return
+
+        self.stream.write(frame)
+        self.sent[msg_type] = self.sent.get(msg_type, 0) + count
+        self.sent_bytes += len(frame)
+
+    def send(self, message):
+        """Send a progran message."""
+
+        self._write(message.WhichOneof("msg"), build_frame(message))
+
+    def send_hello(self):
+        """Send an hello message."""
+
+        hello = progran_pb2.progran_message()
+        hello.msg_dir = progran_pb2.INITIATING_MESSAGE
+        set_header(hello.hello_msg.header, header_pb2.PRPT_HELLO, self.xid,
+                   self.enb_id)
+
+        self.send(hello)
+
+    def send_ue_states(self, rntis, state):
+        """Send one UE state change message for every RNTI."""
+
+        frames = []
+
+        for rnti in rntis:
+            message = progran_pb2.progran_message()
+            message.msg_dir = progran_pb2.INITIATING_MESSAGE
+            state_change = message.ue_state_change_msg
+            set_header(state_change.header, header_pb2.PRPT_UE_STATE_CHANGE,
+                       self.xid, self.enb_id)
+            state_change.type = state
+            state_change.config.rnti = rnti
+            frames.append(build_frame(message))
+
+        if frames:
+            self._write("ue_state_change_msg", b"".join(frames), len(frames))
+
+    def churn(self):
+        """Detach and re-attach a random UE."""
+
+        if not self.ues:
+            return
+
+        rnti = random.choice(self.rntis)
+        self.send_ue_states([rnti], config_common_pb2.PRUESC_DEACTIVATED)
+        self.send_ue_states([rnti], config_common_pb2.PRUESC_ACTIVATED)
+
+    def _build_stats(self, variant):
+
+        message = progran_pb2.progran_message()
+        message.msg_dir = progran_pb2.SUCCESSFUL_OUTCOME
+        reply = message.stats_reply_msg
+        set_header(reply.header, header_pb2.PRPT_STATS_REPLY, self.stats_xid,
+                   self.enb_id)
+
+        for rnti in self.rntis:
+            report = reply.ue_report.add()
+            report.rnti = rnti
+            report.bsr.extend([random.randint(0, 63) for _ in range(4)])
+            report.phr = random.randint(0, 63)
+            rlc = report.rlc_report.add()
+            rlc.lc_id = 1
+            rlc.tx_queue_size = random.randint(0, 10000)
+            rlc.tx_queue_hol_delay = random.randint(0, 100)
+            csi = report.dl_cqi_report.csi_report.add()
+            csi.p10csi.wb_cqi = (variant + rnti) % 16
+
+        cell = reply.cell_report.add()
+        cell.carrier_index = 0
+        cell.noise_inter_report.rip = random.randint(0, 100)
+        cell.noise_inter_report.tnp = random.randint(0, 100)
+
+        return build_frame(message)
+
+    def send_stats(self):
+        """Send a MAC stats reply covering all the UEs."""
+
+        variant = self.__round % self.variants
+        self.__round += 1
+
+        if variant not in self.__stats:
+            self.__stats[variant] = self._build_stats(variant)
+
+        self._write("stats_reply_msg", self.__stats[variant])
+
+    def _build_rrc(self):
+
+        self.__rrc = []
+
+        for variant in range(self.variants):
+
+            frames = []
+
+            for rnti in self.rntis:
+                message = progran_pb2.progran_message()
+                message.msg_dir = progran_pb2.SUCCESSFUL_OUTCOME
+                reply = message.ue_rrc_measurements_reply_msg
+                set_header(reply.header,
+                           header_pb2.PRPT_SEND_RRC_MEASUREMENTS_REPORT, 0,
+                           self.enb_id)
+                reply.rnti = rnti
+                meas = reply.measurements
+                meas.measId = 1
+                meas.PCell_rsrp = random.randint(0, 97)
+                meas.PCell_rsrq = random.randint(0, 34)
+                cells = meas.meas_result_neigh_cells
+                for pci in range(2):
+                    cell = cells.measResultEUTRA.add()
+                    cell.phys_cell_id = pci + variant
+                    cell.meas_result.rsrp = random.randint(0, 97)
+                    cell.meas_result.rsrq = random.randint(0, 34)
+                frames.append(build_frame(message))
+
+            self.__rrc.append(b"".join(frames))
+
+    def send_rrc(self):
+        """Send a RRC measurement reply for every UE."""
+
+        if not self.__rrc:
+            return
+
+        variant = self.__round % len(self.__rrc)
+        self._write("ue_rrc_measurements_reply_msg", self.__rrc[variant],
+                    self.ues)
+
+
+def start_agents(agents, enb_base=DEFAULT_ENB_BASE, **kwargs):
+    """Create and start a number of fake agents.
+
+    Args:
+        agents: the number of agents
+        enb_base: the eNB id of the first agent
+        kwargs: the FakeAgent parameters
+
+    Returns:
+        the list of agents
+    """
+
+    out = []
+
+    for i in range(int(agents)):
+        agent = FakeAgent(int(enb_base) + i, **kwargs)
+        agent.start()
+        out.append(agent)
+
+    return out
+
+
+def parse_args(args=None):
+    """Parse the command line arguments."""
+
+    parser = ArgumentParser(description="Fake VBSP eNB agents")
+
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--agents", type=int, default=1)
+    parser.add_argument("--enb-base", type=int, default=DEFAULT_ENB_BASE)
+    parser.add_argument("--ues", type=int, default=DEFAULT_UES)
+    parser.add_argument("--hello-every", type=int,
+                        default=DEFAULT_HELLO_EVERY)
+    parser.add_argument("--stats-every", type=int,
+                        default=DEFAULT_STATS_EVERY)
+    parser.add_argument("--rrc-every", type=int, default=DEFAULT_RRC_EVERY)
+    parser.add_argument("--churn-every", type=int,
+                        default=DEFAULT_CHURN_EVERY)
+    parser.add_argument("--duration", type=int, default=0,
+                        help="seconds to run, 0 runs forever")
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Run fake agents from the command line."""
+
+    logging.basicConfig(level=logging.INFO)
+
+    args = parse_args(args)
+
+    agents = start_agents(args.agents, args.enb_base, host=args.host,
+                          port=args.port, ues=args.ues,
+                          hello_every=args.hello_every,
+                          stats_every=args.stats_every,
+                          rrc_every=args.rrc_every,
+                          churn_every=args.churn_every)
+
+    loop = tornado.ioloop.IOLoop.current()
+    started = time.time()
+
+    if args.duration > 0:
+        loop.call_later(args.duration, loop.stop)
+
+    try:
+        loop.start()
+    except KeyboardInterrupt:
+        pass
+
+    elapsed = time.time() - started
+
+    for agent in agents:
+        agent.stop()
+        sent = sum(agent.sent.values())
+        LOG.info("eNB %u: %u messages (%.1f msg/s), %u bytes, received %s",
+                 agent.enb_id, sent, sent / elapsed, agent.sent_bytes,
+                 agent.received)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Time-series store for VBSP MAC statistics.
+
+Samples are kept in NumPy ring buffers, one per (RNTI, metric) pair, so
+that memory is bounded by the retention and window queries can be computed
+without copying or converting the samples. Buffers start small and grow on
+demand up to the retention, so memory follows the number of samples actually
+received. Cell level metrics are
+stored under the "cc<carrier_index>" pseudo RNTI.
+"""
+
+import time
+
+import numpy as np
+
+DEFAULT_RETENTION = 1024
+INITIAL_CAPACITY = 16
+
+UE_METRICS = ["bsr", "phr", "pending_mac_ces", "rlc_tx_queue",
+              "rlc_tx_hol_delay", "rlc_retx_queue", "dl_cqi", "ul_sinr"]
+
+CELL_METRICS = ["noise_rip", "noise_tnp"]
+
+
+def cell_key(carrier_index):
+    """Return the pseudo RNTI used for the metrics of a carrier."""
+
+    return "cc%u" % carrier_index
+
+
+def _wb_cqi(csi):
+    """Return the wideband CQI of a CSI report, or None."""
+
+    report = csi.WhichOneof("report")
+
+    if not report:
+        return None
+
+    wb_cqi = getattr(csi, report).wb_cqi
+
+    # some report types carry one wideband CQI per codeword
+    if isinstance(wb_cqi, int):
+        return wb_cqi
+
+    return wb_cqi[0] if wb_cqi else None
+
+
+class TimeSeries(object):
+    """A bounded ring buffer of timestamped samples.
+
+    The buffers are doubled when full until they reach the retention, from
+    then on the oldest samples are overwritten.
+
+    Attributes:
+        retention: the maximum number of samples (int)
+        timestamps: the sample timestamps in seconds (numpy.ndarray)
+        values: the sample values (numpy.ndarray)
+        head: the index of the next sample to be written (int)
+        count: the number of valid samples (int)
+    """
+
+    __slots__ = ('retention', 'timestamps', 'values', 'head', 'count')
+
+    def __init__(self, retention=DEFAULT_RETENTION):
+
+        self.retention = int(retention)
+
+        if self.retention <= 0:
+            raise ValueError("Invalid retention %d" % self.retention)
+
+        capacity = min(INITIAL_CAPACITY, self.retention)
+
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.head = 0
+        self.count = 0
+
+    def __grow(self):
+        """Double the buffers, up to the retention."""
+
+        capacity = min(2 * self.timestamps.size, self.retention)
+
+        timestamps = np.zeros(capacity, dtype=np.float64)
+        timestamps[:self.count] = self.timestamps[:self.count]
+        self.timestamps = timestamps
+
+        values = np.zeros(capacity, dtype=np.float64)
+        values[:self.count] = self.values[:self.count]
+        self.values = values
+
+    def append(self, timestamp, value):
+        """Add a new sample, overwriting the oldest one if full."""
+
+        # the buffers never wrap before reaching the retention, so the
+        # samples are always stored in [0, count) while growing
+        if self.count == self.timestamps.size < self.retention:
+            self.__grow()
+
+        self.timestamps[self.head] = timestamp
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.retention
+
+        if self.count < self.retention:
+            self.count += 1
+
+    def window(self, period=None, now=None):
+        """Return the samples of the last period seconds.
+
+        Args:
+            period: the window length in seconds, None for all the samples
+            now: the end of the window, defaults to the current time
+
+        Returns:
+            a (timestamps, values) tuple of numpy arrays, not sorted
+        """
+
+        timestamps = self.timestamps[:self.count]
+        values = self.values[:self.count]
+
+        if period is None:
+            return timestamps, values
+
+        if now is None:
+            now = time.time()
+
+        mask = timestamps >= now - period
+
+        return timestamps[mask], values[mask]
+
+    def last(self):
+        """Return the most recent (timestamp, value) sample, or None."""
+
+        if not self.count:
+            return None
+
+        index = (self.head - 1) % self.retention
+
+        return self.timestamps[index], self.values[index]
+
+    def mean(self, period=None, now=None):
+        """Return the mean value over the window, or None."""
+
+        _, values = self.window(period, now)
+
+        if not values.size:
+            return None
+
+        return float(values.mean())
+
+    def percentile(self, q, period=None, now=None):
+        """Return the q-th percentile over the window, or None."""
+
+        _, values = self.window(period, now)
+
+        if not values.size:
+            return None
+
+        return float(np.percentile(values, q))
+
+    def rate(self, period=None, now=None):
+        """Return the rate of change per second over the window, or None."""
+
+        timestamps, values = self.window(period, now)
+
+        if timestamps.size < 2:
+            return None
+
+        first = timestamps.argmin()
+        last = timestamps.argmax()
+        delta = timestamps[last] - timestamps[first]
+
+        if not delta:
+            return None
+
+        return float((values[last] - values[first]) / delta)
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        last = self.last()
+
+        return {'retention': self.retention,
+                'samples': self.count,
+                'last': float(last[1]) if last else None,
+                'last_ts': float(last[0]) if last else None}
+
+
+class MACStatsStore(object):
+    """Per-VBSP store of MAC statistics time-series.
+
+    Attributes:
+        retention: the number of samples kept for each series (int)
+        series: the time-series indexed by (rnti, metric)
+        updates: the number of stats replies processed (int)
+    """
+
+    def __init__(self, retention=DEFAULT_RETENTION):
+
+        self.retention = int(retention)
+        self.series = {}
+        self.updates = 0
+
+    def __add(self, rnti, metric, timestamp, value):
+
+        key = (rnti, metric)
+
+        if key not in self.series:
+            self.series[key] = TimeSeries(self.retention)
+
+        self.series[key].append(timestamp, value)
+
+    def update(self, message, timestamp=None):
+        """Add the samples carried by a MAC stats reply.
+
+        Args:
+            message, a stats_reply_msg progran_message
+            timestamp, the time of the samples, defaults to now
+
+        Returns:
+            None
+        """
+
+        if timestamp is None:
+            timestamp = time.time()
+
+        reply = message.stats_reply_msg
+
+        for report in reply.ue_report:
+
+            rnti = report.rnti
+
+            if report.bsr:
+                self.__add(rnti, "bsr", timestamp, sum(report.bsr))
+
+            if report.HasField("phr"):
+                self.__add(rnti, "phr", timestamp, report.phr)
+
+            if report.HasField("pending_mac_ces"):
+                self.__add(rnti, "pending_mac_ces", timestamp,
+                           report.pending_mac_ces)
+
+            if report.rlc_report:
+                tx_queue = 0
+                hol_delay = 0
+                retx_queue = 0
+                for rlc in report.rlc_report:
+                    tx_queue += rlc.tx_queue_size
+                    retx_queue += rlc.retransmission_queue_size
+                    hol_delay = max(hol_delay, rlc.tx_queue_hol_delay)
+                self.__add(rnti, "rlc_tx_queue", timestamp, tx_queue)
+                self.__add(rnti, "rlc_tx_hol_delay", timestamp, hol_delay)
+                self.__add(rnti, "rlc_retx_queue", timestamp, retx_queue)
+
+            if report.HasField("dl_cqi_report"):
+                for csi in report.dl_cqi_report.csi_report:
+                    cqi = _wb_cqi(csi)
+                    if cqi is not None:
+                        self.__add(rnti, "dl_cqi", timestamp, cqi)
+                        break
+
+            if report.HasField("ul_cqi_report"):
+                for meas in report.ul_cqi_report.cqi_meas:
+                    if meas.sinr:
+                        self.__add(rnti, "ul_sinr", timestamp,
+                                   sum(meas.sinr) / len(meas.sinr))
+                        break
+
+        for report in reply.cell_report:
+
+            if not report.HasField("noise_inter_report"):
+                continue
+
+            rnti = cell_key(report.carrier_index)
+            noise = report.noise_inter_report
+
+            self.__add(rnti, "noise_rip", timestamp, noise.rip)
+            self.__add(rnti, "noise_tnp", timestamp, noise.tnp)
+
+        self.updates += 1
+
+    def remove_ue(self, rnti):
+        """Drop all the series of an UE."""
+
+        for key in [key for key in self.series if key[0] == rnti]:
+            del self.series[key]
+
+    def mean(self, rnti, metric, period=None):
+        """Return the mean of a metric over the last period seconds."""
+
+        return self.series[(rnti, metric)].mean(period)
+
+    def percentile(self, rnti, metric, q, period=None):
+        """Return the q-th percentile of a metric over the last period
+        seconds."""
+
+        return self.series[(rnti, metric)].percentile(q, period)
+
+    def rate(self, rnti, metric, period=None):
+        """Return the rate of change per second of a metric over the last
+        period seconds."""
+
+        return self.series[(rnti, metric)].rate(period)
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        series = {}
+
+        for (rnti, metric), values in self.series.items():
+            series.setdefault(str(rnti), {})[metric] = values.to_dict()
+
+        return {'retention': self.retention,
+                'updates': self.updates,
+                'series': series}
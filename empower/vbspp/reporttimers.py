@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Registry of the periodic MAC stats reports active on the VBSPs."""
+
+
+class ReportTimers(object):
+    """Periodic report registry.
+
+    Maps the xid of every periodic report to the VBSP it has been requested
+    to. Entries are released when the module that requested the report is
+    removed or when the VBSP disconnects.
+    """
+
+    def __init__(self):
+        self.__timers = {}
+
+    def add(self, xid, vbsp):
+        """Register a periodic report."""
+
+        self.__timers[xid] = vbsp
+
+    def remove(self, xid):
+        """Release a periodic report, unknown xids are ignored."""
+
+        self.__timers.pop(xid, None)
+
+    def remove_vbsp(self, vbsp):
+        """Release all the periodic reports of a VBSP."""
+
+        for xid in [k for k, v in self.__timers.items() if v == vbsp]:
+            del self.__timers[xid]
+
+    def __contains__(self, xid):
+        return xid in self.__timers
+
+    def __len__(self):
+        return len(self.__timers)
+
+    def __iter__(self):
+        return iter(self.__timers)
+
+
+REPORT_TIMERS = ReportTimers()
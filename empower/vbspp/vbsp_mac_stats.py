@@ -41,7 +41,7 @@ from empower.vbspp import MAC_STATS_REPORT_FREQ
 from empower.vbspp import MAC_CELL_STATS_TYPES
 from empower.vbspp import MAC_UE_STATS_TYPES
 from empower.vbspp import PRT_MAC_STATS_RESPONSE
-from empower.vbspp import TIMER_IDS
+from empower.vbspp.reporttimers import REPORT_TIMERS
 
 import empower.logger
 LOG = empower.logger.get_logger()
@@ -57,11 +57,16 @@ class VBSPMACStats(Module):
     _vbsp = None
     _mac_stats_req = None
     _mac_stats_reply = None
+    _mac_stats_dict = None
+    _request_frame = None
 
-    def __eq__(self, other):
-        # The "False" value is used due to fact that multiple similar 
-        # mac stats request can exist
-        return super().__eq__(other) and False
+    @property
+    def key(self):
+        """Return the identity key of the module."""
+
+        # None is used due to fact that multiple similar mac stats request
+        # can exist
+        return None
 
     @property
     def vbsp(self):
@@ -86,18 +91,45 @@ class VBSPMACStats(Module):
         """Set configuration of mac stats requested."""
 
         self._mac_stats_req = value
+        self._request_frame = None
 
     @property
     def mac_stats_reply(self):
-        """Return MAC stats reply."""
+        """Return MAC stats reply as a dictionary.
 
-        return self._mac_stats_reply
+        The dictionary is built from the last reply only when it is first
+        requested (e.g. by the REST API or by a remote callback)."""
+
+        if self._mac_stats_reply is None:
+            return None
+
+        if self._mac_stats_dict is None:
+            self._mac_stats_dict = protobuf_to_dict(self._mac_stats_reply)
+
+        return self._mac_stats_dict
 
     @mac_stats_reply.setter
     def mac_stats_reply(self, response):
         """Set MAC stats reply."""
 
-        self._mac_stats_reply = protobuf_to_dict(response)
+        # the connection reuses its message object, keep a private copy
+        if self._mac_stats_reply is None:
+            self._mac_stats_reply = progran_pb2.progran_message()
+
+        self._mac_stats_reply.CopyFrom(response)
+        self._mac_stats_dict = None
+
+    @property
+    def mac_stats_message(self):
+        """Return the last MAC stats reply as a protobuf message."""
+
+        return self._mac_stats_reply
+
+    @property
+    def target(self):
+        """Return the address of the VBSP."""
+
+        return self.vbsp
 
     def to_dict(self):
         """ Return a JSON-serializable."""
@@ -110,98 +142,125 @@ class VBSPMACStats(Module):
 
         return out
 
-    def run_once(self):
-        """ Send out mac stats request. """
+    def build_request(self, connection):
+        """Build the mac stats request for the given connection.
 
-        if self.tenant_id not in RUNTIME.tenants:
-            return
+        Raises:
+            KeyError, ValueError, if the mac stats request is not valid
+        """
 
-        vbsps = RUNTIME.tenants[self.tenant_id].vbsps
+        stats_request = progran_pb2.progran_message()
 
-        if self.vbsp not in vbsps:
-            return
+        stats_request_config = self.mac_stats_req["stats_request_config"]
+        stats_request_msg = stats_request.stats_request_msg
+        stats_request_msg.type = MAC_STATS_TYPE[stats_request_config["report_type"]]
 
-        vbsp = vbsps[self.vbsp]
+        if stats_request_config["report_frequency"] == "off":
+            connection.create_header(stats_request_config["timer_xid"], connection.enb_id, header_pb2.PRPT_GET_ENB_CONFIG_REQUEST, stats_request.stats_request_msg.header)
+        else:
+            connection.create_header(self.module_id, connection.enb_id, header_pb2.PRPT_GET_ENB_CONFIG_REQUEST, stats_request.stats_request_msg.header)
+        
+        stats_request.msg_dir = progran_pb2.INITIATING_MESSAGE
 
-        if not vbsp.connection:
-            return
+        if stats_request_msg.type == stats_messages_pb2.PRST_COMPLETE_STATS:
 
-        stats_request = progran_pb2.progran_message()
+            complete_stats = stats_request_msg.complete_stats_request
+            complete_stats.report_frequency = MAC_STATS_REPORT_FREQ[stats_request_config["report_frequency"]]
+            complete_stats.sf = stats_request_config["periodicity"]
 
-        try:
-            stats_request_config = self.mac_stats_req["stats_request_config"]
-            stats_request_msg = stats_request.stats_request_msg
-            stats_request_msg.type = MAC_STATS_TYPE[stats_request_config["report_type"]]
+            cc_report_flag = 0
+            ue_report_flag = 0
 
-            connection = vbsp.connection
+            if stats_request_config["report_frequency"] != "off":
+                for flag in stats_request_config["report_config"]["cell_report_type"]["cell_report_flags"]:
+                    cc_report_flag |= MAC_CELL_STATS_TYPES[flag]            
 
-            if stats_request_config["report_frequency"] == "off":
-                connection.create_header(stats_request_config["timer_xid"], connection.enb_id, header_pb2.PRPT_GET_ENB_CONFIG_REQUEST, stats_request.stats_request_msg.header)
-            else:
-                connection.create_header(self.module_id, connection.enb_id, header_pb2.PRPT_GET_ENB_CONFIG_REQUEST, stats_request.stats_request_msg.header)
-            
-            stats_request.msg_dir = progran_pb2.INITIATING_MESSAGE
+                for flag in stats_request_config["report_config"]["ue_report_type"]["ue_report_flags"]:
+                    ue_report_flag |= MAC_UE_STATS_TYPES[flag]
 
-            if stats_request_config["report_frequency"] == "periodical":
-                TIMER_IDS.append(self.module_id)
+            complete_stats.ue_report_flags = ue_report_flag
+            complete_stats.cell_report_flags = cc_report_flag
 
-            if stats_request_msg.type == stats_messages_pb2.PRST_COMPLETE_STATS:
+        elif stats_request_msg.type == stats_messages_pb2.PRST_CELL_STATS:
+            cell_stats = stats_request_msg.cell_stats_request
+            cell_stats.report_frequency = MAC_STATS_REPORT_FREQ[stats_request_config["report_frequency"]]
+            cell_stats.sf = stats_request_config["periodicity"]
 
-                complete_stats = stats_request_msg.complete_stats_request
-                complete_stats.report_frequency = MAC_STATS_REPORT_FREQ[stats_request_config["report_frequency"]]
-                complete_stats.sf = stats_request_config["periodicity"]
+            cc_report_flag = 0
 
-                cc_report_flag = 0
-                ue_report_flag = 0
+            for flag in stats_request_config["report_config"]["cell_report_type"]["cell_report_flags"]:
+                cc_report_flag |= MAC_CELL_STATS_TYPES[flag]
 
-                if stats_request_config["report_frequency"] != "off":
-                    for flag in stats_request_config["report_config"]["cell_report_type"]["cell_report_flags"]:
-                        cc_report_flag |= MAC_CELL_STATS_TYPES[flag]            
+            for cc in stats_request_config["report_config"]["cell_report_type"]["cc_id"]:
+                cell_stats.cell.append(cc)
 
-                    for flag in stats_request_config["report_config"]["ue_report_type"]["ue_report_flags"]:
-                        ue_report_flag |= MAC_UE_STATS_TYPES[flag]
+            cell_stats.flags = cc_report_flag
 
-                complete_stats.ue_report_flags = ue_report_flag
-                complete_stats.cell_report_flags = cc_report_flag
+        elif stats_request_msg.type == stats_messages_pb2.PRST_UE_STATS:
+            ue_stats = stats_request_msg.ue_stats_request
+            ue_stats.report_frequency = MAC_STATS_REPORT_FREQ[stats_request_config["report_frequency"]]
+            ue_stats.sf = stats_request_config["periodicity"]
 
-            elif stats_request_msg.type == stats_messages_pb2.PRST_CELL_STATS:
-                cell_stats = stats_request_msg.cell_stats_request
-                cell_stats.report_frequency = MAC_STATS_REPORT_FREQ[stats_request_config["report_frequency"]]
-                cell_stats.sf = stats_request_config["periodicity"]
+            ue_report_flag = 0                
 
-                cc_report_flag = 0
+            for flag in stats_request_config["report_config"]["ue_report_type"]["ue_report_flags"]:
+                ue_report_flag |= MAC_UE_STATS_TYPES[flag]
 
-                for flag in stats_request_config["report_config"]["cell_report_type"]["cell_report_flags"]:
-                    cc_report_flag |= MAC_CELL_STATS_TYPES[flag]
+            for rnti in stats_request_config["report_config"]["ue_report_type"]["ue_rnti"]:
+                ue_stats.rnti.append(rnti)
 
-                for cc in stats_request_config["report_config"]["cell_report_type"]["cc_id"]:
-                    cell_stats.cell.append(cc)
+            ue_stats.flags = ue_report_flag
 
-                cell_stats.flags = cc_report_flag
+        return stats_request
 
-            elif stats_request_msg.type == stats_messages_pb2.PRST_UE_STATS:
-                ue_stats = stats_request_msg.ue_stats_request
-                ue_stats.report_frequency = MAC_STATS_REPORT_FREQ[stats_request_config["report_frequency"]]
-                ue_stats.sf = stats_request_config["periodicity"]
+    def request_frame(self, connection):
+        """Return the serialized mac stats request.
 
-                ue_report_flag = 0                
+        The request only depends on the module configuration, on its id and
+        on the eNB id, so it is built and serialized once and then reused
+        at every period. The cache is invalidated when mac_stats_req is set.
+        """
 
-                for flag in stats_request_config["report_config"]["ue_report_type"]["ue_report_flags"]:
-                    ue_report_flag |= MAC_UE_STATS_TYPES[flag]
+        key = (connection.enb_id, self.module_id)
+
+        if self._request_frame and self._request_frame[0] == key:
+            return self._request_frame[1]
+
+        frame = connection.build_frame(self.build_request(connection))
+        self._request_frame = (key, frame)
+
+        return frame
+
+    def run_once(self):
+        """ Send out mac stats request. """
 
-                for rnti in stats_request_config["report_config"]["ue_report_type"]["ue_rnti"]:
-                    ue_stats.rnti.append(rnti)
+        if self.tenant_id not in RUNTIME.tenants:
+            return
+
+        vbsps = RUNTIME.tenants[self.tenant_id].vbsps
+
+        if self.vbsp not in vbsps:
+            return
 
-                ue_stats.flags = ue_report_flag
+        vbsp = vbsps[self.vbsp]
+
+        if not vbsp.connection:
+            return
 
+        try:
+            stats_request_config = self.mac_stats_req["stats_request_config"]
+            frame = self.request_frame(vbsp.connection)
         except KeyError:
             return
         except ValueError:
             return
 
+        if stats_request_config["report_frequency"] == "periodical":
+            REPORT_TIMERS.add(self.module_id, self.vbsp)
+
         LOG.info("Sending mac stats request to %s (id=%u)", vbsp.addr, self.module_id)
 
-        vbsp.connection.stream_send(stats_request)
+        vbsp.connection.send_frame(frame)
 
         if stats_request_config["report_frequency"] == "off":
             self.worker.remove_module(stats_request_config["timer_xid"])
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""VBSP controller benchmark.
+
+Runs a VBSPServer in this process and drives it with fake eNB agents
+running in a separate process, scaling the number of agents and of UEs per
+agent. For every step it reports the number of messages handled per second
+by the controller, the latency of the message handlers and the CPU used by
+the controller process.
+
+The VBSPs are registered in memory only, the configuration database is not
+modified.
+
+Usage:
+    python3 -m empower.vbspp.vbspbench --agents 1,4,16 --ues 16,64
+"""
+
+import time
+import logging
+import multiprocessing
+
+from argparse import ArgumentParser
+
+import numpy as np
+import tornado.ioloop
+
+import empower.main
+from empower.core.core import EmpowerRuntime
+from empower.datatypes.etheraddress import EtherAddress
+from empower.vbspp import DEFAULT_PORT
+from empower.vbspp.fakeagent import DEFAULT_ENB_BASE
+from empower.vbspp.fakeagent import DEFAULT_HELLO_EVERY
+from empower.vbspp.fakeagent import DEFAULT_STATS_EVERY
+from empower.vbspp.fakeagent import DEFAULT_RRC_EVERY
+
+DEFAULT_DURATION = 10
+DEFAULT_WARMUP = 2
+
+
+class DispatchRecorder(object):
+    """Record the latency of the VBSP message handlers."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.enabled = False
+
+    def reset(self):
+        """Drop the recorded samples."""
+
+        self.latencies = {}
+
+    def wrap(self, dispatch):
+        """Return a timed version of the dispatch method."""
+
+        recorder = self
+
+        def timed_dispatch(connection, msg_type, msg):
+            if not recorder.enabled:
+                return dispatch(connection, msg_type, msg)
+            started = time.perf_counter()
+            dispatch(connection, msg_type, msg)
+            elapsed = time.perf_counter() - started
+            if msg_type not in recorder.latencies:
+                recorder.latencies[msg_type] = []
+            recorder.latencies[msg_type].append(elapsed)
+
+        return timed_dispatch
+
+
+def enb_address(enb_id):
+    """Return the VBSP address of an eNB id."""
+
+    return EtherAddress(enb_id.to_bytes(6, byteorder='big'))
+
+
+def run_step(server, recorder, agents, ues, args):
+    """Run a benchmark step and return its results."""
+
+    from empower.core.vbsp import VBSP
+
+    for i in range(agents):
+        addr = enb_address(args.enb_base + i)
+        if addr not in server.pnfdevs:
+            server.pnfdevs[addr] = VBSP(addr, "Fake eNB %u" % i)
+
+    agent_args = ["--port", str(args.port),
+                  "--agents", str(agents),
+                  "--enb-base", str(args.enb_base),
+                  "--ues", str(ues),
+                  "--hello-every", str(args.hello_every),
+                  "--stats-every", str(args.stats_every),
+                  "--rrc-every", str(args.rrc_every),
+                  "--duration", str(args.warmup + args.duration + 5)]
+
+    from empower.vbspp.fakeagent import main as agents_main
+
+    context = multiprocessing.get_context("spawn")
+    process = context.Process(target=agents_main, args=(agent_args,))
+    process.start()
+
+    loop = tornado.ioloop.IOLoop.current()
+    marks = {}
+
+    def begin():
+        recorder.reset()
+        recorder.enabled = True
+        marks['wall'] = time.time()
+        marks['cpu'] = time.process_time()
+
+    def end():
+        recorder.enabled = False
+        marks['wall'] = time.time() - marks['wall']
+        marks['cpu'] = time.process_time() - marks['cpu']
+        loop.stop()
+
+    loop.call_later(args.warmup, begin)
+    loop.call_later(args.warmup + args.duration, end)
+    loop.start()
+
+    process.terminate()
+    process.join()
+
+    # let the controller process the disconnections
+    loop.call_later(0.5, loop.stop)
+    loop.start()
+
+    samples = [np.array(v) for v in recorder.latencies.values()]
+    every = np.concatenate(samples) if samples else np.zeros(0)
+
+    out = {'agents': agents,
+           'ues': ues,
+           'messages': every.size,
+           'rate': every.size / marks['wall'],
+           'cpu': 100.0 * marks['cpu'] / marks['wall'],
+           'types': {}}
+
+    for msg_type, values in recorder.latencies.items():
+        values = np.array(values) * 1e6
+        out['types'][msg_type] = {'messages': values.size,
+                                  'p50': np.percentile(values, 50),
+                                  'p99': np.percentile(values, 99),
+                                  'max': values.max()}
+
+    return out
+
+
+def print_step(step):
+    """Print the results of a benchmark step."""
+
+    print("agents=%u ues=%u: %.0f msg/s, cpu %.1f%%" %
+          (step['agents'], step['ues'], step['rate'], step['cpu']))
+
+    for msg_type, stats in sorted(step['types'].items()):
+        print("    %-32s %8u msgs  p50 %8.1f us  p99 %8.1f us  "
+              "max %8.1f us" % (msg_type, stats['messages'], stats['p50'],
+                                stats['p99'], stats['max']))
+
+
+def parse_args(args=None):
+    """Parse the command line arguments."""
+
+    parser = ArgumentParser(description="VBSP controller benchmark")
+
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--agents", default="1,4,16",
+                        help="comma separated number of agents")
+    parser.add_argument("--ues", default="16,64",
+                        help="comma separated number of UEs per agent")
+    parser.add_argument("--enb-base", type=int, default=DEFAULT_ENB_BASE)
+    parser.add_argument("--hello-every", type=int,
+                        default=DEFAULT_HELLO_EVERY)
+    parser.add_argument("--stats-every", type=int,
+                        default=DEFAULT_STATS_EVERY)
+    parser.add_argument("--rrc-every", type=int, default=DEFAULT_RRC_EVERY)
+    parser.add_argument("--duration", type=int, default=DEFAULT_DURATION,
+                        help="measured seconds per step")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP,
+                        help="seconds before each measurement")
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Run the benchmark."""
+
+    logging.basicConfig(level=logging.WARNING)
+
+    args = parse_args(args)
+
+    empower.main.RUNTIME = EmpowerRuntime()
+
+    from empower.vbspp import PRT_TYPES
+    from empower.vbspp import PRT_TYPES_HANDLERS
+    from empower.vbspp.vbspserver import VBSPServer
+    from empower.vbspp.vbspconnection import VBSPConnection
+
+    recorder = DispatchRecorder()
+    VBSPConnection._dispatch_message = \
+        recorder.wrap(VBSPConnection._dispatch_message)
+
+    server = VBSPServer(args.port, PRT_TYPES, PRT_TYPES_HANDLERS)
+
+    for agents in [int(x) for x in args.agents.split(",")]:
+        for ues in [int(x) for x in args.ues.split(",")]:
+            print_step(run_step(server, recorder, agents, ues, args))
+
+
+if __name__ == "__main__":
+    main()
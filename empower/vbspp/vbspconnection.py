@@ -28,35 +28,56 @@
 """VBSP Connection."""
 
 import time
+import struct
+import logging
 import tornado.ioloop
 from construct import Container
-from time import sleep
+from collections import deque
+from google.protobuf.message import DecodeError
 
 import empower.vbspp.messages.progran_pb2 as progran_pb2
 import empower.vbspp.messages.header_pb2 as header_pb2
 import empower.vbspp.messages.stats_messages_pb2 as stats_messages_pb2
-import empower.vbspp.messages.config_common_pb2 as config_common_pb2
 from empower.datatypes.etheraddress import EtherAddress
 from empower.vbspp import MESSAGE_SIZE
 from empower.vbspp import PRT_VBSP_HELLO
 from empower.vbspp import PRT_VBSP_BYE
-from empower.vbspp import PRT_UE_STATE_CHANGE
-from empower.vbspp import PRT_UE_RRC_MEASUREMENTS_RESPONSE
 from empower.vbspp import PRT_VBSP_REGISTER
 from empower.vbspp import PROGRAN_VERSION
 from empower.vbspp import MAC_STATS_TYPE
 from empower.vbspp import MAC_STATS_REPORT_FREQ
 from empower.vbspp import MAC_CELL_STATS_TYPES
 from empower.vbspp import MAC_UE_STATS_TYPES
-from empower.vbspp import TIMER_IDS
+from empower.vbspp.reporttimers import REPORT_TIMERS
 from empower.vbspp import REPORT_INTERVAL
+from empower.vbspp.accessors import ue_state_rnti
+from empower.vbspp.accessors import ue_state_deactivated
+from empower.vbspp.accessors import ue_rrc_rnti
+from empower.vbspp.accessors import ue_rrc_pcell
+from empower.vbspp.accessors import ue_rrc_neighbours
+from empower.vbspp.macstatsstore import MACStatsStore
 from protobuf_to_dict import protobuf_to_dict
 from empower.core.ue import UE
+from empower.core.timerwheel import TIMERS
+from empower.core.framedecoder import FrameDecoder
+from empower.core.capture import CAPTURE
+from empower.core.capture import PROTO_VBSP
+from empower.core.capture import KIND_IN
+from empower.core.capture import KIND_OUT
+from empower.core.loopmonitor import HANDLER_LATENCY
 from empower.main import RUNTIME
 
 import empower.logger
 LOG = empower.logger.get_logger()
 
+FRAME_LENGTH = struct.Struct("!I")
+
+
+def frame_length(view, offset):
+    """Return the length of the frame starting at offset."""
+
+    return 4 + FRAME_LENGTH.unpack_from(view, offset)[0]
+
 
 class VBSPConnection(object):
     """VBSP Connection.
@@ -71,6 +92,8 @@ class VBSPConnection(object):
         address: The connection source address, i.e. the ENB IP address.
         server: Pointer to the server object.
         vbsp: Pointer to a VBSP object.
+        capture_id: The connection id in the signalling capture, 0 if the
+          capture is disabled.
     """
 
     def __init__(self, stream, addr, server):
@@ -82,11 +105,17 @@ class VBSPConnection(object):
         self.vbsp_id = None
         self.xid = None
         self.stream.set_close_callback(self._on_disconnect)
-        self.__buffer = b''
+        self.__decoder = FrameDecoder(4, frame_length, server.max_frame)
+        self.__message = progran_pb2.progran_message()
+        self.__received = 0
         self._hb_interval_ms = 500
-        self._hb_worker = tornado.ioloop.PeriodicCallback(self._heartbeat_cb,
-                                                          self._hb_interval_ms)
-        self._hb_worker.start()
+        self._hb_worker = TIMERS.add(self._heartbeat_cb, self._hb_interval_ms)
+        self.__prehello = deque()
+        self.__hello_timeout = tornado.ioloop.IOLoop.current().call_later(
+            server.hello_timeout / 1000, self._on_hello_timeout)
+        self.prehello_queued = 0
+        self.prehello_dropped = 0
+        self.capture_id = CAPTURE.open(PROTO_VBSP, addr)
         self._wait()
 
     def to_dict(self):
@@ -153,9 +182,38 @@ class VBSPConnection(object):
         self.stream.write(size_message)
         self.stream.write(send_buff)
 
+        if self.capture_id:
+            CAPTURE.write(PROTO_VBSP, KIND_OUT, self.capture_id,
+                          size_message + send_buff)
+
         if self.vbsp:
             self.vbsp.downlink_bytes += 4 + size
 
+    def build_frame(self, message):
+        """Return the length-prefixed serialization of a message.
+
+        The returned bytes can be cached by the caller and sent any number
+        of times with send_frame.
+        """
+
+        send_buff = self.serialize_message(message)
+
+        if send_buff is None:
+            return None
+
+        return self.build_size_message(len(send_buff)) + send_buff
+
+    def send_frame(self, frame):
+        """Send a frame built by build_frame."""
+
+        self.stream.write(frame)
+
+        if self.capture_id:
+            CAPTURE.write(PROTO_VBSP, KIND_OUT, self.capture_id, frame)
+
+        if self.vbsp:
+            self.vbsp.downlink_bytes += len(frame)
+
     def send_echo_request(self, enb_id):
 
         echo_request = progran_pb2.progran_message()
@@ -184,38 +242,62 @@ class VBSPConnection(object):
         LOG.info("Sending echo reply message to VBSP %f", self.vbsp.addr)
         self.stream_send(echo_reply)
 
-    def _on_read(self, line):
-        """ Appends bytes read from socket to a buffer. Once the full packet
-        has been read the parser is invoked and the buffers is cleared. The
-        parsed packet is then passed to the suitable method or dropped if the
-        packet type in unknown. """
+    def _on_read(self, nbytes):
+        """ Commits the bytes read from socket to the receive buffer and
+        parses every complete size-prefixed frame found in it. Incomplete
+        frames are kept in the buffer until the next read. Frames longer
+        than the configured maximum close the connection. """
 
-        self.__buffer = b''
+        self.__decoder.commit(nbytes)
 
-        if line is not None:
-            LOG.info("Received message of length %d" % len(line))
+        if self.vbsp:
+            self.vbsp.uplink_bytes += nbytes
 
-            self.__buffer = self.__buffer + line
+        frames = self.__decoder.frames()
 
-            if self.vbsp:
-                self.vbsp.uplink_bytes += len(line)
+        while True:
 
-            if len(line) == 4: # Checking for size message (4 Bytes)
-                size = MESSAGE_SIZE.parse(self.__buffer)
-                remaining = size.length
-                self.stream.read_bytes(remaining, self._on_read)
+            # only framing errors close the connection here, errors raised
+            # by the message handlers are propagated
+            try:
+                frame = next(frames, None)
+            except ValueError as ex:
+                LOG.error("Closing connection from %r: %s", self.addr, ex)
+                self.stream.close()
                 return
 
-            deserialized_msg = self.deserialize_message(line)
+            if frame is None:
+                break
+
+            if self.capture_id:
+                CAPTURE.write(PROTO_VBSP, KIND_IN, self.capture_id, frame)
+
+            # the message instance is reused across frames
+            self.__message.Clear()
+
+            try:
+                self.__message.ParseFromString(bytes(frame[4:]))
+            except DecodeError as ex:
+                LOG.error("Invalid message from %r: %s", self.addr, ex)
+                continue
 
-            # LOG.info("\n\n\n************ START OF REPLY MESSAGE ********************\n\n\n")
+            self._dump_message(self.__message)
+            self._trigger_message(self.__message)
 
-            LOG.info(deserialized_msg.__str__())
+        self._wait()
+
+    def _dump_message(self, message):
+        """Log one message every dump_every messages (debug only)."""
+
+        if not self.server.dump_every or not LOG.isEnabledFor(logging.DEBUG):
+            return
 
-            # LOG.info("\n\n\n************ END OF REPLY MESSAGE **********************\n\n\n")
+        self.__received += 1
 
-            self._trigger_message(deserialized_msg)
-            self._wait()
+        if self.__received % self.server.dump_every:
+            return
+
+        LOG.debug("Message from %r:\n%s", self.addr, message)
 
     def _trigger_message(self, deserialized_msg, callback_data=None):
 
@@ -226,9 +308,79 @@ class VBSPConnection(object):
             LOG.error("Unknown message type %u", msg_type)
             return
 
-        while msg_type != PRT_VBSP_HELLO and self.vbsp == None:
-            sleep(2)  # Time in seconds.
+        # messages received before the hello are queued until the eNB has
+        # been identified
+        if msg_type != PRT_VBSP_HELLO and not self.vbsp:
+            self._queue_prehello(deserialized_msg)
+            return
+
+        self._dispatch_message(msg_type, deserialized_msg)
 
+        if msg_type == PRT_VBSP_HELLO and self.vbsp:
+            self._drain_prehello()
+
+    def _queue_prehello(self, deserialized_msg):
+        """Queue a message received before the hello."""
+
+        if len(self.__prehello) >= self.server.prehello_queue:
+            LOG.warning("Pre-hello queue full, dropping message from %s",
+                        self.addr[0])
+            self.prehello_dropped += 1
+            self.server.prehello_dropped += 1
+            return
+
+        # the incoming message instance is reused, queue a copy
+        message = progran_pb2.progran_message()
+        message.CopyFrom(deserialized_msg)
+
+        self.__prehello.append(message)
+        self.prehello_queued += 1
+        self.server.prehello_queued += 1
+
+    def _drain_prehello(self):
+        """Handle the messages received before the hello, in order."""
+
+        if self.__hello_timeout:
+            tornado.ioloop.IOLoop.current().remove_timeout(
+                self.__hello_timeout)
+            self.__hello_timeout = None
+
+        while self.__prehello and not self.stream.closed():
+            deserialized_msg = self.__prehello.popleft()
+            msg_type = deserialized_msg.WhichOneof("msg")
+            self._dispatch_message(msg_type, deserialized_msg)
+
+    def _clear_prehello(self):
+        """Discard the messages received before the hello."""
+
+        if self.__hello_timeout:
+            tornado.ioloop.IOLoop.current().remove_timeout(
+                self.__hello_timeout)
+            self.__hello_timeout = None
+
+        self.prehello_dropped += len(self.__prehello)
+        self.server.prehello_dropped += len(self.__prehello)
+        self.__prehello.clear()
+
+    def _on_hello_timeout(self):
+        """Close the connection if no hello has been received in time."""
+
+        self.__hello_timeout = None
+
+        if self.vbsp or self.stream.closed():
+            return
+
+        LOG.error("No hello from %s after %u ms, closing connection",
+                  self.addr[0], self.server.hello_timeout)
+
+        self.server.hello_timeouts += 1
+        self._clear_prehello()
+        self.stream.close()
+
+    def _dispatch_message(self, msg_type, deserialized_msg):
+        """Call the handlers registered for the message type."""
+
+        started = time.perf_counter()
         handler_name = "_handle_%s" % self.server.pt_types[msg_type]
 
         if hasattr(self, handler_name):
@@ -239,58 +391,52 @@ class VBSPConnection(object):
             for handler in self.server.pt_types_handlers[msg_type]:
                 handler(deserialized_msg)
 
-    def convert_hex_enb_id_to_ether_address(self, enb_id):
+        HANDLER_LATENCY.observe("vbsp", msg_type,
+                                time.perf_counter() - started)
 
-        str_hex_value = format(enb_id, 'x')
-        padding = '0' * (12 - len(str_hex_value))
-        mac_string = padding + str_hex_value
-        mac_string_array = [mac_string[i:i+2] for i in range(0, len(mac_string), 2)]
+    def convert_hex_enb_id_to_ether_address(self, enb_id):
 
-        return EtherAddress(":".join(mac_string_array))
+        return EtherAddress.from_int(enb_id)
 
     def _handle_ue_state_change(self, ue_state):
 
-        ue_state_dict = protobuf_to_dict(ue_state)[PRT_UE_STATE_CHANGE]
-        rnti = ue_state_dict["config"]["rnti"]
+        rnti = ue_state_rnti(ue_state)
 
-        if ue_state_dict["type"] != config_common_pb2.PRUESC_DEACTIVATED:
-            if "capabilities" not in ue_state_dict["config"]:
-                capabilities = {}
-            else:
-                capabilities = ue_state_dict["config"]["capabilities"]
-                del ue_state_dict["config"]["capabilities"]
-            del ue_state_dict["config"]["rnti"]
-            self.vbsp.ues[rnti] = UE(rnti, self.vbsp, ue_state_dict["config"], capabilities)
+        if not ue_state_deactivated(ue_state):
+            # the full configuration is only needed when the UE is created
+            config = protobuf_to_dict(ue_state.ue_state_change_msg.config)
+            capabilities = config.pop("capabilities", {})
+            del config["rnti"]
+            self.vbsp.ues[rnti] = UE(rnti, self.vbsp, config, capabilities)
 
-        elif ue_state_dict["type"] == config_common_pb2.PRUESC_DEACTIVATED and rnti in self.vbsp.ues:            
+        elif rnti in self.vbsp.ues:
             del self.vbsp.ues[rnti]
+            if self.vbsp.mac_stats:
+                self.vbsp.mac_stats.remove_ue(rnti)
+
+    def _handle_mac_stats_response(self, stats_reply):
+
+        if self.vbsp.mac_stats is not None:
+            self.vbsp.mac_stats.update(stats_reply)
 
     def _handle_ue_rrc_measurements_reply(self, measurements_response):
 
-        measurements_response_dict = protobuf_to_dict(measurements_response)[PRT_UE_RRC_MEASUREMENTS_RESPONSE]
-        measurements = measurements_response_dict["measurements"]
+        rnti = ue_rrc_rnti(measurements_response)
 
-        try:
-            rnti = measurements_response_dict["rnti"]
-            ue = self.vbsp.ues[rnti]
-        except KeyError:
+        if rnti not in self.vbsp.ues:
             LOG.error(" Unknown UE to VBSP (%s)", (self.vbsp_id))
             return
 
-        ue.PCell_rsrp = measurements["PCell_rsrp"]
-        ue.PCell_rsrq = measurements["PCell_rsrq"]
-
-        if "meas_result_neigh_cells" in measurements:
-            meas_result_neigh_cells = measurements["meas_result_neigh_cells"]
-            for measurement_RAT in meas_result_neigh_cells:
-                for measurement in meas_result_neigh_cells[measurement_RAT]:
-                    ue.rrc_measurements[measurement["phys_cell_id"]] = {"measId": measurements["measId"],
-                                                                        "RAT_type": measurement_RAT,
-                                                                        "rsrp": measurement["meas_result"]["rsrp"],
-                                                                        "rsrq": measurement["meas_result"]["rsrq"]
-                                                                        }
+        ue = self.vbsp.ues[rnti]
 
+        ue.PCell_rsrp, ue.PCell_rsrq = ue_rrc_pcell(measurements_response)
 
+        for meas_id, rat_type, phys_cell_id, rsrp, rsrq in \
+                ue_rrc_neighbours(measurements_response):
+            ue.rrc_measurements[phys_cell_id] = {"measId": meas_id,
+                                                 "RAT_type": rat_type,
+                                                 "rsrp": rsrp,
+                                                 "rsrq": rsrq}
 
     def _handle_hello(self, hello):
         """Handle an incoming HELLO message.
@@ -321,6 +467,9 @@ class VBSPConnection(object):
             # attribute of the PNFDev object is set
             self.vbsp = vbsp
             vbsp.connection = self
+            if vbsp.mac_stats is None:
+                vbsp.mac_stats = \
+                    MACStatsStore(self.server.mac_stats_retention)
             self.xid = hello.hello_msg.header.xid + 1
             vbsp.period = 5000 # milliseconds
             self.send_enb_config_request(self.enb_id)
@@ -436,11 +585,22 @@ class VBSPConnection(object):
 
     def _wait(self):
         """ Wait for incoming packets on signalling channel """
-        self.stream.read_bytes(4, self._on_read)
+
+        if self.stream.closed():
+            return
+
+        self.stream.read_into(self.__decoder.writable(), self._on_read,
+                              partial=True)
 
     def _on_disconnect(self):
         """ Handle WTP disconnection """
 
+        self._hb_worker.stop()
+        self._clear_prehello()
+
+        if self.capture_id:
+            CAPTURE.close(PROTO_VBSP, self.capture_id)
+
         if not self.vbsp:
             return
 
@@ -449,7 +609,7 @@ class VBSPConnection(object):
         # reset state
         # self.vbsp.last_seen = 0
         self.vbsp.connection = None
-        TIMER_IDS = []
+        REPORT_TIMERS.remove_vbsp(self.vbsp.addr)
         # self.vbsp.ports = {}
         # self.vbsp.supports = ResourcePool()
 
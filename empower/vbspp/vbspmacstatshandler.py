@@ -80,7 +80,7 @@ class VBSPMACStatsHandler(EmpowerAPIHandlerAdminUsers):
                }'
         """
 
-        from empower.vbspp import TIMER_IDS
+        from empower.vbspp.reporttimers import REPORT_TIMERS
 
         try:
 
@@ -113,11 +113,10 @@ class VBSPMACStatsHandler(EmpowerAPIHandlerAdminUsers):
             if request["stats_request_config"]["report_frequency"] == "off" and "timer_xid" not in request["stats_request_config"]:
                 raise ValueError("missing timer_xid element")
 
+            # the timer is released when its module is removed
             if request["stats_request_config"]["report_frequency"] == "off":
-                if request["stats_request_config"]["timer_xid"] not in TIMER_IDS:
+                if request["stats_request_config"]["timer_xid"] not in REPORT_TIMERS:
                     raise ValueError("Invalid timer_xid element")
-                else:
-                    TIMER_IDS.remove(request["stats_request_config"]["timer_xid"])
 
             vbsp = None
 
@@ -198,3 +197,67 @@ class VBSPMACStatsHandler(EmpowerAPIHandlerAdminUsers):
 
         if mac_stats_module.mac_stats_req["stats_request_config"]["report_frequency"] == "once":
             mac_stats_module.worker.remove_module(mac_stats_module.module_id)
+
+
+class VBSPMACStatsSeriesHandler(EmpowerAPIHandlerAdminUsers):
+    """VBSP MAC stats series handler. Used to query the MAC statistics
+    recorded for a VBSP (controller-wide)."""
+
+    HANDLERS = [r"/api/v1/vbsps/([a-zA-Z0-9:]*)/mac_stats/series/?",
+                r"/api/v1/vbsps/([a-zA-Z0-9:]*)/mac_stats/series/([a-zA-Z0-9]*)/([a-zA-Z_]*)/?"]
+
+    def get(self, *args, **kwargs):
+        """ List the recorded series or query one of them.
+
+        Args:
+            vbsp_id: the vbsp identifier
+            rnti: the UE rnti, or cc<carrier_index> for cell metrics
+            metric: the metric name
+            period: the window in seconds (optional, query argument)
+            q: comma separated percentiles (optional, query argument)
+
+        Example URLs:
+            GET /api/v1/vbsps/11:22:33:44:55:66/mac_stats/series
+            GET /api/v1/vbsps/11:22:33:44:55:66/mac_stats/series/70/dl_cqi?period=5&q=50,95
+            GET /api/v1/vbsps/11:22:33:44:55:66/mac_stats/series/cc0/noise_rip
+        """
+
+        try:
+
+            if len(args) != 1 and len(args) != 3:
+                raise ValueError("Invalid URL")
+
+            vbsp = RUNTIME.vbsps[EtherAddress(args[0])]
+
+            if vbsp.mac_stats is None:
+                raise KeyError("No MAC stats for %s" % args[0])
+
+            if len(args) == 1:
+                self.write_as_json(vbsp.mac_stats.to_dict())
+                return
+
+            rnti = args[1] if args[1].startswith("cc") else int(args[1])
+            metric = args[2]
+            series = vbsp.mac_stats.series[(rnti, metric)]
+
+            period = self.get_argument("period", None)
+            if period is not None:
+                period = float(period)
+
+            out = series.to_dict()
+            out['rnti'] = args[1]
+            out['metric'] = metric
+            out['period'] = period
+            out['mean'] = series.mean(period)
+            out['rate'] = series.rate(period)
+            out['percentiles'] = {}
+
+            for q in self.get_argument("q", "50,90,99").split(","):
+                out['percentiles'][q] = series.percentile(float(q), period)
+
+            self.write_as_json(out)
+
+        except KeyError as ex:
+            self.send_error(404, message=ex)
+        except ValueError as ex:
+            self.send_error(400, message=ex)
@@ -33,6 +33,7 @@ from empower.core.pnfpserver import BasePNFDevHandler
 from empower.restserver.restserver import RESTServer
 from empower.core.pnfpserver import PNFPServer
 from empower.vbspp.vbspmacstatshandler import VBSPMACStatsHandler
+from empower.vbspp.vbspmacstatshandler import VBSPMACStatsSeriesHandler
 from empower.vbspp.uerrcmeasurementshandler import UERRCMeasurementsHandler
 from empower.vbspp.uehandler import UEHandler
 from empower.persistence.persistence import TblVBSP
@@ -53,6 +54,11 @@ from empower.main import RUNTIME
 import empower.logger
 LOG = empower.logger.get_logger()
 
+DEFAULT_PREHELLO_QUEUE = 32
+DEFAULT_HELLO_TIMEOUT = 10000
+DEFAULT_MAX_FRAME = 262144
+DEFAULT_DUMP_EVERY = 0
+DEFAULT_MAC_STATS_RETENTION = 1024
 
 MAC_STATS_TYPE.update({
     "complete": stats_messages_pb2.PRST_COMPLETE_STATS,
@@ -97,12 +103,29 @@ class VBSPHandler(BasePNFDevHandler):
 
 
 class VBSPServer(PNFPServer, TCPServer):
-    """Exposes the VBSP API."""
+    """Exposes the VBSP API.
+
+    Messages received on a new connection before the eNB hello are queued
+    (up to prehello_queue messages, further messages are dropped) and
+    handled once the hello has been processed. Connections that do not
+    send an hello within hello_timeout ms are closed.
+
+    Frames longer than max_frame bytes close the connection. When
+    dump_every is set and debug logging is enabled, one message every
+    dump_every messages is logged.
+
+    MAC statistics replies are recorded in a per-VBSP time-series store
+    keeping the last mac_stats_retention samples of each metric.
+    """
 
     PNFDEV = VBSP
     TBL_PNFDEV = TblVBSP
 
-    def __init__(self, port, prt_types, prt_types_handlers):
+    def __init__(self, port, prt_types, prt_types_handlers,
+                 prehello_queue=DEFAULT_PREHELLO_QUEUE,
+                 hello_timeout=DEFAULT_HELLO_TIMEOUT,
+                 max_frame=DEFAULT_MAX_FRAME, dump_every=DEFAULT_DUMP_EVERY,
+                 mac_stats_retention=DEFAULT_MAC_STATS_RETENTION):
 
         PNFPServer.__init__(self, prt_types, prt_types_handlers)
         TCPServer.__init__(self)
@@ -110,24 +133,53 @@ class VBSPServer(PNFPServer, TCPServer):
         self.port = int(port)
         self.ues = {}
         self.connection = None
+        self.prehello_queue = int(prehello_queue)
+        self.hello_timeout = int(hello_timeout)
+        self.max_frame = int(max_frame)
+        self.dump_every = int(dump_every)
+        self.mac_stats_retention = int(mac_stats_retention)
+        self.prehello_queued = 0
+        self.prehello_dropped = 0
+        self.hello_timeouts = 0
 
         # self.listen(self.port, "127.0.0.1")
         self.listen(self.port)
 
+    def to_dict(self):
+        """ Return a dict representation of the object. """
+
+        out = super().to_dict()
+
+        out['prehello_queue'] = self.prehello_queue
+        out['hello_timeout'] = self.hello_timeout
+        out['prehello_queued'] = self.prehello_queued
+        out['prehello_dropped'] = self.prehello_dropped
+        out['hello_timeouts'] = self.hello_timeouts
+        out['mac_stats_retention'] = self.mac_stats_retention
+
+        return out
+
     def handle_stream(self, stream, address):
         LOG.info('Incoming connection from %r and %r', address, stream)
         self.connection = VBSPConnection(stream, address, server=self)
 
 
-def launch(port=DEFAULT_PORT):
+def launch(port=DEFAULT_PORT, prehello_queue=DEFAULT_PREHELLO_QUEUE,
+           hello_timeout=DEFAULT_HELLO_TIMEOUT, max_frame=DEFAULT_MAX_FRAME,
+           dump_every=DEFAULT_DUMP_EVERY,
+           mac_stats_retention=DEFAULT_MAC_STATS_RETENTION):
     """Start VBSP Server Module."""
 
-    server = VBSPServer(port, PRT_TYPES, PRT_TYPES_HANDLERS)
+    server = VBSPServer(port, PRT_TYPES, PRT_TYPES_HANDLERS,
+                        int(prehello_queue), int(hello_timeout),
+                        int(max_frame), int(dump_every),
+                        int(mac_stats_retention))
 
     rest_server = RUNTIME.components[RESTServer.__module__]
     rest_server.add_handler_class(TenantVBSPHandler, server)
     rest_server.add_handler_class(VBSPHandler, server)
     rest_server.add_handler_class(VBSPMACStatsHandler, server)
+    rest_server.add_handler_class(VBSPMACStatsSeriesHandler, server)
     rest_server.add_handler_class(UEHandler, server)
     rest_server.add_handler_class(UERRCMeasurementsHandler, server)
 
@@ -17,7 +17,7 @@
 
 """Setup script."""
 
-from distutils.core import setup
+from setuptools import setup
 
 setup(name="empower-runtime",
       version="1.0",
@@ -26,4 +26,7 @@ setup(name="empower-runtime",
       author_email="roberto.riggio@create-net.org",
       url="https://github.com/5g-empower/empower-runtime",
       long_description="EmPOWER is an SDN/NFV framework for Enterprise WLANs",
-      packages=['empower'])
+      packages=['empower'],
+      extras_require={
+          # persistent connections for remote module callbacks
+          'callbacks': ['pycurl']})
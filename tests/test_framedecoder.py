@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""FrameDecoder tests."""
+
+import struct
+import unittest
+
+from empower.core.framedecoder import FrameDecoder
+
+# VBSP frames: 4 bytes size prefix, not included in the size
+VBSP_SIZE = struct.Struct("!I")
+
+# LVAPP frames: version, type, length (header included)
+LVAPP_HEADER = struct.Struct("!BBH")
+
+
+def vbsp_frame_length(view, offset):
+    """Return the length of the VBSP frame starting at offset."""
+
+    return 4 + VBSP_SIZE.unpack_from(view, offset)[0]
+
+
+def lvapp_frame_length(view, offset):
+    """Return the length of the LVAPP frame starting at offset."""
+
+    return LVAPP_HEADER.unpack_from(view, offset)[2]
+
+
+def vbsp_frame(body):
+    """Return a size-prefixed VBSP frame."""
+
+    return VBSP_SIZE.pack(len(body)) + body
+
+
+def lvapp_frame(msg_type, body):
+    """Return an LVAPP frame."""
+
+    return LVAPP_HEADER.pack(0, msg_type, 4 + len(body)) + body
+
+
+def feed(decoder, data, chunks=None):
+    """Feed data to the decoder, chunks bytes at a time, and return the
+    decoded frames as bytes."""
+
+    out = []
+    offset = 0
+    chunks = chunks or len(data)
+
+    while offset < len(data):
+
+        writable = decoder.writable()
+        nbytes = min(chunks, len(data) - offset, len(writable))
+        writable[:nbytes] = data[offset:offset + nbytes]
+        decoder.commit(nbytes)
+        offset += nbytes
+
+        out.extend(bytes(x) for x in decoder.frames())
+
+    return out
+
+
+class TestFrameDecoder(unittest.TestCase):
+    """FrameDecoder tests."""
+
+    def test_several_frames(self):
+        """Several frames in a single read are all decoded."""
+
+        frames = [vbsp_frame(b"a" * x) for x in (10, 0, 30, 1)]
+        decoder = FrameDecoder(4, vbsp_frame_length, 1024)
+
+        self.assertEqual(feed(decoder, b"".join(frames)), frames)
+        self.assertEqual(decoder.pending, 0)
+
+    def test_split_frames(self):
+        """Frames split across reads are decoded once complete."""
+
+        frames = [vbsp_frame(bytes(range(x))) for x in (7, 100, 3, 64)]
+        data = b"".join(frames)
+
+        for chunks in (1, 2, 3, 5, 13, 64):
+            decoder = FrameDecoder(4, vbsp_frame_length, 256)
+            self.assertEqual(feed(decoder, data, chunks), frames, chunks)
+            self.assertEqual(decoder.pending, 0)
+
+    def test_partial_frame(self):
+        """A partial frame is kept until the rest is read."""
+
+        frame = vbsp_frame(b"x" * 20)
+        decoder = FrameDecoder(4, vbsp_frame_length, 64)
+
+        self.assertEqual(feed(decoder, frame[:10]), [])
+        self.assertEqual(decoder.pending, 10)
+        self.assertEqual(feed(decoder, frame[10:]), [frame])
+
+    def test_four_bytes_body(self):
+        """A 4 bytes body is not mistaken for a size prefix."""
+
+        body = VBSP_SIZE.pack(12)
+        frames = [vbsp_frame(body), vbsp_frame(b"y" * 12), vbsp_frame(body)]
+        data = b"".join(frames)
+
+        for chunks in (None, 4, 8):
+            decoder = FrameDecoder(4, vbsp_frame_length, 64)
+            self.assertEqual(feed(decoder, data, chunks), frames, chunks)
+
+    def test_lvapp_frames(self):
+        """LVAPP frames, whose length includes the header, are decoded."""
+
+        frames = [lvapp_frame(0x04, b"h" * 22), lvapp_frame(0x12, b""),
+                  lvapp_frame(0x05, b"p" * 40)]
+        data = b"".join(frames)
+
+        for chunks in (None, 1, 5):
+            decoder = FrameDecoder(4, lvapp_frame_length, 128)
+            self.assertEqual(feed(decoder, data, chunks), frames, chunks)
+
+    def test_max_frame(self):
+        """Frames longer than max_frame raise ValueError."""
+
+        decoder = FrameDecoder(4, vbsp_frame_length, 64)
+
+        self.assertEqual(feed(decoder, vbsp_frame(b"z" * 60)),
+                         [vbsp_frame(b"z" * 60)])
+
+        with self.assertRaises(ValueError):
+            feed(decoder, vbsp_frame(b"z" * 61))
+
+    def test_short_frame(self):
+        """Frames shorter than the header raise ValueError."""
+
+        decoder = FrameDecoder(4, lvapp_frame_length, 64)
+
+        with self.assertRaises(ValueError):
+            feed(decoder, LVAPP_HEADER.pack(0, 0x04, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""IdAllocator tests."""
+
+import unittest
+
+from empower.core.idallocator import IdAllocator
+
+
+class TestIdAllocator(unittest.TestCase):
+    """IdAllocator tests."""
+
+    def test_sequential(self):
+        """Identifiers are handed out in order, skipping reserved ones."""
+
+        ids = IdAllocator(1, 10, reserved=(2, 5))
+
+        self.assertEqual([ids.allocate() for _ in range(8)],
+                         [1, 3, 4, 6, 7, 8, 9, 10])
+        self.assertEqual(len(ids), 8)
+        self.assertIn(3, ids)
+        self.assertNotIn(2, ids)
+
+    def test_exhaustion(self):
+        """Allocating from an exhausted range raises ValueError."""
+
+        ids = IdAllocator(1, 3, reserved=(2, ))
+
+        ids.allocate()
+        ids.allocate()
+
+        self.assertRaises(ValueError, ids.allocate)
+
+    def test_release_ignored(self):
+        """Releasing an unused or reserved identifier is a no-op."""
+
+        ids = IdAllocator(1, 3, reserved=(2, ))
+
+        ids.release(1)
+        ids.release(2)
+
+        self.assertEqual(ids.allocate(), 1)
+        ids.release(1)
+        ids.release(1)
+
+        self.assertEqual(ids.to_dict()['quarantine'], 1)
+
+    def test_free_list_first(self):
+        """Identifiers out of quarantine are reused before new ones."""
+
+        ids = IdAllocator(1, 100, quarantine=2)
+
+        first = [ids.allocate() for _ in range(4)]
+
+        for ident in first:
+            ids.release(ident)
+
+        # 1 and 2 left the quarantine, 3 and 4 are still held back
+        self.assertEqual(ids.to_dict()['free'], 2)
+        self.assertEqual(ids.to_dict()['quarantine'], 2)
+
+        self.assertEqual([ids.allocate() for _ in range(3)], [1, 2, 5])
+
+    def test_quarantine_bounded(self):
+        """Neither the free-list nor the quarantine grow without bound."""
+
+        ids = IdAllocator(1, 2**32 - 1, quarantine=8)
+
+        for _ in range(10000):
+            ids.release(ids.allocate())
+
+        state = ids.to_dict()
+
+        self.assertEqual(state['used'], 0)
+        self.assertEqual(state['quarantine'], 8)
+        self.assertLessEqual(state['free'], 1)
+
+    def test_quarantine_drained_last(self):
+        """The quarantine is used once everything else is exhausted."""
+
+        ids = IdAllocator(1, 3)
+
+        self.assertEqual([ids.allocate() for _ in range(3)], [1, 2, 3])
+
+        ids.release(2)
+        ids.release(1)
+
+        self.assertEqual([ids.allocate() for _ in range(2)], [2, 1])
+        self.assertRaises(ValueError, ids.allocate)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2016, Roberto Riggio
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Parity tests between the construct and the fast LVAPP codecs."""
+
+import random
+import unittest
+
+from construct import Container
+
+import empower.lvapp as lvapp
+import empower.lvapp.fastcodec as fastcodec
+
+ROUNDS = 50
+
+
+def addr(rnd):
+    """Return a random 6 bytes address."""
+
+    return bytes(rnd.getrandbits(8) for _ in range(6))
+
+
+def ssid(rnd, minimum=0):
+    """Return a random ssid."""
+
+    return bytes(rnd.randint(32, 126)
+                 for _ in range(rnd.randint(minimum, 32)))
+
+
+def ssids(rnd):
+    """Return a random list of ssid entries (from 1 to 10)."""
+
+    out = []
+
+    for _ in range(rnd.randint(1, 10)):
+        value = ssid(rnd)
+        out.append(Container(length=len(value), ssid=value))
+
+    return out
+
+
+def lvap_flags(rnd):
+    """Return random LVAP flags."""
+
+    return Container(set_mask=rnd.randint(0, 1),
+                     associated=rnd.randint(0, 1),
+                     authenticated=rnd.randint(0, 1))
+
+
+def port_flags(rnd):
+    """Return random port flags."""
+
+    return Container(no_ack=rnd.randint(0, 1))
+
+
+def header(rnd, msg_type, length):
+    """Return the common header fields."""
+
+    return dict(version=lvapp.PT_VERSION, type=msg_type, length=length,
+                seq=rnd.getrandbits(32))
+
+
+def hello(rnd):
+    """Return a random HELLO message."""
+
+    return Container(wtp=addr(rnd), period=rnd.getrandbits(32),
+                     uplink_bytes=rnd.getrandbits(32),
+                     downlink_bytes=rnd.getrandbits(32),
+                     **header(rnd, lvapp.PT_HELLO, 26))
+
+
+def probe_request(rnd):
+    """Return a random PROBE_REQUEST message."""
+
+    value = ssid(rnd)
+
+    return Container(wtp=addr(rnd), sta=addr(rnd), hwaddr=addr(rnd),
+                     channel=rnd.randint(1, 165), band=rnd.randint(0, 3),
+                     ssid=value,
+                     **header(rnd, lvapp.PT_PROBE_REQUEST, 28 + len(value)))
+
+
+def probe_response(rnd):
+    """Return a random PROBE_RESPONSE message."""
+
+    return Container(sta=addr(rnd),
+                     **header(rnd, lvapp.PT_PROBE_RESPONSE, 14))
+
+
+def auth_request(rnd):
+    """Return a random AUTH_REQUEST message."""
+
+    return Container(wtp=addr(rnd), sta=addr(rnd), bssid=addr(rnd),
+                     **header(rnd, lvapp.PT_AUTH_REQUEST, 26))
+
+
+def auth_response(rnd):
+    """Return a random AUTH_RESPONSE message."""
+
+    return Container(sta=addr(rnd), bssid=addr(rnd),
+                     **header(rnd, lvapp.PT_AUTH_RESPONSE, 20))
+
+
+def assoc_request(rnd):
+    """Return a random ASSOC_REQUEST message."""
+
+    value = ssid(rnd)
+
+    return Container(wtp=addr(rnd), sta=addr(rnd), bssid=addr(rnd),
+                     ssid=value,
+                     **header(rnd, lvapp.PT_ASSOC_REQUEST, 26 + len(value)))
+
+
+def assoc_response(rnd):
+    """Return a random ASSOC_RESPONSE message."""
+
+    return Container(sta=addr(rnd),
+                     **header(rnd, lvapp.PT_ASSOC_RESPONSE, 14))
+
+
+def add_lvap(rnd):
+    """Return a random ADD_LVAP message."""
+
+    entries = ssids(rnd)
+    length = 44 + sum(1 + x.length for x in entries)
+
+    return Container(flags=lvap_flags(rnd), assoc_id=rnd.getrandbits(16),
+                     hwaddr=addr(rnd), channel=rnd.randint(1, 165),
+                     band=rnd.randint(0, 3), sta=addr(rnd),
+                     encap=addr(rnd), net_bssid=addr(rnd),
+                     lvap_bssid=addr(rnd), ssids=entries,
+                     **header(rnd, lvapp.PT_ADD_LVAP, length))
+
+
+def del_lvap(rnd):
+    """Return a random DEL_LVAP message."""
+
+    return Container(sta=addr(rnd), **header(rnd, lvapp.PT_DEL_LVAP, 14))
+
+
+def status_lvap(rnd):
+    """Return a random STATUS_LVAP message."""
+
+    entries = ssids(rnd)
+    length = 50 + sum(1 + x.length for x in entries)
+
+    return Container(flags=lvap_flags(rnd), assoc_id=rnd.getrandbits(16),
+                     wtp=addr(rnd), sta=addr(rnd), encap=addr(rnd),
+                     hwaddr=addr(rnd), channel=rnd.randint(1, 165),
+                     band=rnd.randint(0, 3), net_bssid=addr(rnd),
+                     lvap_bssid=addr(rnd), ssids=entries,
+                     **header(rnd, lvapp.PT_STATUS_LVAP, length))
+
+
+def caps(rnd):
+    """Return a random CAPS message."""
+
+    blocks = [[addr(rnd), rnd.randint(1, 165), rnd.randint(0, 3),
+               Container()] for _ in range(rnd.randint(0, 8))]
+
+    ports = [[addr(rnd), rnd.getrandbits(16),
+              ssid(rnd).ljust(10, b'\x00')[:10]]
+             for _ in range(rnd.randint(0, 8))]
+
+    length = 16 + 10 * len(blocks) + 18 * len(ports)
+
+    return Container(wtp=addr(rnd), nb_resources_elements=len(blocks),
+                     nb_ports_elements=len(ports), blocks=blocks,
+                     ports=ports, **header(rnd, lvapp.PT_CAPS, length))
+
+
+def set_port(rnd):
+    """Return a random SET_PORT message."""
+
+    mcs = [rnd.randint(0, 255) for _ in range(rnd.randint(0, 32))]
+
+    return Container(flags=port_flags(rnd), hwaddr=addr(rnd),
+                     channel=rnd.randint(1, 165), band=rnd.randint(0, 3),
+                     sta=addr(rnd), rts_cts=rnd.getrandbits(16),
+                     tx_mcast=rnd.randint(0, 3),
+                     ur_mcast_count=rnd.randint(0, 255),
+                     nb_mcses=len(mcs), mcs=mcs,
+                     **header(rnd, lvapp.PT_SET_PORT, 29 + len(mcs)))
+
+
+def status_port(rnd):
+    """Return a random STATUS_PORT message."""
+
+    mcs = [rnd.randint(0, 255) for _ in range(rnd.randint(0, 32))]
+
+    return Container(flags=port_flags(rnd), wtp=addr(rnd), sta=addr(rnd),
+                     hwaddr=addr(rnd), channel=rnd.randint(1, 165),
+                     band=rnd.randint(0, 3), rts_cts=rnd.getrandbits(16),
+                     tx_mcast=rnd.randint(0, 3),
+                     ur_mcast_count=rnd.randint(0, 255),
+                     nb_mcses=len(mcs), mcs=mcs,
+                     **header(rnd, lvapp.PT_STATUS_PORT, 35 + len(mcs)))
+
+
+def add_vap(rnd):
+    """Return a random ADD_VAP message."""
+
+    value = ssid(rnd)
+
+    return Container(hwaddr=addr(rnd), channel=rnd.randint(1, 165),
+                     band=rnd.randint(0, 3), net_bssid=addr(rnd),
+                     ssid=value,
+                     **header(rnd, lvapp.PT_ADD_VAP, 22 + len(value)))
+
+
+def status_vap(rnd):
+    """Return a random STATUS_VAP message."""
+
+    value = ssid(rnd)
+
+    return Container(wtp=addr(rnd), hwaddr=addr(rnd),
+                     channel=rnd.randint(1, 165), band=rnd.randint(0, 3),
+                     net_bssid=addr(rnd), ssid=value,
+                     **header(rnd, lvapp.PT_STATUS_VAP, 28 + len(value)))
+
+
+def to_container(value):
+    """Convert a message parsed by the fast codec to a construct
+    Container."""
+
+    if isinstance(value, tuple) and hasattr(value, '_asdict'):
+        return Container(**{k: to_container(v)
+                            for k, v in value._asdict().items()})
+
+    if isinstance(value, list):
+        return [to_container(x) for x in value]
+
+    return value
+
+
+SAMPLES = {lvapp.PT_HELLO: (lvapp.HELLO, hello),
+           lvapp.PT_PROBE_REQUEST: (lvapp.PROBE_REQUEST, probe_request),
+           lvapp.PT_PROBE_RESPONSE: (lvapp.PROBE_RESPONSE, probe_response),
+           lvapp.PT_AUTH_REQUEST: (lvapp.AUTH_REQUEST, auth_request),
+           lvapp.PT_AUTH_RESPONSE: (lvapp.AUTH_RESPONSE, auth_response),
+           lvapp.PT_ASSOC_REQUEST: (lvapp.ASSOC_REQUEST, assoc_request),
+           lvapp.PT_ASSOC_RESPONSE: (lvapp.ASSOC_RESPONSE, assoc_response),
+           lvapp.PT_ADD_LVAP: (lvapp.ADD_LVAP, add_lvap),
+           lvapp.PT_DEL_LVAP: (lvapp.DEL_LVAP, del_lvap),
+           lvapp.PT_STATUS_LVAP: (lvapp.STATUS_LVAP, status_lvap),
+           lvapp.PT_CAPS: (lvapp.CAPS, caps),
+           lvapp.PT_SET_PORT: (lvapp.SET_PORT, set_port),
+           lvapp.PT_STATUS_PORT: (lvapp.STATUS_PORT, status_port),
+           lvapp.PT_ADD_VAP: (lvapp.ADD_VAP, add_vap),
+           lvapp.PT_STATUS_VAP: (lvapp.STATUS_VAP, status_vap)}
+
+
+class TestFastCodec(unittest.TestCase):
+    """Build and parse every LVAPP message with both codecs."""
+
+    def test_coverage(self):
+        """Every message with a construct definition has a fast codec."""
+
+        construct_types = {k for k, v in lvapp.PT_TYPES.items() if v}
+        construct_types.add(lvapp.PT_ADD_VAP)
+
+        self.assertEqual(set(SAMPLES), construct_types)
+        self.assertEqual(set(fastcodec.PT_TYPES), construct_types)
+
+    def test_build(self):
+        """Both codecs build the same bytes."""
+
+        for msg_type, (msg, sample) in sorted(SAMPLES.items()):
+
+            fast = fastcodec.PT_TYPES[msg_type]
+            rnd = random.Random(msg_type)
+
+            for _ in range(ROUNDS):
+
+                obj = sample(rnd)
+                data = msg.build(obj)
+
+                self.assertEqual(len(data), obj.length, msg.name)
+                self.assertEqual(fast.build(obj), data, msg.name)
+
+    def test_parse(self):
+        """Messages parsed by either codec build the same bytes."""
+
+        for msg_type, (msg, sample) in sorted(SAMPLES.items()):
+
+            fast = fastcodec.PT_TYPES[msg_type]
+            rnd = random.Random(msg_type)
+
+            for _ in range(ROUNDS):
+
+                data = msg.build(sample(rnd))
+
+                self.assertEqual(fast.build(fast.parse(data)), data,
+                                 msg.name)
+                self.assertEqual(msg.build(to_container(fast.parse(data))),
+                                 data, msg.name)
+                self.assertEqual(fast.build(msg.parse(data)), data,
+                                 msg.name)
+
+                # parsing a memoryview must give the same result
+                self.assertEqual(fast.parse(memoryview(data)),
+                                 fast.parse(data), msg.name)
+
+    def test_parse_fields(self):
+        """Both codecs parse the same field values."""
+
+        for msg_type, (msg, sample) in sorted(SAMPLES.items()):
+
+            fast = fastcodec.PT_TYPES[msg_type]
+            rnd = random.Random(msg_type)
+
+            for _ in range(ROUNDS):
+
+                data = msg.build(sample(rnd))
+                expected = msg.parse(data)
+                parsed = fast.parse(data)
+
+                for field in parsed._fields:
+
+                    value = getattr(parsed, field)
+                    other = expected[field]
+
+                    if field == "flags":
+                        for bit in value._fields:
+                            self.assertEqual(getattr(value, bit),
+                                             other[bit], msg.name)
+                    elif field == "ssids":
+                        self.assertEqual([(x.length, x.ssid) for x in value],
+                                         [(x.length, x.ssid) for x in other],
+                                         msg.name)
+                    elif field == "blocks":
+                        # the construct block flags are padding only
+                        self.assertEqual([x[:3] for x in value],
+                                         [x[:3] for x in other], msg.name)
+                    else:
+                        self.assertEqual(value, other, msg.name)
+
+
+if __name__ == '__main__':
+    unittest.main()